@@ -1,44 +1,312 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List
 import json
 import asyncio
 import io
 import logging
+import os
+import zipfile
 
+from app.cache import document_hash, field_cache, llm_cache, parse_cache, schema_hash, single_flight
+from app.deadline import REQUEST_TIMEOUT_SECONDS, Deadline, batch_llm_latency, llm_latency
+from app.kb import kb_store
+from app.llm import close_client
+from app.llm_batcher import llm_batcher
+from app.metrics import REQUESTS_IN_FLIGHT, observe_stage, render, track_thread_pool
+from app.parse_pool import PARSE_BACKEND, parse_pool
 from app.pdf_parser import parse_pdf
-from app.pipeline import run_extraction_pipeline
+from app.pipeline import iter_batch_events, iter_extraction_events, run_extraction_pipeline, run_heuristics_lazy
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BATCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_TIMEOUT_SECONDS", "60.0"))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "1000"))
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", str(500 * 1024 * 1024)))
+LAZY_PARSING = os.getenv("LAZY_PARSING", "1") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # An executor of our own for asyncio.to_thread, so /metrics can report its queue depth
+    executor = ThreadPoolExecutor()
+    asyncio.get_running_loop().set_default_executor(executor)
+    track_thread_pool(executor)
+
+    if PARSE_BACKEND == "process":
+        await asyncio.to_thread(parse_pool.start)
+    yield
+    await close_client()
+    await asyncio.to_thread(kb_store.close)
+    parse_pool.shutdown()
+
+
 app = FastAPI(
     title="PDF Data Extraction API",
     description="Extract structured data from PDFs",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 
+def _parse_with_cache(pdf_content: bytes, doc_hash: str):
+    """Parse PDF bytes, reusing a cached result for identical documents."""
+    cached = parse_cache.get(doc_hash)
+    if cached is not None:
+        return cached
+
+    parse_result = parse_pdf(io.BytesIO(pdf_content))
+    parse_cache.put(doc_hash, parse_result)
+    return parse_result
+
+
+def _parse_lazy(pdf_content: bytes, doc_hash: str, schema_dict, label: str, use_cache: bool):
+    """Parse page by page with early termination; return (parse_result, heuristics).
+
+    parse_result is None when parsing stopped before the last page; only full
+    parses are cached. heuristics is None when a cached parse was reused or
+    the whole document had to be read: the pipeline then runs the heuristic
+    pass itself, overlapped with speculative LLM calls.
+    """
+    cached = parse_cache.get(doc_hash)
+    if cached is not None:
+        return cached, None
+
+    heuristics, parse_result = run_heuristics_lazy(
+        pdf_content, schema_dict, label, doc_hash, use_cache, full_pass=False)
+    if parse_result is not None:
+        parse_cache.put(doc_hash, parse_result)
+
+    return parse_result, heuristics
+
+
+async def _parse_in_pool(pdf_content: bytes, doc_hash: str):
+    """Parse PDF bytes in the process pool, reusing a cached result for identical documents."""
+    cached = await asyncio.to_thread(parse_cache.get, doc_hash)
+    if cached is not None:
+        return cached
+
+    parse_result = await parse_pool.parse(pdf_content)
+    await asyncio.to_thread(parse_cache.put, doc_hash, parse_result)
+    return parse_result
+
+
+def _parse_schema(extraction_schema: str):
+    try:
+        schema_dict = json.loads(extraction_schema)
+    except json.JSONDecodeError as e:
+        raise HTTPException(400, f"Invalid JSON extraction_schema: {str(e)}")
+
+    if not schema_dict:
+        raise HTTPException(400, "extraction_schema cannot be empty")
+
+    return schema_dict
+
+
+class _UploadBudget:
+    """Document count and byte limits of one batch request, checked before anything is decompressed."""
+
+    def __init__(self):
+        self.documents = 0
+        self.total_bytes = 0
+
+    def admit(self, name: str, size: int):
+        if size > BATCH_MAX_FILE_BYTES:
+            raise HTTPException(400, f"{name} exceeds {BATCH_MAX_FILE_BYTES} bytes")
+        if self.documents + 1 > BATCH_MAX_DOCUMENTS:
+            raise HTTPException(400, f"Batch exceeds {BATCH_MAX_DOCUMENTS} documents")
+        if self.total_bytes + size > BATCH_MAX_TOTAL_BYTES:
+            raise HTTPException(400, f"Batch exceeds {BATCH_MAX_TOTAL_BYTES} bytes")
+        self.documents += 1
+        self.total_bytes += size
+
+
+def _expand_uploads(filename: str, content: bytes, budget: _UploadBudget):
+    """Yield (filename, bytes) for a PDF upload or for every PDF inside a zip upload.
+
+    Each document is admitted against budget first; zip members are checked by
+    their declared size and read at most one byte past the per-file limit, so
+    a zip bomb is rejected without being inflated.
+    """
+    if filename.lower().endswith('.zip'):
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                for info in archive.infolist():
+                    name = info.filename
+                    if info.is_dir() or name.startswith("__MACOSX/") or not name.lower().endswith('.pdf'):
+                        continue
+                    budget.admit(name, info.file_size)
+                    with archive.open(info) as member:
+                        data = member.read(BATCH_MAX_FILE_BYTES + 1)
+                    if len(data) != info.file_size:
+                        raise HTTPException(400, f"Corrupt zip member: {name}")
+                    yield name, data
+        except (zipfile.BadZipFile, zipfile.LargeZipFile):
+            raise HTTPException(400, f"Invalid zip file: {filename}")
+        return
+
+    if not filename.lower().endswith('.pdf'):
+        raise HTTPException(400, f"Only PDF or zip files are accepted: {filename}")
+
+    budget.admit(filename, len(content))
+    yield filename, content
+
+
+async def _ndjson(events, in_flight):
+    """Serialize pipeline events as NDJSON lines; a failure mid-stream becomes an error line.
+
+    The request stays counted in in_flight until the stream ends.
+    """
+    try:
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Streaming extraction failed: {str(e)}")
+        yield json.dumps({"type": "error", "error": f"Internal server error: {str(e)}"}) + "\n"
+    finally:
+        in_flight.dec()
+
+
+async def _batch_events(entries, extractable, schema_dict, label, use_cache, deadline):
+    """Batch events per upload entry: parse errors first, then documents as they finish."""
+    for entry in entries:
+        if entry.get("status") == "error":
+            yield {"type": "document", **entry}
+
+    llm_calls = 0
+    if extractable:
+        async for event in iter_batch_events(
+                documents=[doc for _, doc in extractable],
+                schema=schema_dict,
+                label=label,
+                use_cache=use_cache,
+                deadline=deadline):
+            if event["type"] == "document":
+                entry, _ = extractable[event["index"]]
+                entry.update(status="success", metadata=event["metadata"], fields=event["fields"])
+                yield {"type": "document", **entry}
+            else:
+                llm_calls = event["llm_calls"]
+
+    yield {
+        "type": "metadata",
+        "documents": len(entries),
+        "processing_time": deadline.elapsed(),
+        "llm_calls": llm_calls,
+    }
+
+
 @app.get("/")
 async def root():
     return {"status": "ok", "service": "pdf-extraction-api"}
 
 
+@app.get("/stats")
+async def stats():
+    return {
+        "parse_cache": parse_cache.stats(),
+        "field_cache": field_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "kb_store": kb_store.stats(),
+        "parse_pool": parse_pool.stats(),
+        "single_flight": single_flight.stats(),
+        "llm_latency": llm_latency.stats(),
+        "batch_llm_latency": batch_llm_latency.stats(),
+        "llm_batcher": llm_batcher.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
+
+async def _parse_document(pdf_content: bytes, doc_hash: str, schema_dict, label: str, use_cache: bool,
+                          deadline: Deadline):
+    """Parse with the configured backend within the request deadline; return (parse_result, heuristics).
+
+    The parse_pdf stage metric covers the wait for a worker and, with lazy
+    parsing, the page-by-page heuristic passes.
+    """
+    heuristics = None
+    try:
+        with observe_stage("parse_pdf", label):
+            if PARSE_BACKEND == "process":
+                parse_result = await asyncio.wait_for(
+                    _parse_in_pool(pdf_content, doc_hash), timeout=deadline.remaining())
+            elif LAZY_PARSING:
+                parse_result, heuristics = await asyncio.wait_for(
+                    asyncio.to_thread(_parse_lazy, pdf_content, doc_hash, schema_dict, label, use_cache),
+                    timeout=deadline.remaining()
+                )
+            else:
+                parse_result = await asyncio.wait_for(
+                    asyncio.to_thread(_parse_with_cache, pdf_content, doc_hash), timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        raise HTTPException(408, f"Parsing exceeded {REQUEST_TIMEOUT_SECONDS}s timeout")
+
+    if parse_result is None:
+        parse_result = {"lines": [], "full_text": ""}
+    elif not parse_result.get("lines"):
+        raise HTTPException(400, "No text content found in PDF")
+
+    return parse_result, heuristics
+
+
+async def _extract(pdf_content: bytes, doc_hash: str, schema_dict, label: str, use_cache: bool,
+                   deadline: Deadline):
+    """Parse and extract one document; the non-streaming /extract response body."""
+    parse_result, heuristics = await _parse_document(pdf_content, doc_hash, schema_dict, label, use_cache, deadline)
+
+    extraction_result = await run_extraction_pipeline(
+        pdf_lines=parse_result.get("lines", []),
+        doc_text=parse_result.get("full_text", ""),
+        schema=schema_dict,
+        label=label,
+        doc_hash=doc_hash,
+        use_cache=use_cache,
+        heuristics=heuristics,
+        deadline=deadline
+    )
+
+    return {
+        "status": "success",
+        "metadata": {
+            "processing_time": extraction_result.get("metadata", {}).get("processing_time", 0.0),
+            "llm_used": extraction_result.get("metadata", {}).get("llm_used", False),
+        },
+        "fields": extraction_result.get("fields", {}),
+    }
+
+
 @app.post("/extract")
 async def extract_data(
     label: str = Form(...),
     extraction_schema: str = Form(...),
-    pdf: UploadFile = File(...)
+    pdf: UploadFile = File(...),
+    use_cache: bool = Form(True),
+    stream: bool = Form(False)
 ):
-    """Extract structured data from PDF document."""
-    TIMEOUT_SECONDS = 9.0
+    """Extract structured data from PDF document.
 
-    try:
-        try:
-            schema_dict = json.loads(extraction_schema)
-        except json.JSONDecodeError as e:
-            raise HTTPException(400, f"Invalid JSON extraction_schema: {str(e)}")
+    With stream=true the response is NDJSON: one line per field as soon as it is
+    final (cache/heuristic fields first, LLM fields after) and a metadata line.
+    Parsing and extraction share one REQUEST_TIMEOUT_SECONDS budget. A
+    non-streaming request identical to one still in flight (same PDF, label,
+    schema and use_cache) waits for that one's result instead of redoing it.
+    """
+    deadline = Deadline(REQUEST_TIMEOUT_SECONDS)
+    in_flight = REQUESTS_IN_FLIGHT.labels(endpoint="/extract")
+    in_flight.inc()
+    streaming = False
 
-        if not schema_dict:
-            raise HTTPException(400, "extraction_schema cannot be empty")
+    try:
+        schema_dict = _parse_schema(extraction_schema)
 
         if not pdf.filename:
             raise HTTPException(400, "PDF filename is required")
@@ -46,43 +314,143 @@ async def extract_data(
         if not pdf.filename.lower().endswith('.pdf'):
             raise HTTPException(400, "Only PDF files are accepted")
 
-        pdf_content = await pdf.read()
+        with observe_stage("upload_read", label):
+            pdf_content = await pdf.read()
 
         if not pdf_content:
             raise HTTPException(400, "PDF file is empty")
 
-        try:
-            parse_result = await asyncio.wait_for(
-                asyncio.to_thread(parse_pdf, io.BytesIO(pdf_content)),
-                timeout=TIMEOUT_SECONDS
+        doc_hash = document_hash(pdf_content)
+
+        if stream:
+            parse_result, heuristics = await _parse_document(
+                pdf_content, doc_hash, schema_dict, label, use_cache, deadline)
+            events = iter_extraction_events(
+                pdf_lines=parse_result.get("lines", []),
+                doc_text=parse_result.get("full_text", ""),
+                schema=schema_dict,
+                label=label,
+                doc_hash=doc_hash,
+                use_cache=use_cache,
+                heuristics=heuristics,
+                deadline=deadline
             )
+            streaming = True
+            return StreamingResponse(_ndjson(events, in_flight), media_type="application/x-ndjson")
+
+        key = (doc_hash, label, schema_hash(schema_dict), use_cache)
+        return await single_flight.run(
+            key, lambda: _extract(pdf_content, doc_hash, schema_dict, label, use_cache, deadline))
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Extraction failed: {str(e)}")
+        raise HTTPException(500, f"Internal server error: {str(e)}")
+
+    finally:
+        # a streaming response is released by _ndjson once it ends
+        if not streaming:
+            in_flight.dec()
+
+
+@app.post("/extract/batch")
+async def extract_batch(
+    label: str = Form(...),
+    extraction_schema: str = Form(...),
+    pdfs: List[UploadFile] = File(...),
+    use_cache: bool = Form(True),
+    stream: bool = Form(False)
+):
+    """Extract the same schema from many PDFs (or zips of PDFs) of one label.
+
+    With stream=true the response is NDJSON: one line per document as it
+    completes, then a metadata line.
+    """
+    deadline = Deadline(BATCH_TIMEOUT_SECONDS)
+    in_flight = REQUESTS_IN_FLIGHT.labels(endpoint="/extract/batch")
+    in_flight.inc()
+    streaming = False
+
+    try:
+        schema_dict = _parse_schema(extraction_schema)
+
+        documents = []
+        budget = _UploadBudget()
+        for upload in pdfs:
+            if not upload.filename:
+                raise HTTPException(400, "PDF filename is required")
+            with observe_stage("upload_read", label):
+                content = await upload.read()
+            documents.extend(_expand_uploads(upload.filename, content, budget))
+
+        if not documents:
+            raise HTTPException(400, "No PDF files found in request")
+
+        doc_hashes = [document_hash(content) for _, content in documents]
+
+        try:
+            with observe_stage("parse_pdf", label):
+                parse_results = await asyncio.wait_for(
+                    asyncio.gather(*(
+                        _parse_in_pool(content, doc_hash)
+                        for (_, content), doc_hash in zip(documents, doc_hashes)
+                        if content
+                    ), return_exceptions=True),
+                    timeout=deadline.remaining()
+                )
         except asyncio.TimeoutError:
-            raise HTTPException(408, f"Parsing exceeded {TIMEOUT_SECONDS}s timeout")
+            raise HTTPException(408, f"Parsing exceeded {BATCH_TIMEOUT_SECONDS}s timeout")
+
+        entries = []
+        extractable = []
+        parsed = iter(parse_results)
 
-        if not parse_result.get("lines"):
-            raise HTTPException(400, "No text content found in PDF")
+        for (filename, content), doc_hash in zip(documents, doc_hashes):
+            entry = {"filename": filename}
+            entries.append(entry)
 
-        extraction_result = await asyncio.to_thread(
-            run_extraction_pipeline,
-            pdf_lines=parse_result.get("lines", []),
-            doc_text=parse_result.get("full_text", ""),
-            schema=schema_dict,
-            label=label,
-            timeout_seconds=TIMEOUT_SECONDS
-        )
+            if not content:
+                entry.update(status="error", error="PDF file is empty")
+                continue
+
+            parse_result = next(parsed)
+            if isinstance(parse_result, Exception):
+                entry.update(status="error", error=f"Failed to parse PDF: {parse_result}")
+            elif not parse_result.get("lines"):
+                entry.update(status="error", error="No text content found in PDF")
+            else:
+                extractable.append((entry, {
+                    "pdf_lines": parse_result["lines"],
+                    "doc_text": parse_result.get("full_text", ""),
+                    "doc_hash": doc_hash,
+                }))
+
+        events = _batch_events(entries, extractable, schema_dict, label, use_cache, deadline)
+        if stream:
+            streaming = True
+            return StreamingResponse(_ndjson(events, in_flight), media_type="application/x-ndjson")
+
+        batch_metadata = {}
+        async for event in events:
+            if event["type"] == "metadata":
+                batch_metadata = {key: value for key, value in event.items() if key != "type"}
 
         return {
             "status": "success",
-            "metadata": {
-                "processing_time": extraction_result.get("metadata", {}).get("processing_time", 0.0),
-                "llm_used": extraction_result.get("metadata", {}).get("llm_used", False),
-            },
-            "fields": extraction_result.get("fields", {}),
+            "metadata": batch_metadata,
+            "results": entries,
         }
 
     except HTTPException:
         raise
 
     except Exception as e:
-        logger.error(f"Extraction failed: {str(e)}")
+        logger.error(f"Batch extraction failed: {str(e)}")
         raise HTTPException(500, f"Internal server error: {str(e)}")
+
+    finally:
+        # a streaming response is released by _ndjson once it ends
+        if not streaming:
+            in_flight.dec()
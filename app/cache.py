@@ -0,0 +1,388 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", "")
+FIELD_CACHE_MAX_ENTRIES = int(os.getenv("FIELD_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", str(Path(__file__).parent.parent / "data" / "cache" / "llm_responses.sqlite3"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+
+def document_hash(pdf_bytes: bytes):
+    """Content hash of the raw PDF bytes, used as cache key."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def schema_hash(schema: Dict[str, str]):
+    """Hash of an extraction schema that ignores field order."""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """Content-addressed cache of parse_pdf results (memory LRU + optional disk tier).
+
+    Cached results are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = PARSE_CACHE_MAX_BYTES, cache_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, key: str):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str):
+        """Return cached parse result for key, or None on miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            if path.exists():
+                try:
+                    payload = path.read_bytes()
+                    entry = json.loads(payload)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning(f"Discarding unreadable parse cache entry {key}: {e}")
+                else:
+                    with self._lock:
+                        self.disk_hits += 1
+                        self._store(key, entry, len(payload))
+                    return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a parse result in memory and, if configured, on disk."""
+        payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            self._store(key, result, len(payload))
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(f".tmp.{os.getpid()}.{threading.get_ident()}")
+            try:
+                tmp_path.write_bytes(payload)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Failed to write parse cache entry {key}: {e}")
+
+    def _store(self, key: str, result: Dict[str, Any], size: int):
+        """Insert into the memory tier and evict LRU entries over the byte budget (lock held)."""
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._total_bytes -= self._sizes[key]
+
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self._total_bytes += size
+
+        while self._total_bytes > self.max_bytes and self._entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(old_key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_enabled": self.cache_dir is not None,
+            }
+
+
+class FieldCache:
+    """LRU cache of final field values keyed by (document hash, label, field, description).
+
+    Each label has a generation counter that is part of the key, so invalidating a
+    label is O(1): stale entries simply stop matching and age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = FIELD_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _key(self, doc_hash: str, label: str, field: str, description: str, generation: Optional[int] = None):
+        if generation is None:
+            generation = self._generations.get(label, 0)
+        return (doc_hash, label, generation, field, description)
+
+    def generation(self, label: str):
+        """Current generation of a label; pass it to put() to avoid caching values computed from a stale KB."""
+        with self._lock:
+            return self._generations.get(label, 0)
+
+    def get(self, doc_hash: str, label: str, field: str, description: str):
+        """Return cached entry ({"value", "source"}) or None on miss."""
+        with self._lock:
+            key = self._key(doc_hash, label, field, description)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def has(self, doc_hash: str, label: str, field: str, description: str):
+        """True when get() would hit; does not count as a hit or miss."""
+        with self._lock:
+            return self._key(doc_hash, label, field, description) in self._entries
+
+    def put(
+        self,
+        doc_hash: str,
+        label: str,
+        field: str,
+        description: str,
+        value: Any,
+        source: str,
+        generation: Optional[int] = None
+    ):
+        """Cache a resolved (non-null) field value."""
+        if value is None:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self._generations.get(label, 0):
+                return
+
+            key = self._key(doc_hash, label, field, description, generation)
+            self._entries[key] = {"value": value, "source": source}
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_label(self, label: str):
+        """Invalidate every cached field of a label (called when its KB changes)."""
+        with self._lock:
+            self._generations[label] = self._generations.get(label, 0) + 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of parsed LLM responses keyed by a hash of the full prompt.
+
+    Entries expire after ttl_seconds; when the table grows past max_entries the
+    least recently used rows are deleted. An empty path disables the cache.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, instructions: str, prompt: str):
+        """Hash of everything that determines the LLM output."""
+        material = json.dumps([model, instructions, prompt], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        """Open the database lazily (lock held)."""
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed ON llm_responses (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str):
+        """Return the cached response payload for key, or None on miss/expiry."""
+        if not self.path:
+            return None
+
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                response, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self.expired += 1
+                    self.misses += 1
+                    return None
+
+                conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+                return json.loads(response)
+
+            except (sqlite3.Error, json.JSONDecodeError) as e:
+                logger.warning(f"LLM cache read failed: {e}")
+                self.misses += 1
+                return None
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """Store a parsed response and enforce the size bound."""
+        if not self.path:
+            return
+
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, response, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(response, ensure_ascii=False), now, now)
+                )
+
+                count = conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM llm_responses WHERE key IN ("
+                        "SELECT key FROM llm_responses ORDER BY accessed_at LIMIT ?)",
+                        (overflow,)
+                    )
+                    self.evictions += overflow
+
+                conn.commit()
+
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "enabled": bool(self.path),
+            }
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time; concurrent callers with the key share its result.
+
+    The computation runs as its own task, so it finishes for the remaining
+    callers even if the caller that started it goes away.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Any, asyncio.Task] = {}
+
+        self.executions = 0
+        self.deduplicated = 0
+
+    async def run(self, key, compute):
+        """Await compute() (a coroutine function), or the identical computation already in flight."""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.deduplicated += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self):
+        return {
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._in_flight),
+        }
+
+
+parse_cache = ParseCache(PARSE_CACHE_MAX_BYTES, PARSE_CACHE_DIR or None)
+field_cache = FieldCache(FIELD_CACHE_MAX_ENTRIES)
+llm_cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
+single_flight = SingleFlight()
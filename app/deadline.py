@@ -0,0 +1,103 @@
+from typing import Optional
+from collections import deque
+import math
+import os
+import threading
+import time
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "9.0"))
+LLM_MAX_TIMEOUT = float(os.getenv("LLM_MAX_TIMEOUT", "8.0"))
+LLM_RESERVE_SECONDS = float(os.getenv("LLM_RESERVE_SECONDS", "0.25"))
+LLM_LATENCY_PRIOR = float(os.getenv("LLM_LATENCY_PRIOR", "2.5"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+LLM_LATENCY_MIN_SAMPLES = 20
+LLM_LATENCY_ALPHA = 0.2
+
+
+class Deadline:
+    """Absolute time budget of one request.
+
+    Created when the request arrives and passed through parsing, heuristics
+    and the LLM fallback, so every stage spends from the same budget.
+    """
+
+    def __init__(self, seconds: float):
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+class LatencyTracker:
+    """EWMA and windowed percentiles of recent LLM call latencies (thread-safe)."""
+
+    def __init__(self, window: int = LLM_LATENCY_WINDOW, alpha: float = LLM_LATENCY_ALPHA):
+        self.alpha = alpha
+        self._samples = deque(maxlen=window)
+        self._ewma: Optional[float] = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+            if self._ewma is None:
+                self._ewma = seconds
+            else:
+                self._ewma = self.alpha * seconds + (1 - self.alpha) * self._ewma
+
+    def percentile(self, q: float):
+        """q-th percentile (0-100, nearest rank) of the window, or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[max(0, math.ceil(q / 100 * len(samples)) - 1)]
+
+    def expected(self):
+        """Latency to plan for: the window's p95, or LLM_LATENCY_PRIOR until there are enough samples."""
+        with self._lock:
+            enough = len(self._samples) >= LLM_LATENCY_MIN_SAMPLES
+        return self.percentile(95) if enough else LLM_LATENCY_PRIOR
+
+    def stats(self):
+        with self._lock:
+            count, samples, ewma = self._count, len(self._samples), self._ewma
+        return {
+            "calls": count,
+            "window": samples,
+            "ewma": ewma,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "expected": self.expected(),
+        }
+
+
+llm_latency = LatencyTracker()
+batch_llm_latency = LatencyTracker()
+
+
+def llm_timeout(deadline: Deadline, tracker: LatencyTracker = llm_latency,
+                max_timeout: float = LLM_MAX_TIMEOUT):
+    """Timeout for an LLM call made now, or None when the call should be skipped.
+
+    The call gets what is left of the request budget after LLM_RESERVE_SECONDS
+    for post-processing, capped at max_timeout. When less than the cap is left,
+    the call is skipped if recent calls needed more than that (see
+    LatencyTracker.expected). A call that gets the full cap is always made, so
+    the tracker keeps seeing fresh latencies even after a slow period.
+    """
+    available = deadline.remaining() - LLM_RESERVE_SECONDS
+    if available >= max_timeout:
+        return max_timeout
+    if available <= 0 or available < tracker.expected():
+        return None
+    return available
@@ -1,11 +1,19 @@
 import re
-from typing import Dict, Any, List, Optional
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
-from app.normalize import normalize_str
+from app.normalize import normalize_str, normalize_with_offsets
+from app.spatial import SpatialIndex, anchor_box
 
 ACCEPT_THRESHOLD = 0.8
 UNCERTAIN_THRESHOLD = 0.6
 
+SAME_LINE_SEPARATOR = re.compile(r'\s*[::\-–—]\s*(.+?)$')
+TOP_REGIONS = ["top_left", "top_right", "header"]
+BOTTOM_REGIONS = ["bottom_left", "bottom_right", "footer"]
+LABEL_PUNCTUATION = " \t::?-–—"
+SPATIAL_ANCHOR_SCORES = {"right_of": 0.9, "below": 0.85}
+
 
 @dataclass
 class Candidate:
@@ -18,6 +26,8 @@ class Candidate:
     position_score: float = 0.0
     enum_score: float = 0.0
     total_score: float = 0.0
+    norm_value: Optional[str] = None
+    aligned: bool = False
 
     def calculate_total_score(self):
         self.total_score = (
@@ -27,75 +37,196 @@ class Candidate:
         )
 
 
+def line_norm(line: Dict[str, Any]):
+    """Return a line's normalized text and offset map, computing them if the parser did not."""
+    norm_text = line.get("norm_text")
+    if norm_text is None:
+        return normalize_with_offsets(line.get("text", ""))
+    return norm_text, line.get("norm_offsets", [])
+
+
 def extract_candidates(
     lines: List[Dict[str, Any]],
     field: str,
     field_desc: str,
-    kb_field: Dict[str, Any]
+    kb_field: Dict[str, Any],
+    anchor_hits: Optional[List[Tuple[int, str]]] = None,
+    spatial: Optional[SpatialIndex] = None
 ):
-    """Extract candidate values for a field using heuristics."""
+    """Extract candidate values for a field using heuristics.
+
+    anchor_hits are the field's (line_idx, anchor) matches precomputed by an
+    AnchorMatcher; without them every line is scanned against every anchor.
+    With a SpatialIndex of the document, anchors that end their span (a bare
+    label) also yield the nearest text to their right and below them.
+    """
     candidates = []
     anchors = kb_field.get("anchors", [])
 
     if not anchors:
         return candidates
 
-    for idx, line in enumerate(lines):
-        text = line.get("text", "")
-        if not text:
-            continue
-
-        norm_text = normalize_str(text)
+    if anchor_hits is None:
+        anchor_hits = _scan_anchor_hits(lines, anchors)
 
-        for anchor in anchors:
-            norm_anchor = normalize_str(anchor)
-
-            if norm_anchor not in norm_text:
-                continue
+    for idx, anchor in anchor_hits:
+        line = lines[idx]
+        text = line.get("text", "")
+        norm_text, norm_offsets = line_norm(line)
+        norm_anchor = normalize_str(anchor)
+
+        same_line = _match_same_line(text, norm_text, norm_offsets, norm_anchor)
+        if same_line:
+            candidate = Candidate(
+                value=same_line[0],
+                line_idx=idx,
+                method="anchor_same_line",
+                anchor_used=anchor,
+                anchor_score=1.0,
+                norm_value=same_line[1]
+            )
+            candidates.append(candidate)
+
+        if idx + 1 < len(lines):
+            next_line_value = extract_next_line(
+                text, anchor, line, norm_current=norm_text, norm_anchor=norm_anchor)
+            if next_line_value:
+                if next_line_value == text.strip():
+                    norm_value = norm_text
+                else:
+                    norm_value = normalize_str(next_line_value)
 
-            same_line_value = extract_same_line(text, anchor)
-            if same_line_value:
                 candidate = Candidate(
-                    value=same_line_value,
-                    line_idx=idx,
-                    method="anchor_same_line",
+                    value=next_line_value,
+                    line_idx=idx + 1,
+                    method="next_line",
                     anchor_used=anchor,
-                    anchor_score=1.0
+                    anchor_score=0.9,
+                    norm_value=norm_value
                 )
                 candidates.append(candidate)
 
-            if idx + 1 < len(lines):
-                next_line_value = extract_next_line(
-                    text, anchor, line)
-                if next_line_value:
-                    candidate = Candidate(
-                        value=next_line_value,
-                        line_idx=idx + 1,
-                        method="next_line",
-                        anchor_used=anchor,
-                        anchor_score=0.9
-                    )
-                    candidates.append(candidate)
+        if spatial is not None:
+            candidates.extend(extract_spatial(spatial, line, idx, anchor, norm_anchor))
+
+    # labels of the same field aligned with different values: none of them is unambiguous
+    if len({_norm_value(c) for c in candidates if c.aligned}) > 1:
+        for candidate in candidates:
+            if candidate.aligned:
+                candidate.aligned = False
+                candidate.anchor_score = SPATIAL_ANCHOR_SCORES[candidate.method]
 
     return candidates
 
 
-def extract_same_line(text: str, anchor: str):
-    """Extract value from same line after anchor (patterns: "Anchor: VALUE" or "Anchor - VALUE")."""
-    pattern = rf'{re.escape(anchor)}\s*[::\-–—]\s*(.+?)$'
-    match = re.search(pattern, text, re.IGNORECASE)
+def extract_spatial(spatial: SpatialIndex, line: Dict[str, Any], idx: int, anchor: str, norm_anchor: str):
+    """Candidates right of and below a bare label, from the document's spatial index."""
+    located = anchor_box(spatial, line, idx, norm_anchor)
+    if not located:
+        return []
+
+    entry_id, box, rest = located
+    if rest.strip(LABEL_PUNCTUATION):
+        return []
+
+    right = spatial.right_of(entry_id, box)
+    below = spatial.below(entry_id, box)
+
+    if right is not None and below is not None:
+        # a row of column headers over a row of values: the right neighbor is
+        # the next header, not this one's value
+        right_below = spatial.below(right, spatial.boxes[right])
+        if right_below is not None and _same_row(spatial, below, right_below):
+            right = None
+
+    candidates = []
+    for method, neighbor in (("right_of", right), ("below", below)):
+        if neighbor is None or spatial.is_label(neighbor):
+            continue
+
+        value = spatial.texts[neighbor].strip()
+        if not value.strip(LABEL_PUNCTUATION):
+            continue
+
+        candidates.append(Candidate(
+            value=value,
+            line_idx=spatial.entries[neighbor][0],
+            method=method,
+            anchor_used=anchor,
+            anchor_score=SPATIAL_ANCHOR_SCORES[method]
+        ))
+
+    # a span holding only the label, with a single value next to it, is as
+    # unambiguous as "Label: value"; its geometry says where the value sits
+    # better than the region hint
+    if len(candidates) == 1 and normalize_str(spatial.texts[entry_id]).strip(LABEL_PUNCTUATION) == norm_anchor:
+        candidates[0].anchor_score = 1.0
+        candidates[0].aligned = True
+
+    return candidates
+
+
+def _scan_anchor_hits(lines: List[Dict[str, Any]], anchors: List[str]):
+    """Naive line x anchor scan, used when no AnchorMatcher hits are supplied."""
+    hits = []
+    norm_anchors = [normalize_str(anchor) for anchor in anchors]
+
+    for idx, line in enumerate(lines):
+        if not line.get("text", ""):
+            continue
 
-    if not match:
+        norm_text, _ = line_norm(line)
+
+        for anchor, norm_anchor in zip(anchors, norm_anchors):
+            if norm_anchor in norm_text:
+                hits.append((idx, anchor))
+
+    return hits
+
+
+def _match_same_line(text: str, norm_text: str, norm_offsets: List[int], norm_anchor: str):
+    """Find "anchor<sep>value" via the normalized text; return (value, normalized value) or None."""
+    if not norm_anchor:
         return None
 
-    value = match.group(1).strip()
-    return value if value and value not in [':', '-', '–', '—'] else None
+    start = norm_text.find(norm_anchor)
+    while start != -1:
+        anchor_end = norm_offsets[start + len(norm_anchor) - 1] + 1
+        match = SAME_LINE_SEPARATOR.match(text, anchor_end)
+
+        if match:
+            value = match.group(1).strip()
+            if not value or value in [':', '-', '–', '—']:
+                return None
+
+            value_start = match.start(1) + (len(match.group(1)) - len(match.group(1).lstrip()))
+            norm_start = bisect_left(norm_offsets, value_start)
+            return value, norm_text[norm_start:].lstrip()
 
+        start = norm_text.find(norm_anchor, start + 1)
 
-def extract_next_line(current_text: str, anchor: str, next_line: Dict[str, Any]):
+    return None
+
+
+def extract_same_line(text: str, anchor: str):
+    """Extract value from same line after anchor (patterns: "Anchor: VALUE" or "Anchor - VALUE")."""
+    norm_text, norm_offsets = normalize_with_offsets(text)
+    match = _match_same_line(text, norm_text, norm_offsets, normalize_str(anchor))
+    return match[0] if match else None
+
+
+def extract_next_line(
+    current_text: str,
+    anchor: str,
+    next_line: Dict[str, Any],
+    norm_current: Optional[str] = None,
+    norm_anchor: Optional[str] = None
+):
     """Extract value from next line if current line is header/label."""
-    norm_current = normalize_str(current_text)
-    norm_anchor = normalize_str(anchor)
+    if norm_current is None:
+        norm_current = normalize_str(current_text)
+    if norm_anchor is None:
+        norm_anchor = normalize_str(anchor)
 
     if ':' in current_text or '-' in current_text:
         return None
@@ -131,6 +262,18 @@ def extract_next_line(current_text: str, anchor: str, next_line: Dict[str, Any])
     return tokens[0]
 
 
+def _same_row(spatial: SpatialIndex, first: int, second: int):
+    _, y0, _, y1 = spatial.boxes[first]
+    _, other_y0, _, other_y1 = spatial.boxes[second]
+    return min(y1, other_y1) - max(y0, other_y0) > 0.5 * min(y1 - y0, other_y1 - other_y0)
+
+
+def _norm_value(candidate: Candidate):
+    if candidate.norm_value is None:
+        candidate.norm_value = normalize_str(candidate.value)
+    return candidate.norm_value
+
+
 def score_candidates(
     candidates: List[Candidate],
     kb_field: Dict[str, Any],
@@ -140,17 +283,19 @@ def score_candidates(
     enums = kb_field.get("enums", [])
     region_hint = kb_field.get("region_hint", "")
 
+    norm_enums = {normalize_str(e) for e in enums}
+
     for candidate in candidates:
         if enums:
-            norm_value = normalize_str(candidate.value)
-            norm_enums = [normalize_str(e) for e in enums]
-            candidate.enum_score = 1.0 if norm_value in norm_enums else 0.0
+            candidate.enum_score = 1.0 if _norm_value(candidate) in norm_enums else 0.0
 
-        if region_hint and line_positions and candidate.line_idx < len(line_positions):
+        if candidate.aligned:
+            candidate.position_score = 1.0
+        elif region_hint and line_positions and candidate.line_idx < len(line_positions):
             y_rel = line_positions[candidate.line_idx]
-            if region_hint in ["top_left", "top_right", "header"] and y_rel < 0.3:
+            if region_hint in TOP_REGIONS and y_rel < 0.3:
                 candidate.position_score = 1.0
-            elif region_hint in ["bottom_left", "bottom_right", "footer"] and y_rel > 0.7:
+            elif region_hint in BOTTOM_REGIONS and y_rel > 0.7:
                 candidate.position_score = 1.0
             else:
                 candidate.position_score = 0.5
@@ -176,7 +321,7 @@ def select_best(
     seen = {}
     deduped = []
     for cand in sorted_candidates:
-        norm_val = normalize_str(cand.value)
+        norm_val = _norm_value(cand)
         if norm_val not in seen:
             seen[norm_val] = cand
             deduped.append(cand)
@@ -1,12 +1,35 @@
 from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field as dataclass_field
+import atexit
+import copy
+import itertools
 import json
 import logging
+import os
+import threading
+import time
 from pathlib import Path
+from app.cache import field_cache
+from app.layout import TEMPLATE_MAX_PER_LABEL, DocumentLayout, matching_templates, template_id
 from app.normalize import normalize_str
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 KB_DIR = Path(__file__).parent.parent / "data" / "kb"
+KB_FLUSH_INTERVAL = float(os.getenv("KB_FLUSH_INTERVAL", "1.0"))
+KB_REFRESH_INTERVAL = float(os.getenv("KB_REFRESH_INTERVAL", "5.0"))
+
+# KB sections that influence candidate extraction and scoring
+HEURISTIC_KEYS = ("anchors", "enums", "region_hint")
+
+# process-wide, so a version never repeats across labels or store instances
+_kb_versions = itertools.count(1)
 
 
 def _categorize_position(x_rel: float, y_rel: float):
@@ -38,30 +61,320 @@ def _compute_dominant_region(region_counts: Dict[str, int], min_confidence: floa
     return region_name if ratio >= min_confidence else None
 
 
-def load_kb(label: str):
-    """Load knowledge base for a label from JSON file."""
-    kb_path = KB_DIR / f"label_{label}.json"
+def preferred_pages(kb: Dict[str, Any], fields):
+    """Page numbers where the given fields were found before, most frequent first."""
+    totals: Dict[int, int] = {}
+    for field in fields:
+        for page, count in kb.get("page_counts", {}).get(field, {}).items():
+            totals[int(page)] = totals.get(int(page), 0) + count
+
+    return sorted(totals, key=lambda page: (-totals[page], page))
+
+
+def weak_fields(kb: Dict[str, Any], fields, min_attempts: int, max_accept_rate: float):
+    """Fields the heuristics rarely accept for this label (per kb["field_stats"])."""
+    weak = []
+    for field in fields:
+        stats = kb.get("field_stats", {}).get(field, {})
+        attempts = stats.get("attempts", 0)
+        if attempts >= min_attempts and stats.get("accepted", 0) <= max_accept_rate * attempts:
+            weak.append(field)
+    return weak
 
-    if kb_path.exists():
-        with open(kb_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
 
+def _empty_kb():
     return {
         "anchors": {},
         "enums": {},
         "region_hint": {},
-        "region_counts": {}
+        "region_counts": {},
+        "page_counts": {},
+        "templates": {},
+        "field_stats": {}
     }
 
 
-def save_kb(label: str, kb: Dict[str, Any]):
-    """Save knowledge base to JSON file."""
-    KB_DIR.mkdir(parents=True, exist_ok=True)
-    kb_path = KB_DIR / f"label_{label}.json"
+def _kb_path(label: str):
+    return KB_DIR / f"label_{label}.json"
+
+
+def _read_kb_file(kb_path: Path):
+    """Read a KB file; return (kb, mtime) or (None, None) when it does not exist."""
+    try:
+        mtime = kb_path.stat().st_mtime
+        with open(kb_path, 'r', encoding='utf-8') as f:
+            return json.load(f), mtime
+    except FileNotFoundError:
+        return None, None
 
-    with open(kb_path, 'w', encoding='utf-8') as f:
+
+def _write_kb_file(kb_path: Path, kb: Dict[str, Any]):
+    """Write a KB file atomically (temp file + rename); return the new mtime."""
+    kb_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = kb_path.with_suffix(f".json.tmp.{os.getpid()}")
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(kb, f, indent=2, ensure_ascii=False)
 
+    os.replace(tmp_path, kb_path)
+    return kb_path.stat().st_mtime
+
+
+@contextmanager
+def _file_lock(kb_path: Path):
+    """Exclusive inter-process lock on a KB file (no-op where fcntl is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+
+    kb_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(kb_path.with_suffix(".json.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def merge_kb(base: Any, ours: Any, theirs: Any):
+    """Three-way merge of KB data: our changes since base applied on top of theirs.
+
+    Lists are unioned (theirs first, order preserved), numbers are treated as
+    counters (theirs + our delta) and dicts are merged key by key.
+    """
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = dict(theirs)
+        for key, value in ours.items():
+            if key in theirs:
+                merged[key] = merge_kb(base.get(key), value, theirs[key])
+            elif key not in base or value != base[key]:
+                merged[key] = value
+        return merged
+
+    if isinstance(ours, list) or isinstance(theirs, list):
+        ours_list = ours if isinstance(ours, list) else [ours]
+        theirs_list = theirs if isinstance(theirs, list) else [theirs]
+        return theirs_list + [item for item in ours_list if item not in theirs_list]
+
+    if isinstance(ours, (int, float)) and isinstance(theirs, (int, float)) \
+            and not isinstance(ours, bool) and not isinstance(theirs, bool):
+        base_value = base if isinstance(base, (int, float)) else 0
+        return theirs + (ours - base_value)
+
+    return theirs if ours == base else ours
+
+
+@dataclass
+class _KBEntry:
+    label: str
+    kb: Dict[str, Any]
+    base: Dict[str, Any]
+    disk_mtime: Optional[float] = None
+    version: int = dataclass_field(default_factory=lambda: next(_kb_versions))
+    dirty: bool = False
+    checked_at: float = 0.0
+    lock: threading.RLock = dataclass_field(default_factory=threading.RLock)
+
+
+class KBStore:
+    """In-memory KB per label with versions, locking and write-behind persistence.
+
+    Readers get a shared snapshot that must not be mutated; writers replace the
+    snapshot under the label lock (see update_kb()). Dirty labels are flushed by a
+    background thread every flush_interval seconds, merging with whatever other
+    worker processes wrote in the meantime under an fcntl file lock. Clean labels
+    are reloaded when the file changes on disk (checked every refresh_interval).
+    A flush_interval of 0 writes through synchronously.
+    """
+
+    def __init__(self, flush_interval: float = KB_FLUSH_INTERVAL, refresh_interval: float = KB_REFRESH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[Path, _KBEntry] = {}
+        self._entries_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+        self.flushes = 0
+        self.merges = 0
+        self.reloads = 0
+
+    def _entry(self, label: str):
+        kb_path = _kb_path(label)
+
+        with self._entries_lock:
+            entry = self._entries.get(kb_path)
+            if entry is not None:
+                return kb_path, entry
+
+        kb, mtime = _read_kb_file(kb_path)
+        kb = kb if kb is not None else _empty_kb()
+
+        with self._entries_lock:
+            entry = self._entries.setdefault(
+                kb_path, _KBEntry(label=label, kb=kb, base=kb, disk_mtime=mtime, checked_at=time.monotonic()))
+        return kb_path, entry
+
+    def _refresh(self, kb_path: Path, entry: _KBEntry):
+        """Pick up changes written by other processes (label lock held)."""
+        now = time.monotonic()
+        if entry.dirty or now - entry.checked_at < self.refresh_interval:
+            return
+        entry.checked_at = now
+
+        try:
+            mtime = kb_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+
+        if mtime != entry.disk_mtime:
+            kb, mtime = _read_kb_file(kb_path)
+            if kb is not None:
+                self._replace(entry, kb)
+                entry.base = kb
+                entry.disk_mtime = mtime
+                self.reloads += 1
+
+    def _replace(self, entry: _KBEntry, kb: Dict[str, Any]):
+        """Swap in a KB that came from disk (label lock held)."""
+        if kb == entry.kb:
+            return
+
+        if any(kb.get(key) != entry.kb.get(key) for key in HEURISTIC_KEYS):
+            field_cache.invalidate_label(entry.label)
+
+        entry.kb = kb
+        entry.version = next(_kb_versions)
+
+    def lock(self, label: str):
+        """Per-label lock; hold it around read-modify-write sequences."""
+        return self._entry(label)[1].lock
+
+    def get(self, label: str):
+        """Current KB snapshot for a label (read-only)."""
+        kb_path, entry = self._entry(label)
+        with entry.lock:
+            self._refresh(kb_path, entry)
+            return entry.kb
+
+    def get_versioned(self, label: str):
+        """Current KB snapshot for a label together with its version."""
+        kb_path, entry = self._entry(label)
+        with entry.lock:
+            self._refresh(kb_path, entry)
+            return entry.kb, entry.version
+
+    def version(self, label: str):
+        """Version of a label's KB; changes whenever its snapshot is replaced."""
+        return self.get_versioned(label)[1]
+
+    def put(self, label: str, kb: Dict[str, Any]):
+        """Replace a label's KB in memory and schedule it for persistence."""
+        kb_path, entry = self._entry(label)
+
+        with entry.lock:
+            entry.kb = kb
+            entry.version = next(_kb_versions)
+            entry.dirty = True
+
+        if self.flush_interval <= 0 or self._stopped.is_set():
+            self.flush(label)
+        else:
+            self._ensure_writer()
+            self._wakeup.set()
+
+    def flush(self, label: Optional[str] = None):
+        """Write dirty labels to disk, merging concurrent writes from other processes."""
+        with self._entries_lock:
+            if label is not None:
+                items = [(_kb_path(label), self._entries.get(_kb_path(label)))]
+            else:
+                items = list(self._entries.items())
+
+        for kb_path, entry in items:
+            if entry is None or not entry.dirty:
+                continue
+
+            with entry.lock:
+                if not entry.dirty:
+                    continue
+
+                try:
+                    with _file_lock(kb_path):
+                        theirs, mtime = _read_kb_file(kb_path)
+                        kb = entry.kb
+
+                        if theirs is not None and mtime != entry.disk_mtime:
+                            kb = merge_kb(entry.base, entry.kb, theirs)
+                            self.merges += 1
+
+                        entry.disk_mtime = _write_kb_file(kb_path, kb)
+
+                    self._replace(entry, kb)
+                    entry.base = kb
+                    entry.dirty = False
+                    self.flushes += 1
+
+                except OSError as e:
+                    logger.error(f"Failed to persist KB {kb_path.name}: {e}")
+
+    def _ensure_writer(self):
+        with self._entries_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run_writer, name="kb-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # let further updates accumulate so they are written as one batch
+            self._stopped.wait(self.flush_interval)
+            self.flush()
+
+    def close(self):
+        """Stop the background writer and flush everything still pending.
+
+        Later updates are written through synchronously.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        self.flush()
+
+    def stats(self):
+        with self._entries_lock:
+            entries = list(self._entries.values())
+        return {
+            "labels": len(entries),
+            "dirty": sum(1 for entry in entries if entry.dirty),
+            "flushes": self.flushes,
+            "merges": self.merges,
+            "reloads": self.reloads,
+        }
+
+
+kb_store = KBStore(KB_FLUSH_INTERVAL, KB_REFRESH_INTERVAL)
+atexit.register(kb_store.close)
+
+
+def load_kb(label: str):
+    """Load knowledge base for a label (shared in-memory snapshot; do not mutate)."""
+    return kb_store.get(label)
+
+
+def load_kb_versioned(label: str):
+    """Like load_kb(), also returning the KB version the snapshot belongs to."""
+    return kb_store.get_versioned(label)
+
+
+def save_kb(label: str, kb: Dict[str, Any]):
+    """Save knowledge base (applied in memory, persisted by the background writer)."""
+    kb_store.put(label, kb)
+
 
 def init_from_schema(label: str, schema: Dict[str, str]):
     """Initialize KB from schema with normalized anchors based on field names."""
@@ -69,7 +382,10 @@ def init_from_schema(label: str, schema: Dict[str, str]):
         "anchors": {},
         "enums": {},
         "region_hint": {},
-        "region_counts": {}
+        "region_counts": {},
+        "page_counts": {},
+        "templates": {},
+        "field_stats": {}
     }
 
     for field_name in schema.keys():
@@ -105,15 +421,107 @@ def update_kb(
     label: str,
     extraction_results: Dict[str, Any],
     heuristic_evidence: Optional[Dict[str, Dict[str, Any]]] = None,
-    llm_metadata: Optional[Dict[str, Dict[str, Any]]] = None
+    llm_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+    layout: Optional[Dict[str, Any]] = None,
+    field_outcomes: Optional[Dict[str, bool]] = None
+):
+    """Update KB based on successful extractions from heuristics and LLM.
+
+    layout is the document's template evidence (see app.layout.layout_evidence);
+    field_outcomes tells, per field, whether the heuristics accepted a value.
+    The read-modify-write runs under the label lock on a private copy, so
+    concurrent updates of the same label are never lost.
+    """
+    with kb_store.lock(label):
+        kb = copy.deepcopy(load_kb(label))
+        updated, heuristics_changed = _apply_evidence(
+            kb, extraction_results, heuristic_evidence, llm_metadata)
+
+        if layout:
+            _apply_layout(kb, layout)
+            updated = True
+
+        if field_outcomes:
+            _apply_field_outcomes(kb, field_outcomes)
+            updated = True
+
+        if updated:
+            save_kb(label, kb)
+
+    if heuristics_changed:
+        field_cache.invalidate_label(label)
+
+
+def _apply_layout(kb: Dict[str, Any], layout: Dict[str, Any]):
+    """Count one more document for its layout template and where its values sat.
+
+    The evidence goes to the template the document matched; without one, to
+    the template its landmarks match within POSITION_TOLERANCE (other matching
+    templates, e.g. learned before matching was tolerant, are folded into it),
+    and only then to a new template. Past TEMPLATE_MAX_PER_LABEL the least
+    seen templates are dropped. Templates only feed the template fast path,
+    so they never invalidate the field cache.
+    """
+    templates = kb.setdefault("templates", {})
+
+    key = layout.get("template")
+    if key not in templates:
+        matches = matching_templates(DocumentLayout.from_landmarks(layout["landmarks"]), templates, min_seen=0)
+        if matches:
+            key = matches[0]
+            for duplicate in matches[1:]:
+                _fold_template(templates[key], templates.pop(duplicate))
+        else:
+            key = template_id(layout["landmarks"])
+            templates[key] = {"landmarks": layout["landmarks"], "seen": 0, "fields": {}}
+
+    template = templates[key]
+    template["seen"] += 1
+    for field, position in layout["values"].items():
+        positions = template["fields"].setdefault(field, {})
+        positions[position] = positions.get(position, 0) + 1
+
+    if len(templates) > TEMPLATE_MAX_PER_LABEL:
+        by_seen = sorted(templates, key=lambda other: templates[other].get("seen", 0), reverse=True)
+        for other in by_seen[TEMPLATE_MAX_PER_LABEL:]:
+            if other != key:
+                del templates[other]
+
+
+def _fold_template(target: Dict[str, Any], other: Dict[str, Any]):
+    target["seen"] = target.get("seen", 0) + other.get("seen", 0)
+    for field, positions in other.get("fields", {}).items():
+        merged = target.setdefault("fields", {}).setdefault(field, {})
+        for position, count in positions.items():
+            merged[position] = merged.get(position, 0) + count
+
+
+def _apply_field_outcomes(kb: Dict[str, Any], field_outcomes: Dict[str, bool]):
+    """Count heuristic attempts and acceptances per field (see weak_fields)."""
+    field_stats = kb.setdefault("field_stats", {})
+    for field, accepted in field_outcomes.items():
+        stats = field_stats.setdefault(field, {"attempts": 0, "accepted": 0})
+        stats["attempts"] += 1
+        if accepted:
+            stats["accepted"] += 1
+
+
+def _apply_evidence(
+    kb: Dict[str, Any],
+    extraction_results: Dict[str, Any],
+    heuristic_evidence: Optional[Dict[str, Dict[str, Any]]],
+    llm_metadata: Optional[Dict[str, Dict[str, Any]]]
 ):
-    """Update KB based on successful extractions from heuristics and LLM."""
-    kb = load_kb(label)
+    """Apply extraction evidence to kb in place; return (updated, heuristics_changed)."""
     updated = False
+    heuristics_changed = False
 
     if "region_counts" not in kb:
         kb["region_counts"] = {}
 
+    if "page_counts" not in kb:
+        kb["page_counts"] = {}
+
     if heuristic_evidence:
         for field, evidence in heuristic_evidence.items():
             if not extraction_results.get(field):
@@ -144,8 +552,15 @@ def update_kb(
                                 kb["region_hint"][field]]
                         if dominant not in kb["region_hint"][field]:
                             kb["region_hint"][field].append(dominant)
+                            heuristics_changed = True
                         updated = True
 
+            page = evidence.get("page")
+            if page:
+                page_counts = kb["page_counts"].setdefault(field, {})
+                page_counts[str(page)] = page_counts.get(str(page), 0) + 1
+                updated = True
+
             anchor_used = evidence.get("anchor_used")
             if anchor_used:
                 if field not in kb["anchors"]:
@@ -162,6 +577,7 @@ def update_kb(
                 if norm_anchor and norm_anchor not in existing_anchors and norm_anchor != norm_value:
                     kb["anchors"][field].append(norm_anchor)
                     updated = True
+                    heuristics_changed = True
 
             line_text = evidence.get("line_text", "")
             if line_text and ":" in line_text:
@@ -182,6 +598,7 @@ def update_kb(
                         if norm_potential and norm_potential not in existing_anchors and norm_potential != norm_value:
                             kb["anchors"][field].append(norm_potential)
                             updated = True
+                            heuristics_changed = True
 
     if llm_metadata:
         for field, metadata in llm_metadata.items():
@@ -209,6 +626,7 @@ def update_kb(
                     if norm_anchor and norm_anchor not in existing_anchors and norm_anchor != norm_value:
                         kb["anchors"][field].append(norm_anchor)
                         updated = True
+                        heuristics_changed = True
 
             enums = field_metadata.get("enums")
             if enums and isinstance(enums, list):
@@ -223,6 +641,7 @@ def update_kb(
                     if norm_enum and norm_enum not in existing_enums:
                         kb["enums"][field].append(norm_enum)
                         updated = True
+                        heuristics_changed = True
 
             region = field_metadata.get("region")
             if region and region not in [None, "null"]:
@@ -236,6 +655,6 @@ def update_kb(
                     if region not in kb["region_hint"][field]:
                         kb["region_hint"][field].append(region)
                         updated = True
+                        heuristics_changed = True
 
-    if updated:
-        save_kb(label, kb)
+    return updated, heuristics_changed
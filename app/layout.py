@@ -0,0 +1,174 @@
+from typing import Dict, Any, List, Optional
+import hashlib
+import json
+import os
+
+from app.normalize import normalize_field, normalize_str
+
+TEMPLATE_MIN_SEEN = int(os.getenv("TEMPLATE_MIN_SEEN", "3"))
+TEMPLATE_MATCH_RATIO = float(os.getenv("TEMPLATE_MATCH_RATIO", "0.9"))
+TEMPLATE_MAX_PER_LABEL = int(os.getenv("TEMPLATE_MAX_PER_LABEL", "8"))
+TEMPLATE_FIELD_CONFIDENCE = 0.8
+MIN_LANDMARKS = 3
+POSITION_TOLERANCE = 6.0
+POSITION_QUANTUM = 4.0
+
+
+def _spans(lines: List[Dict[str, Any]]):
+    """Yield (text, x0, y0, page) for every span (or line, without span data)."""
+    for line in lines:
+        bbox = line.get("bbox") or {}
+        page = bbox.get("page", 1)
+
+        spans = line.get("spans")
+        if not spans:
+            if bbox:
+                yield line.get("text", ""), bbox["x0"], bbox["y0"], page
+            continue
+
+        for span in spans:
+            yield span["text"], span["bbox"][0], span["bbox"][1], page
+
+
+def _label_text(text: str):
+    return normalize_str(text).strip(" :?-")
+
+
+def _is_landmark(text: str, labels):
+    stripped = text.strip()
+    label = _label_text(stripped)
+    return bool(label) and (label in labels or stripped.endswith((':', ':')))
+
+
+def document_landmarks(lines: List[Dict[str, Any]], labels):
+    """Static text of a document: spans that are known labels (KB anchors) or end with ':'."""
+    labels = set(labels)
+    return [
+        [_label_text(text), round(x0, 1), round(y0, 1), page]
+        for text, x0, y0, page in _spans(lines)
+        if _is_landmark(text, labels)
+    ]
+
+
+def template_id(landmarks: List[List[Any]]):
+    """Fingerprint of a layout: its landmark texts at quantized positions."""
+    key = sorted(
+        (text, round(x0 / POSITION_QUANTUM), round(y0 / POSITION_QUANTUM), page)
+        for text, x0, y0, page in landmarks
+    )
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def _position_key(x0: float, y0: float, page: int):
+    return f"{round(x0 / POSITION_QUANTUM)}:{round(y0 / POSITION_QUANTUM)}:{page}"
+
+
+def layout_evidence(lines: List[Dict[str, Any]], labels, results: Dict[str, Any],
+                    template: Optional[str] = None):
+    """Template evidence for update_kb: landmarks plus where each confirmed value sits.
+
+    template is the id of the template the document matched, if any (see
+    match_template); update_kb otherwise attaches the evidence to a matching
+    template or starts a new one. Only values that fill a whole span are
+    recorded, since a template reads a field by taking the span found at its
+    learned position; landmark spans are never taken as values. Callers leave
+    out the values a template read, so a template never confirms its own reads.
+    """
+    labels = set(labels)
+    landmarks = document_landmarks(lines, labels)
+    if len(landmarks) < MIN_LANDMARKS:
+        return None
+
+    wanted = {value: field for field, value in results.items() if value}
+    values = {}
+    for text, x0, y0, page in _spans(lines):
+        if _is_landmark(text, labels):
+            continue
+        field = wanted.get(normalize_field(text))
+        if field and field not in values:
+            values[field] = _position_key(x0, y0, page)
+
+    return {"template": template, "landmarks": landmarks, "values": values}
+
+
+class DocumentLayout:
+    """Span positions of one document for template matching; labels are the KB anchors."""
+
+    def __init__(self, lines: List[Dict[str, Any]], labels=()):
+        self.labels = set(labels)
+        self.spans = list(_spans(lines))
+        self._by_text: Dict[str, List[tuple]] = {}
+
+        for text, x0, y0, page in self.spans:
+            self._by_text.setdefault(_label_text(text), []).append((x0, y0, page))
+
+    @classmethod
+    def from_landmarks(cls, landmarks: List[List[Any]]):
+        """Layout holding only the given landmarks (for matching evidence against templates)."""
+        layout = cls([])
+        for text, x0, y0, page in landmarks:
+            layout._by_text.setdefault(text, []).append((x0, y0, page))
+        return layout
+
+    def has(self, text: str, x0: float, y0: float, page: int):
+        return any(
+            p == page and abs(x - x0) <= POSITION_TOLERANCE and abs(y - y0) <= POSITION_TOLERANCE
+            for x, y, p in self._by_text.get(text, ())
+        )
+
+    def text_at(self, x0: float, y0: float, page: int):
+        """Text of the non-landmark span starting closest to (x0, y0) within tolerance, or None."""
+        best, best_distance = None, None
+        for text, x, y, p in self.spans:
+            if p != page or abs(x - x0) > POSITION_TOLERANCE or abs(y - y0) > POSITION_TOLERANCE:
+                continue
+            if _is_landmark(text, self.labels):
+                continue
+            distance = abs(x - x0) + abs(y - y0)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = text, distance
+        return best
+
+
+def matching_templates(layout: DocumentLayout, templates: Dict[str, Dict[str, Any]],
+                       min_seen: int = TEMPLATE_MIN_SEEN):
+    """Ids of the templates whose landmarks the document reproduces, best match (then most seen) first."""
+    matches = []
+    for key, template in templates.items():
+        landmarks = template.get("landmarks", [])
+        if template.get("seen", 0) < min_seen or len(landmarks) < MIN_LANDMARKS:
+            continue
+
+        found = sum(1 for text, x0, y0, page in landmarks if layout.has(text, x0, y0, page))
+        ratio = found / len(landmarks)
+        if ratio >= TEMPLATE_MATCH_RATIO:
+            matches.append((ratio, template.get("seen", 0), key))
+
+    return [key for _, _, key in sorted(matches, reverse=True)]
+
+
+def match_template(layout: DocumentLayout, templates: Dict[str, Dict[str, Any]]):
+    """Id of the best learned template whose landmarks the document reproduces, or None."""
+    matches = matching_templates(layout, templates)
+    return matches[0] if matches else None
+
+
+def read_template(layout: DocumentLayout, template: Dict[str, Any], fields):
+    """Read fields from their learned positions; fields without a confident position are skipped."""
+    values = {}
+    for field in fields:
+        positions = template.get("fields", {}).get(field)
+        if not positions:
+            continue
+
+        key, count = max(positions.items(), key=lambda item: item[1])
+        if count < TEMPLATE_MIN_SEEN or count < TEMPLATE_FIELD_CONFIDENCE * sum(positions.values()):
+            continue
+
+        qx, qy, page = (int(part) for part in key.split(":"))
+        text = layout.text_at(qx * POSITION_QUANTUM, qy * POSITION_QUANTUM, page)
+        value = normalize_field(text)
+        if value:
+            values[field] = value
+
+    return values
@@ -1,35 +1,164 @@
-from typing import Dict, List, Optional
+from typing import Dict, Any, List, Optional
 import json
 import asyncio
 import logging
 import os
+import time
+import weakref
 from pathlib import Path
-from openai import OpenAI
+import httpx
+from openai import APITimeoutError, AsyncOpenAI
 from dotenv import load_dotenv
 
+from app.cache import llm_cache
+from app.deadline import LatencyTracker, batch_llm_latency, llm_latency
+from app.retrieval import field_query, select_context
+
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+LLM_MODEL = "gpt-5-mini"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """Return the shared, connection-pooled AsyncOpenAI client of the running event loop.
+
+    The base URL follows OPENAI_BASE_URL, so the client can point at a local stub.
+    SDK retries are off: a retried timeout would outlive the request deadline.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE
+                )
+            )
+        )
+        _clients[loop] = client
+
+    return client
+
+
+async def close_client():
+    """Close the running loop's client and its connection pool."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+async def _call_llm(
+    system_prompt: str,
+    user_prompt: str,
+    timeout_seconds: float,
+    use_cache: bool = True,
+    max_output_tokens: int = 500,
+    latency_tracker: Optional[LatencyTracker] = None
+):
+    """Send one JSON-mode request (or serve it from the response cache) and return the parsed JSON.
+
+    latency_tracker records how long the API took (timeouts included, cache hits excluded).
+    """
+    cache_key = llm_cache.make_key(LLM_MODEL, system_prompt, user_prompt)
+
+    result_data = await asyncio.to_thread(llm_cache.get, cache_key) if use_cache else None
+
+    if result_data is None:
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(get_client().responses.create(
+                model=LLM_MODEL,
+                instructions=system_prompt,
+                input=user_prompt,
+                reasoning={"effort": "minimal"},
+                text={"verbosity": "low", "format": {"type": "json_object"}},
+                max_output_tokens=max_output_tokens,
+                timeout=timeout_seconds
+            ), timeout_seconds)
+        except (APITimeoutError, asyncio.TimeoutError):
+            if latency_tracker is not None:
+                latency_tracker.record(time.monotonic() - started)
+            raise
+
+        if latency_tracker is not None:
+            latency_tracker.record(time.monotonic() - started)
+
+        output_text = response.output_text.strip()
+        result_data = json.loads(output_text)
+        await asyncio.to_thread(llm_cache.put, cache_key, result_data)
+
+    return result_data
+
+
+def _doc_context(
+    doc_text: str,
+    schema: Dict[str, str],
+    uncertain_fields: List[str],
+    candidates_by_field: Optional[Dict[str, List[str]]] = None,
+    anchors_by_field: Optional[Dict[str, List[str]]] = None
+):
+    """The part of doc_text sent to the LLM: lines relevant to the uncertain fields (see select_context)."""
+    candidates_by_field = candidates_by_field or {}
+    anchors_by_field = anchors_by_field or {}
+
+    queries = [
+        field_query(field, schema.get(field, ""), anchors_by_field.get(field), candidates_by_field.get(field))
+        for field in uncertain_fields
+    ]
+    return select_context(doc_text, queries)
+
+
+def _null_results(uncertain_fields: List[str]):
+    return {field: {"value": None, "metadata": None} for field in uncertain_fields}
+
+
+def _collect_fields(uncertain_fields: List[str], result_data: Dict):
+    fields = result_data.get("fields") or {}
+    metadata = result_data.get("metadata") or {}
 
-MAX_DOC_CHARS = 2000
+    output = {}
+    for field in uncertain_fields:
+        output[field] = {
+            "value": fields.get(field),
+            "metadata": metadata.get(field)
+        }
+
+    return output
 
 
-def resolve_batched_gpt5_mini(
+async def resolve_batched_gpt5_mini(
     doc_text: str,
     schema: Dict[str, str],
     uncertain_fields: List[str],
     candidates_by_field: Optional[Dict[str, List[str]]] = None,
-    timeout_seconds: float = 8.0
+    timeout_seconds: float = 8.0,
+    use_cache: bool = True,
+    anchors_by_field: Optional[Dict[str, List[str]]] = None
 ):
-    """Resolve uncertain fields using a single batched LLM call."""
+    """Resolve uncertain fields using a single batched LLM call.
+
+    Long documents are cut down to the lines relevant to the uncertain fields
+    (names, descriptions, KB anchors and candidates). Responses are cached by
+    prompt hash; use_cache=False skips the lookup (the fresh response still
+    refreshes the cache).
+    """
     if not uncertain_fields:
         return {}
 
-    if len(doc_text) > MAX_DOC_CHARS:
-        doc_text = doc_text[:MAX_DOC_CHARS] + "\n[...truncated]"
+    doc_text = await asyncio.to_thread(
+        _doc_context, doc_text, schema, uncertain_fields, candidates_by_field, anchors_by_field)
 
     candidates_by_field = candidates_by_field or {}
 
@@ -55,38 +184,108 @@ JSON format:
 metadata is optional, only if found in doc."""
 
     try:
-        response = client.responses.create(
-            model="gpt-5-mini",
-            instructions=system_prompt,
-            input=user_prompt,
-            reasoning={"effort": "minimal"},
-            text={"verbosity": "low", "format": {"type": "json_object"}},
-            max_output_tokens=500,
-            timeout=timeout_seconds
-        )
+        result_data = await _call_llm(system_prompt, user_prompt, timeout_seconds, use_cache,
+                                      latency_tracker=llm_latency)
+        return _collect_fields(uncertain_fields, result_data)
 
-        output_text = response.output_text.strip()
-        result_data = json.loads(output_text)
+    except asyncio.TimeoutError:
+        return _null_results(uncertain_fields)
+
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse LLM JSON: {e}")
+        return _null_results(uncertain_fields)
+
+    except Exception as e:
+        logger.error(f"LLM error: {e}")
+        return _null_results(uncertain_fields)
+
+
+async def resolve_multi_document(
+    schema: Dict[str, str],
+    documents: List[Dict[str, Any]],
+    timeout_seconds: float = 20.0,
+    use_cache: bool = True,
+    anchors_by_field: Optional[Dict[str, List[str]]] = None,
+    latency_tracker: LatencyTracker = batch_llm_latency
+):
+    """Resolve the uncertain fields of several documents in one structured LLM call.
 
-        fields = result_data.get("fields", {})
-        metadata = result_data.get("metadata", {})
+    Each document is a dict with "id", "doc_text", "uncertain_fields" and
+    optionally "candidates_by_field"; each document's text is cut down as in
+    resolve_batched_gpt5_mini. Returns {doc_id: {field: {"value", "metadata"}}}.
+    The call's latency goes to latency_tracker (the /extract/batch tracker by default).
+    """
+    documents = [doc for doc in documents if doc.get("uncertain_fields")]
+    if not documents:
+        return {}
+
+    system_prompt = ("Extract data from each document independently. Return JSON only. "
+                     "Use null if not found.")
+
+    needed_fields = []
+    for doc in documents:
+        for field in doc["uncertain_fields"]:
+            if field not in needed_fields:
+                needed_fields.append(field)
+
+    descriptions = ", ".join(f'"{field}": {schema.get(field, "")}' for field in needed_fields)
+
+    def contexts():
+        return [
+            _doc_context(doc["doc_text"], schema, doc["uncertain_fields"],
+                         doc.get("candidates_by_field"), anchors_by_field)
+            for doc in documents
+        ]
+
+    doc_contexts = await asyncio.to_thread(contexts)
+
+    sections = []
+    for doc, doc_context in zip(documents, doc_contexts):
+        candidates_by_field = doc.get("candidates_by_field") or {}
+        fields_list = []
+        for field in doc["uncertain_fields"]:
+            entry = f'"{field}"'
+            cands = candidates_by_field.get(field, [])
+            if cands:
+                entry += f' [{cands[0]}]'
+            fields_list.append(entry)
+
+        sections.append(f"""=== Document {doc['id']} ===
+Fields: {', '.join(fields_list)}
+Doc:
+{doc_context}""")
 
-        output = {}
-        for field in uncertain_fields:
-            output[field] = {
-                "value": fields.get(field),
-                "metadata": metadata.get(field)
-            }
+    first_id = documents[0]["id"]
+    first_field = documents[0]["uncertain_fields"][0]
+    user_prompt = f"""Field descriptions: {descriptions}
 
-        return output
+{chr(10).join(sections)}
+
+JSON format:
+{{"documents": {{"{first_id}": {{"fields": {{"{first_field}": "value|null", ...}}, "metadata": {{"{first_field}": {{"anchors": ["label"], "enums": ["val"], "region": "top_left|null"}}, ...}}}}, ...}}}}
+
+Answer every document id listed above. metadata is optional, only if found in doc."""
+
+    try:
+        result_data = await _call_llm(
+            system_prompt, user_prompt, timeout_seconds, use_cache,
+            max_output_tokens=min(500 * len(documents), 8000),
+            latency_tracker=latency_tracker
+        )
+        answers = result_data.get("documents") or {}
+
+        return {
+            doc["id"]: _collect_fields(doc["uncertain_fields"], answers.get(str(doc["id"])) or {})
+            for doc in documents
+        }
 
     except asyncio.TimeoutError:
-        return {field: {"value": None, "metadata": None} for field in uncertain_fields}
+        pass
 
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse LLM JSON: {e}")
-        return {field: {"value": None, "metadata": None} for field in uncertain_fields}
 
     except Exception as e:
         logger.error(f"LLM error: {e}")
-        return {field: {"value": None, "metadata": None} for field in uncertain_fields}
+
+    return {doc["id"]: _null_results(doc["uncertain_fields"]) for doc in documents}
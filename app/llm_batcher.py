@@ -0,0 +1,166 @@
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field as dataclass_field
+import asyncio
+import json
+import logging
+import os
+
+from app.deadline import llm_latency
+from app.llm import _null_results, resolve_batched_gpt5_mini, resolve_multi_document
+
+logger = logging.getLogger(__name__)
+
+LLM_MICROBATCH_WINDOW_MS = float(os.getenv("LLM_MICROBATCH_WINDOW_MS", "10"))
+LLM_MICROBATCH_MAX_DOCS = int(os.getenv("LLM_MICROBATCH_MAX_DOCS", "8"))
+
+
+@dataclass
+class _Request:
+    doc_text: str
+    uncertain_fields: List[str]
+    candidates_by_field: Optional[Dict[str, List[str]]]
+    timeout_seconds: float
+    future: asyncio.Future
+    cancelled: bool = False
+
+
+@dataclass
+class _Group:
+    schema: Dict[str, str]
+    use_cache: bool
+    anchors_by_field: Optional[Dict[str, List[str]]]
+    requests: List[_Request] = dataclass_field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class LLMBatcher:
+    """Coalesces concurrent single-document LLM requests into multi-document calls.
+
+    Requests for the same label, schema and cache mode that arrive within
+    window_ms of the first one (up to max_docs) are sent as one
+    resolve_multi_document call and the answers are fanned back out. A group
+    of one is sent as a plain resolve_batched_gpt5_mini call, so a request
+    that arrives alone gets the same prompt as without the batcher. Either way
+    the latency is recorded in llm_latency, which /extract's llm_timeout reads.
+    window_ms <= 0 or max_docs <= 1 disables coalescing.
+    """
+
+    def __init__(self, window_ms: float = LLM_MICROBATCH_WINDOW_MS, max_docs: int = LLM_MICROBATCH_MAX_DOCS):
+        self.window = window_ms / 1000
+        self.max_docs = max_docs
+        self._groups: Dict[tuple, _Group] = {}
+        self._tasks = set()
+
+        self.requests = 0
+        self.calls = 0
+        self.coalesced_calls = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_docs > 1
+
+    async def resolve(
+        self,
+        label: str,
+        doc_text: str,
+        schema: Dict[str, str],
+        uncertain_fields: List[str],
+        candidates_by_field: Optional[Dict[str, List[str]]] = None,
+        timeout_seconds: float = 8.0,
+        use_cache: bool = True,
+        anchors_by_field: Optional[Dict[str, List[str]]] = None
+    ):
+        """Same contract as resolve_batched_gpt5_mini; waits at most timeout_seconds for its answer."""
+        if not uncertain_fields:
+            return {}
+
+        self.requests += 1
+        if not self.enabled:
+            self.calls += 1
+            return await resolve_batched_gpt5_mini(
+                doc_text, schema, uncertain_fields, candidates_by_field, timeout_seconds, use_cache, anchors_by_field)
+
+        loop = asyncio.get_running_loop()
+        key = (loop, label, json.dumps(schema, sort_keys=True), use_cache)
+
+        group = self._groups.get(key)
+        if group is None:
+            group = _Group(schema=schema, use_cache=use_cache, anchors_by_field=anchors_by_field)
+            group.timer = loop.call_later(self.window, self._flush, key)
+            self._groups[key] = group
+
+        request = _Request(doc_text, uncertain_fields, candidates_by_field, timeout_seconds, loop.create_future())
+        group.requests.append(request)
+        if len(group.requests) >= self.max_docs:
+            group.timer.cancel()
+            self._flush(key)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(request.future), timeout_seconds)
+        except asyncio.TimeoutError:
+            return _null_results(uncertain_fields)
+        except asyncio.CancelledError:
+            request.cancelled = True
+            raise
+
+    def _flush(self, key: tuple):
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._dispatch(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, group: _Group):
+        requests = [request for request in group.requests if not request.cancelled]
+        if not requests:
+            return
+
+        self.calls += 1
+        try:
+            if len(requests) == 1:
+                request = requests[0]
+                answers = [await resolve_batched_gpt5_mini(
+                    request.doc_text, group.schema, request.uncertain_fields, request.candidates_by_field,
+                    request.timeout_seconds, group.use_cache, group.anchors_by_field)]
+            else:
+                self.coalesced_calls += 1
+                documents = [
+                    {
+                        "id": str(idx),
+                        "doc_text": request.doc_text,
+                        "uncertain_fields": request.uncertain_fields,
+                        "candidates_by_field": request.candidates_by_field,
+                    }
+                    for idx, request in enumerate(requests)
+                ]
+                timeout = max(request.timeout_seconds for request in requests)
+                results = await resolve_multi_document(
+                    group.schema, documents, timeout, group.use_cache, group.anchors_by_field,
+                    latency_tracker=llm_latency)
+                answers = [
+                    results.get(str(idx)) or _null_results(request.uncertain_fields)
+                    for idx, request in enumerate(requests)
+                ]
+
+        except Exception as e:
+            logger.error(f"Coalesced LLM call failed: {e}")
+            answers = [_null_results(request.uncertain_fields) for request in requests]
+
+        for request, answer in zip(requests, answers):
+            if not request.future.done():
+                request.future.set_result(answer)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_docs": self.max_docs,
+            "requests": self.requests,
+            "calls": self.calls,
+            "coalesced_calls": self.coalesced_calls,
+        }
+
+
+llm_batcher = LLMBatcher()
@@ -0,0 +1,142 @@
+from typing import Dict, Any, List, Tuple
+from collections import deque
+import threading
+
+from app.heuristics import line_norm
+from app.normalize import normalize_str
+
+
+class AnchorMatcher:
+    """Aho-Corasick automaton over the normalized anchors of every field of a label.
+
+    A single pass over a normalized line reports every anchor it contains, for all
+    fields at once, instead of one substring test per (anchor, field).
+    """
+
+    def __init__(self, anchors_by_field: Dict[str, List[str]]):
+        self.patterns: List[str] = []
+        self.owners: List[List[Tuple[str, int, str]]] = []
+        self._empty_owners: List[Tuple[str, int, str]] = []
+
+        pattern_ids: Dict[str, int] = {}
+        for field, anchors in anchors_by_field.items():
+            for anchor_idx, anchor in enumerate(anchors):
+                norm_anchor = normalize_str(anchor)
+                owner = (field, anchor_idx, anchor)
+
+                if not norm_anchor:
+                    self._empty_owners.append(owner)
+                    continue
+
+                pid = pattern_ids.get(norm_anchor)
+                if pid is None:
+                    pid = len(self.patterns)
+                    pattern_ids[norm_anchor] = pid
+                    self.patterns.append(norm_anchor)
+                    self.owners.append([])
+                self.owners[pid].append(owner)
+
+        self._build()
+
+    def _build(self):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+
+        for pid, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    goto.append({})
+                    out.append([])
+                    nxt = len(goto) - 1
+                    goto[node][ch] = nxt
+                node = nxt
+            out[node].append(pid)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+
+                fail[child] = goto[state].get(ch, 0)
+                out[child] = out[child] + out[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def search(self, norm_text: str):
+        """Return (start, pattern_id) for every anchor occurrence in a normalized text."""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        patterns = self.patterns
+
+        matches = []
+        state = 0
+        for pos, ch in enumerate(norm_text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            if out[state]:
+                for pid in out[state]:
+                    matches.append((pos - len(patterns[pid]) + 1, pid))
+
+        return matches
+
+    def find_hits(self, lines: List[Dict[str, Any]]):
+        """Map each field to its (line_idx, anchor) hits, in line then anchor order."""
+        hits: Dict[str, List[Tuple[int, int, str]]] = {}
+
+        for idx, line in enumerate(lines):
+            if not line.get("text", ""):
+                continue
+
+            norm_text, _ = line_norm(line)
+
+            seen = set()
+            for _, pid in self.search(norm_text):
+                if pid in seen:
+                    continue
+                seen.add(pid)
+                for field, anchor_idx, anchor in self.owners[pid]:
+                    hits.setdefault(field, []).append((idx, anchor_idx, anchor))
+
+            for field, anchor_idx, anchor in self._empty_owners:
+                hits.setdefault(field, []).append((idx, anchor_idx, anchor))
+
+        for field_hits in hits.values():
+            field_hits.sort(key=lambda h: (h[0], h[1]))
+
+        return {
+            field: [(idx, anchor) for idx, _, anchor in field_hits]
+            for field, field_hits in hits.items()
+        }
+
+
+_matchers: Dict[str, Tuple[int, AnchorMatcher]] = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(label: str, kb_version: int, anchors_by_field: Dict[str, List[str]]):
+    """Return the cached matcher for a label, rebuilding it only when its KB version changed."""
+    with _matchers_lock:
+        cached = _matchers.get(label)
+        if cached is not None and cached[0] == kb_version:
+            return cached[1]
+
+    matcher = AnchorMatcher(anchors_by_field)
+
+    with _matchers_lock:
+        _matchers[label] = (kb_version, matcher)
+
+    return matcher
@@ -0,0 +1,84 @@
+from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import atexit
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Shared by the worker processes of `run_server.py --workers N`, which sets it up;
+# must be in the environment before prometheus_client is imported
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+# Fine below 100 ms (template and heuristic passes), then up to past the 9 s request budget
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 9.0, 12.0, 20.0)
+
+STAGE_SECONDS = Histogram(
+    "extraction_stage_seconds",
+    "Time spent per extraction stage (upload_read, parse_pdf, heuristics, llm, update_kb)",
+    ["stage", "label"],
+    buckets=STAGE_BUCKETS
+)
+FIELDS = Counter(
+    "extraction_fields_total",
+    "Final field values by source (cache, template, heuristic, llm; null when left unresolved)",
+    ["label", "field", "source"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "extraction_requests_in_flight",
+    "Extraction requests being processed (streaming ones until their last line is sent)",
+    ["endpoint"],
+    multiprocess_mode="livesum"
+)
+THREAD_POOL_QUEUE = Gauge(
+    "thread_pool_queue_depth",
+    "Work items waiting for a thread of the event loop's default executor (as of the last scrape)",
+    multiprocess_mode="liveall"
+)
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+if PROMETHEUS_MULTIPROC_DIR:
+    # drop this worker's live gauges once it is gone
+    atexit.register(multiprocess.mark_process_dead, os.getpid())
+
+
+@contextmanager
+def observe_stage(stage: str, label: str):
+    """Record the duration of the with block in the stage histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage, label=label).observe(time.perf_counter() - start)
+
+
+def record_fields(label: str, results: Dict[str, Any], sources: Dict[str, str]):
+    """Count each final field value under the source that produced it."""
+    for field, value in results.items():
+        source = sources.get(field, "null") if value is not None else "null"
+        FIELDS.labels(label=label, field=field, source=source).inc()
+
+
+def track_thread_pool(executor: ThreadPoolExecutor):
+    """Report the executor's pending work items as thread_pool_queue_depth."""
+    global _thread_pool
+    _thread_pool = executor
+
+
+def render():
+    """Current metrics in the Prometheus text format; returns (body, content type).
+
+    With PROMETHEUS_MULTIPROC_DIR set, the values of every worker process are
+    aggregated from that directory.
+    """
+    if _thread_pool is not None:
+        THREAD_POOL_QUEUE.set(_thread_pool._work_queue.qsize())
+
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
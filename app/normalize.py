@@ -1,17 +1,62 @@
 from typing import Any, Optional
+from functools import lru_cache
 from unidecode import unidecode
 
+NORMALIZE_CACHE_SIZE = 16384
+NORMALIZE_CACHE_MAX_LEN = 64
+
+
+def _normalize(value: str):
+    # unidecode leaves pure-ASCII input unchanged, so skip it for the common case
+    normalized = value if value.isascii() else unidecode(value)
+    normalized = normalized.lower()
+    return " ".join(normalized.split())
+
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize)
+
 
 def normalize_str(value: Optional[str]):
-    """Normalize string for matching (lowercase, remove accents, collapse whitespace)."""
+    """Normalize string for matching (lowercase, remove accents, collapse whitespace).
+
+    Short strings (anchors, enum values, field names) are memoized in a bounded LRU.
+    """
     if value is None:
         return ""
 
-    normalized = unidecode(value)
-    normalized = normalized.lower()
-    normalized = " ".join(normalized.split())
+    if len(value) <= NORMALIZE_CACHE_MAX_LEN:
+        return _normalize_cached(value)
+
+    return _normalize(value)
+
+
+def normalize_with_offsets(value: Optional[str]):
+    """Normalize like normalize_str and map each normalized char back to its index in value."""
+    if not value:
+        return "", []
+
+    chars = []
+    offsets = []
+    pending_space = -1
+
+    for idx, ch in enumerate(value):
+        mapped = ch if ch.isascii() else unidecode(ch)
+
+        for out_ch in mapped:
+            if out_ch.isspace():
+                if chars and pending_space < 0:
+                    pending_space = idx
+                continue
+
+            if pending_space >= 0:
+                chars.append(" ")
+                offsets.append(pending_space)
+                pending_space = -1
+
+            chars.append(out_ch.lower())
+            offsets.append(idx)
 
-    return normalized
+    return "".join(chars), offsets
 
 
 def normalize_field(value: Any):
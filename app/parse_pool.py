@@ -0,0 +1,151 @@
+from typing import Dict, Any, Optional
+from array import array
+from concurrent.futures import ProcessPoolExecutor, wait
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+
+from app.normalize import normalize_with_offsets
+from app.pdf_parser import parse_pdf_bytes
+
+logger = logging.getLogger(__name__)
+
+PARSE_BACKEND = os.getenv("PARSE_BACKEND", "thread")
+PARSE_START_METHOD = os.getenv("PARSE_START_METHOD", "forkserver")
+# CPUs this process may run on (cgroup/taskset limits included), not the host's count
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0")) or (
+    len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+
+BBOX_KEYS = ("x0", "y0", "x1", "y1", "width", "height", "page")
+
+
+def pack_parse_result(result: Dict[str, Any]):
+    """Serialize a parse_pdf result compactly for the trip back from a worker.
+
+    Lines become flat tuples (no repeated dict keys), norm_offsets travel as raw
+    16-bit array bytes (32-bit for very long lines) and full_text is rebuilt from
+    the line texts on the other side.
+    """
+    rows = []
+    for line in result["lines"]:
+        bbox = line.get("bbox") or {}
+        offsets = line["norm_offsets"]
+        typecode = "H" if not offsets or offsets[-1] < 0x10000 else "I"
+        rows.append((
+            line["text"],
+            line["norm_text"],
+            typecode,
+            array(typecode, offsets).tobytes(),
+            line["y_rel"],
+            line["x_rel"],
+            tuple(bbox.get(key) for key in BBOX_KEYS) if bbox else None,
+            tuple((span["text"], *span["bbox"]) for span in line.get("spans", [])),
+        ))
+
+    return pickle.dumps((result.get("page_count", 0), rows), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def unpack_parse_result(payload: bytes):
+    """Inverse of pack_parse_result; returns the same dict parse_pdf produces."""
+    page_count, rows = pickle.loads(payload)
+
+    lines = []
+    for text, norm_text, typecode, offsets, y_rel, x_rel, bbox, spans in rows:
+        norm_offsets = array(typecode)
+        norm_offsets.frombytes(offsets)
+        lines.append({
+            "text": text,
+            "norm_text": norm_text,
+            "norm_offsets": norm_offsets.tolist(),
+            "y_rel": y_rel,
+            "x_rel": x_rel,
+            "bbox": dict(zip(BBOX_KEYS, bbox)) if bbox else {},
+            "spans": [{"text": span[0], "bbox": list(span[1:])} for span in spans],
+        })
+
+    return {
+        "lines": lines,
+        "full_text": "\n".join(line["text"] for line in lines),
+        "page_count": page_count,
+    }
+
+
+def _init_worker():
+    """Import PyMuPDF and warm the normalizer once per worker, not per document."""
+    import fitz  # noqa: F401
+    normalize_with_offsets("Inscrição Seccional")
+
+
+def _ready():
+    return os.getpid()
+
+
+def _parse_packed(pdf_bytes: bytes):
+    return pack_parse_result(parse_pdf_bytes(pdf_bytes))
+
+
+class ParsePool:
+    """Process pool for parse_pdf whose workers are spawned and warmed up front.
+
+    Parsing in threads serializes on the GIL for the pure-Python span grouping
+    and normalization; worker processes parse in parallel, one document each.
+    Workers start with PARSE_START_METHOD ("forkserver" by default) rather than
+    forking the server with its event loop and threads.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.tasks = 0
+        self.failures = 0
+
+    def start(self):
+        """Spawn every worker and wait until each has run its initializer."""
+        with self._lock:
+            if self._executor is not None:
+                return self._executor
+
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                           mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+            wait([executor.submit(_ready) for _ in range(self.workers)])
+            self._executor = executor
+
+            logger.info(f"Parse pool started with {self.workers} workers")
+            return executor
+
+    async def parse(self, pdf_bytes: bytes):
+        """Parse PDF bytes in a worker process."""
+        executor = self._executor or await asyncio.to_thread(self.start)
+        loop = asyncio.get_running_loop()
+
+        self.tasks += 1
+        try:
+            payload = await loop.run_in_executor(executor, _parse_packed, pdf_bytes)
+        except Exception:
+            self.failures += 1
+            raise
+
+        return unpack_parse_result(payload)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        return {
+            "backend": PARSE_BACKEND,
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "tasks": self.tasks,
+            "failures": self.failures,
+        }
+
+
+parse_pool = ParsePool(PARSE_WORKERS)
@@ -1,115 +1,180 @@
-from typing import Dict, BinaryIO
+from typing import Dict, Any, BinaryIO, List, Optional
+import io
+import os
 import fitz
 
+from app.normalize import normalize_with_offsets
+
+PARSE_TEXT_MODE = os.getenv("PARSE_TEXT_MODE", "text")
+
+# "dict" is PyMuPDF's default for get_text("dict"), which also decodes every
+# image into the output; "text" keeps the same text flags without images.
+TEXT_FLAGS = {
+    "dict": fitz.TEXTFLAGS_DICT,
+    "text": fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES,
+}
+
+if PARSE_TEXT_MODE not in TEXT_FLAGS:
+    raise ValueError(f"PARSE_TEXT_MODE must be one of {sorted(TEXT_FLAGS)}, got {PARSE_TEXT_MODE!r}")
+
 
 class Line:
     """Text line extracted from PDF."""
 
-    def __init__(self, text: str, y_rel: float, x_rel: float, bbox: Dict[str, float] = None):
+    def __init__(
+        self,
+        text: str,
+        y_rel: float,
+        x_rel: float,
+        bbox: Dict[str, float] = None,
+        spans: Optional[List[Dict[str, Any]]] = None
+    ):
         self.text = text
         self.y_rel = y_rel
         self.x_rel = x_rel
         self.bbox = bbox or {}
+        self.spans = spans or []
+        self.norm_text, self.norm_offsets = normalize_with_offsets(text)
 
     def to_dict(self):
         return {
             "text": self.text,
+            "norm_text": self.norm_text,
+            "norm_offsets": self.norm_offsets,
             "y_rel": self.y_rel,
             "x_rel": self.x_rel,
-            "bbox": self.bbox
+            "bbox": self.bbox,
+            "spans": self.spans
         }
 
 
-def parse_pdf(pdf_file: BinaryIO):
-    """Parse PDF and extract text lines with positional metadata."""
-    pdf_bytes = pdf_file.read()
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+def _page_lines(page, page_num: int, text_mode: str = PARSE_TEXT_MODE):
+    """Group the text spans of one page into lines."""
+    page_height = page.rect.height
+    page_width = page.rect.width
+
+    text_dict = page.get_text("dict", flags=TEXT_FLAGS[text_mode])
+    blocks = text_dict.get("blocks", [])
+
+    spans = []
+    for block in blocks:
+        if block.get("type") == 0:
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    bbox = span.get("bbox", [0, 0, 0, 0])
+                    spans.append({
+                        "text": span.get("text", ""),
+                        "bbox": bbox,
+                        "y": bbox[1],
+                        "x": bbox[0],
+                    })
 
-    all_lines = []
-    page_count = len(doc)
-
-    for page_num in range(page_count):
-        page = doc[page_num]
-        page_height = page.rect.height
-        page_width = page.rect.width
-
-        text_dict = page.get_text("dict")
-        blocks = text_dict.get("blocks", [])
-
-        spans = []
-        for block in blocks:
-            if block.get("type") == 0:
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        bbox = span.get("bbox", [0, 0, 0, 0])
-                        spans.append({
-                            "text": span.get("text", ""),
-                            "bbox": bbox,
-                            "y": bbox[1],
-                            "x": bbox[0],
-                        })
-
-        spans.sort(key=lambda s: (s["y"], s["x"]))
-
-        Y_TOLERANCE = 3.0
-        lines_grouped = []
-        current_line = []
-        current_y = None
-
-        for span in spans:
-            if not span["text"].strip():
-                continue
-
-            span_y = span["y"]
-
-            if current_y is None or abs(span_y - current_y) <= Y_TOLERANCE:
-                current_line.append(span)
-                if current_y is None:
-                    current_y = span_y
-            else:
-                if current_line:
-                    lines_grouped.append(current_line)
-                current_line = [span]
+    spans.sort(key=lambda s: (s["y"], s["x"]))
+
+    Y_TOLERANCE = 3.0
+    lines_grouped = []
+    current_line = []
+    current_y = None
+
+    for span in spans:
+        if not span["text"].strip():
+            continue
+
+        span_y = span["y"]
+
+        if current_y is None or abs(span_y - current_y) <= Y_TOLERANCE:
+            current_line.append(span)
+            if current_y is None:
                 current_y = span_y
+        else:
+            if current_line:
+                lines_grouped.append(current_line)
+            current_line = [span]
+            current_y = span_y
+
+    if current_line:
+        lines_grouped.append(current_line)
+
+    page_lines = []
+    for line_spans in lines_grouped:
+        line_spans.sort(key=lambda s: s["x"])
+        line_text = " ".join(s["text"] for s in line_spans)
+        x0 = min(s["bbox"][0] for s in line_spans)
+        y0 = min(s["bbox"][1] for s in line_spans)
+        x1 = max(s["bbox"][2] for s in line_spans)
+        y1 = max(s["bbox"][3] for s in line_spans)
+
+        y_rel = y0 / page_height if page_height > 0 else 0.0
+        x_rel = (x0 + x1) / 2 / page_width if page_width > 0 else 0.0
+
+        bbox = {
+            "x0": x0,
+            "y0": y0,
+            "x1": x1,
+            "y1": y1,
+            "width": x1 - x0,
+            "height": y1 - y0,
+            "page": page_num + 1
+        }
+
+        line = Line(
+            text=line_text,
+            y_rel=y_rel,
+            x_rel=x_rel,
+            bbox=bbox,
+            spans=[{"text": s["text"], "bbox": list(s["bbox"])} for s in line_spans]
+        )
+        page_lines.append(line)
+
+    return page_lines
 
-        if current_line:
-            lines_grouped.append(current_line)
-
-        for line_spans in lines_grouped:
-            line_spans.sort(key=lambda s: s["x"])
-            line_text = " ".join(s["text"] for s in line_spans)
-            x0 = min(s["bbox"][0] for s in line_spans)
-            y0 = min(s["bbox"][1] for s in line_spans)
-            x1 = max(s["bbox"][2] for s in line_spans)
-            y1 = max(s["bbox"][3] for s in line_spans)
-
-            y_rel = y0 / page_height if page_height > 0 else 0.0
-            x_rel = (x0 + x1) / 2 / page_width if page_width > 0 else 0.0
-
-            bbox = {
-                "x0": x0,
-                "y0": y0,
-                "x1": x1,
-                "y1": y1,
-                "width": x1 - x0,
-                "height": y1 - y0,
-                "page": page_num + 1
-            }
-
-            line = Line(
-                text=line_text,
-                y_rel=y_rel,
-                x_rel=x_rel,
-                bbox=bbox
-            )
-            all_lines.append(line)
-
-    doc.close()
-
-    full_text = "\n".join(line.text for line in all_lines)
+
+def iter_pdf_pages(pdf_bytes: bytes, page_order: Optional[List[int]] = None, text_mode: str = PARSE_TEXT_MODE):
+    """Yield (page_number, line dicts, page_count) one page at a time.
+
+    Page numbers are 1-based. Pages listed in page_order come first, the rest
+    follow in document order. Nothing past the current page is extracted, so a
+    consumer that stops early (or closes the generator) never pays for the rest.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+    try:
+        page_count = len(doc)
+        preferred = [n for n in dict.fromkeys(page_order or []) if 1 <= n <= page_count]
+        seen = set(preferred)
+        order = preferred + [n for n in range(1, page_count + 1) if n not in seen]
+
+        for page_number in order:
+            lines = _page_lines(doc[page_number - 1], page_number - 1, text_mode)
+            yield page_number, [line.to_dict() for line in lines], page_count
+
+    finally:
+        doc.close()
+
+
+def assemble_parse_result(pages: Dict[int, List[Dict[str, Any]]]):
+    """Build the parse_pdf result from every page's lines, in document order."""
+    all_lines = [line for page_number in sorted(pages) for line in pages[page_number]]
 
     return {
-        "lines": [line.to_dict() for line in all_lines],
-        "full_text": full_text,
-        "page_count": page_count
+        "lines": all_lines,
+        "full_text": "\n".join(line["text"] for line in all_lines),
+        "page_count": len(pages)
     }
+
+
+def parse_pdf(pdf_file: BinaryIO, text_mode: str = PARSE_TEXT_MODE):
+    """Parse PDF and extract text lines with positional metadata.
+
+    Each line carries its normalized text ("norm_text", see normalize_str) and
+    "norm_offsets", the index in "text" of every normalized char, so matching
+    code never has to re-normalize line text. text_mode selects the PyMuPDF
+    extraction flags (see TEXT_FLAGS); both modes produce the same lines.
+    """
+    pages = {number: lines for number, lines, _ in iter_pdf_pages(pdf_file.read(), text_mode=text_mode)}
+    return assemble_parse_result(pages)
+
+
+def parse_pdf_bytes(pdf_bytes: bytes):
+    """parse_pdf for raw bytes (picklable entry point for process pools)."""
+    return parse_pdf(io.BytesIO(pdf_bytes))
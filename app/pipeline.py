@@ -1,125 +1,547 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass, field as dataclass_field
+import asyncio
 import logging
-import time
+import os
 
-from app.kb import load_kb, init_from_schema, save_kb, update_kb
+from app.cache import field_cache
+from app.deadline import Deadline, batch_llm_latency, llm_timeout
+from app.kb import load_kb, load_kb_versioned, init_from_schema, preferred_pages, save_kb, update_kb, weak_fields
 from app.heuristics import extract_candidates, score_candidates, select_best, ACCEPT_THRESHOLD
+from app.layout import DocumentLayout, layout_evidence, match_template, read_template
+from app.matcher import get_matcher
+from app.spatial import SpatialIndex
 from app.normalize import normalize_field
-from app.llm import resolve_batched_gpt5_mini
+from app.llm import resolve_multi_document
+from app.llm_batcher import llm_batcher
+from app.metrics import observe_stage, record_fields
+from app.pdf_parser import assemble_parse_result, iter_pdf_pages
 
 logger = logging.getLogger(__name__)
 
-LLM_TIMEOUT = 8.0
-MIN_TIME_FOR_LLM = 2.5
+SPECULATIVE_LLM = os.getenv("SPECULATIVE_LLM", "1") == "1"
+SPECULATIVE_MIN_ATTEMPTS = int(os.getenv("SPECULATIVE_MIN_ATTEMPTS", "5"))
+SPECULATIVE_MAX_ACCEPT_RATE = float(os.getenv("SPECULATIVE_MAX_ACCEPT_RATE", "0.2"))
 
+BATCH_LLM_MAX_DOCS = int(os.getenv("BATCH_LLM_MAX_DOCS", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_LLM_TIMEOUT = float(os.getenv("BATCH_LLM_TIMEOUT", "20.0"))
 
-def run_extraction_pipeline(
+
+@dataclass
+class HeuristicPass:
+    """Outcome of the heuristic stage for one document."""
+    results: Dict[str, Any] = dataclass_field(default_factory=dict)
+    uncertain_fields: List[str] = dataclass_field(default_factory=list)
+    candidates_by_field: Dict[str, List[str]] = dataclass_field(default_factory=dict)
+    heuristic_evidence: Dict[str, Dict[str, Any]] = dataclass_field(default_factory=dict)
+    sources: Dict[str, str] = dataclass_field(default_factory=dict)
+    cache_generation: int = 0
+    lines: List[Dict[str, Any]] = dataclass_field(default_factory=list)
+    labels: List[str] = dataclass_field(default_factory=list)
+    template: Optional[str] = None
+
+
+def _label_kb(label: str, schema: Dict[str, str]):
+    """The label's KB and its version, initialized from schema on first use."""
+    kb, version = load_kb_versioned(label)
+    if not kb.get("anchors"):
+        save_kb(label, init_from_schema(label, schema))
+        kb, version = load_kb_versioned(label)
+    return kb, version
+
+
+def run_heuristics(
     pdf_lines: List[Dict[str, Any]],
-    doc_text: str,
     schema: Dict[str, str],
     label: str,
-    timeout_seconds: float = 9.0
+    doc_hash: Optional[str] = None,
+    use_cache: bool = True
 ):
-    """Orchestrate the full extraction pipeline."""
-    start_time = time.time()
+    """Resolve cached, template and heuristic fields; everything else ends up in uncertain_fields.
 
-    kb = load_kb(label)
-    if not kb.get("anchors"):
-        kb = init_from_schema(label, schema)
-        save_kb(label, kb)
-
-    results = {}
-    uncertain_fields = []
-    candidates_by_field = {}
-    heuristic_evidence = {}
-    extraction_metadata = {
-        "processing_time": 0.0,
-        "llm_used": False,
-    }
+    When the document matches a layout template learned for the label, the
+    fields the template knows are read straight from their regions; anchor
+    scanning only runs if some field is left.
+    """
+    state = HeuristicPass(cache_generation=field_cache.generation(label), lines=pdf_lines)
+    kb, kb_version = _label_kb(label, schema)
+
+    matcher = get_matcher(label, kb_version, kb.get("anchors", {}))
+    state.labels = matcher.patterns
+
+    template_values = {}
+    if kb.get("templates"):
+        layout = DocumentLayout(pdf_lines, matcher.patterns)
+        state.template = match_template(layout, kb["templates"])
+        if state.template:
+            template_values = read_template(layout, kb["templates"][state.template], schema)
 
-    line_positions = [line.get("y_rel", 0.5) for line in pdf_lines]
+    anchor_hits = spatial = line_positions = None
 
     for field, field_desc in schema.items():
+        if doc_hash and use_cache:
+            cached = field_cache.get(doc_hash, label, field, field_desc)
+            if cached is not None:
+                state.results[field] = cached["value"]
+                state.sources[field] = "cache"
+                continue
+
+        if field in template_values:
+            state.results[field] = template_values[field]
+            state.sources[field] = "template"
+
+            if doc_hash:
+                field_cache.put(doc_hash, label, field, field_desc, template_values[field],
+                                "template", state.cache_generation)
+            continue
+
+        if spatial is None:
+            anchor_hits = matcher.find_hits(pdf_lines)
+            spatial = SpatialIndex(pdf_lines, labels=matcher.patterns)
+            line_positions = [line.get("y_rel", 0.5) for line in pdf_lines]
+
         kb_field = {
             "anchors": kb.get("anchors", {}).get(field, []),
             "enums": kb.get("enums", {}).get(field, []),
             "region_hint": kb.get("region_hint", {}).get(field, "")
         }
 
-        candidates = extract_candidates(pdf_lines, field, field_desc, kb_field)
+        candidates = extract_candidates(
+            pdf_lines, field, field_desc, kb_field,
+            anchor_hits=anchor_hits.get(field, []),
+            spatial=spatial
+        )
 
         if not candidates:
-            uncertain_fields.append(field)
-            results[field] = None
+            state.uncertain_fields.append(field)
+            state.results[field] = None
             continue
 
         scored = score_candidates(candidates, kb_field, line_positions)
         best, top_k = select_best(scored)
 
-        candidates_by_field[field] = [c.value for c in top_k]
+        state.candidates_by_field[field] = [c.value for c in top_k]
 
         if best and best.total_score >= ACCEPT_THRESHOLD:
             normalized = normalize_field(best.value)
-            results[field] = normalized
+            state.results[field] = normalized
+            state.sources[field] = "heuristic"
 
-            line_text = pdf_lines[best.line_idx].get(
-                "text", "") if best.line_idx < len(pdf_lines) else ""
-            x_rel = pdf_lines[best.line_idx].get(
-                "x_rel", 0.5) if best.line_idx < len(pdf_lines) else 0.5
-            y_rel = pdf_lines[best.line_idx].get(
-                "y_rel", 0.5) if best.line_idx < len(pdf_lines) else 0.5
+            if doc_hash:
+                field_cache.put(doc_hash, label, field, field_desc, normalized,
+                                "heuristic", state.cache_generation)
 
-            heuristic_evidence[field] = {
+            line = pdf_lines[best.line_idx] if best.line_idx < len(pdf_lines) else {}
+
+            state.heuristic_evidence[field] = {
                 "anchor_used": best.anchor_used,
                 "method": best.method,
-                "line_text": line_text,
+                "line_text": line.get("text", ""),
                 "score": best.total_score,
-                "position": (x_rel, y_rel)
+                "position": (line.get("x_rel", 0.5), line.get("y_rel", 0.5)),
+                "page": line.get("bbox", {}).get("page")
             }
         else:
-            uncertain_fields.append(field)
-            results[field] = None
+            state.uncertain_fields.append(field)
+            state.results[field] = None
 
-    elapsed = time.time() - start_time
-    time_remaining = timeout_seconds - elapsed
+    return state
 
-    llm_results = {}
-    if uncertain_fields and time_remaining > MIN_TIME_FOR_LLM:
-        extraction_metadata["llm_used"] = True
 
-        try:
-            llm_results = resolve_batched_gpt5_mini(
-                doc_text=doc_text,
-                schema=schema,
-                uncertain_fields=uncertain_fields,
-                candidates_by_field=candidates_by_field,
-                timeout_seconds=LLM_TIMEOUT
-            )
+def run_heuristics_lazy(
+    pdf_bytes: bytes,
+    schema: Dict[str, str],
+    label: str,
+    doc_hash: Optional[str] = None,
+    use_cache: bool = True,
+    full_pass: bool = True
+):
+    """Parse page by page and stop as soon as every field has an accepted value.
+
+    Returns (state, parse_result); parse_result is None when parsing stopped early.
+    """
+    state = HeuristicPass(cache_generation=field_cache.generation(label))
+    remaining = dict(schema)
+
+    if doc_hash and use_cache:
+        for field, field_desc in schema.items():
+            cached = field_cache.get(doc_hash, label, field, field_desc)
+            if cached is not None:
+                state.results[field] = cached["value"]
+                state.sources[field] = "cache"
+                del remaining[field]
+
+    if not remaining:
+        return state, None
+
+    pages = {}
+    page_iter = iter_pdf_pages(pdf_bytes, preferred_pages(_label_kb(label, schema)[0], remaining))
 
-            for field, llm_data in llm_results.items():
-                value = llm_data.get("value")
-                if value:
-                    normalized = normalize_field(value)
-                    if normalized:
-                        results[field] = normalized
+    try:
+        for page_number, lines, page_count in page_iter:
+            pages[page_number] = lines
+            if len(pages) == page_count:
+                break
 
-        except Exception as e:
-            logger.error(f"LLM resolution failed: {e}")
+            page_pass = run_heuristics(lines, remaining, label, use_cache=False)
+            state.template = state.template or page_pass.template
+            for field, source in page_pass.sources.items():
+                state.results[field] = page_pass.results[field]
+                state.sources[field] = source
+                if field in page_pass.heuristic_evidence:
+                    state.heuristic_evidence[field] = page_pass.heuristic_evidence[field]
+                del remaining[field]
 
-    if heuristic_evidence or llm_results:
-        try:
+            if not remaining:
+                break
+    finally:
+        page_iter.close()
+
+    if not remaining:
+        state.lines = [line for page in pages.values() for line in page]
+        state.labels = page_pass.labels
+        if doc_hash:
+            for field, source in state.sources.items():
+                if source != "cache":
+                    field_cache.put(doc_hash, label, field, schema[field], state.results[field],
+                                    source, state.cache_generation)
+        return state, None
+
+    parse_result = assemble_parse_result(pages)
+    if not full_pass:
+        return None, parse_result
+    return run_heuristics(parse_result["lines"], schema, label, doc_hash, use_cache), parse_result
+
+
+def apply_llm_results(
+    state: HeuristicPass,
+    llm_results: Dict[str, Dict[str, Any]],
+    schema: Dict[str, str],
+    label: str,
+    doc_hash: Optional[str] = None
+):
+    """Merge LLM answers into the results; return the fields that got a value."""
+    resolved = []
+
+    for field, llm_data in llm_results.items():
+        value = llm_data.get("value")
+        if value:
+            normalized = normalize_field(value)
+            if normalized:
+                state.results[field] = normalized
+                state.sources[field] = "llm"
+                resolved.append(field)
+
+                if doc_hash:
+                    field_cache.put(doc_hash, label, field, schema.get(field, ""),
+                                    normalized, "llm", state.cache_generation)
+
+    return resolved
+
+
+def learn_from_results(label: str, state: HeuristicPass, llm_results: Dict[str, Dict[str, Any]]):
+    """Feed confirmed extractions back into the label KB, including the document's layout template."""
+    try:
+        learned = {field: value for field, value in state.results.items() if state.sources.get(field) != "template"}
+        layout = layout_evidence(state.lines, state.labels, learned, state.template) if state.lines else None
+        field_outcomes = {
+            field: field not in state.uncertain_fields
+            for field in state.results
+            if state.sources.get(field) != "cache"
+        }
+        with observe_stage("update_kb", label):
             update_kb(
                 label=label,
-                extraction_results=results,
-                heuristic_evidence=heuristic_evidence,
-                llm_metadata=llm_results
+                extraction_results=state.results,
+                heuristic_evidence=state.heuristic_evidence,
+                llm_metadata=llm_results,
+                layout=layout,
+                field_outcomes=field_outcomes
             )
-        except Exception as e:
-            logger.error(f"KB update failed: {e}")
+    except Exception as e:
+        logger.error(f"KB update failed: {e}")
+
+
+def _start_speculative_llm(
+    doc_text: str,
+    schema: Dict[str, str],
+    label: str,
+    doc_hash: Optional[str],
+    use_cache: bool,
+    deadline: Deadline
+):
+    """Send the fields the heuristics rarely accept to the LLM before the heuristic pass.
+
+    The call goes out without candidates_by_field, since the heuristics have not
+    produced any yet (see iter_extraction_events for the follow-up call).
+    Returns (fields, task) or None when there is nothing to speculate on.
+    """
+    if not SPECULATIVE_LLM or not doc_text:
+        return None
+
+    fields = weak_fields(load_kb(label), schema, SPECULATIVE_MIN_ATTEMPTS, SPECULATIVE_MAX_ACCEPT_RATE)
+    if doc_hash and use_cache:
+        fields = [field for field in fields if not field_cache.has(doc_hash, label, field, schema[field])]
+
+    timeout = llm_timeout(deadline) if fields else None
+    if timeout is None:
+        return None
+
+    task = asyncio.create_task(llm_batcher.resolve(
+        label=label,
+        doc_text=doc_text,
+        schema=schema,
+        uncertain_fields=fields,
+        timeout_seconds=timeout,
+        use_cache=use_cache,
+        anchors_by_field=load_kb(label).get("anchors")
+    ))
+    return fields, task
+
+
+async def iter_extraction_events(
+    pdf_lines: List[Dict[str, Any]],
+    doc_text: str,
+    schema: Dict[str, str],
+    label: str,
+    timeout_seconds: float = 9.0,
+    doc_hash: Optional[str] = None,
+    use_cache: bool = True,
+    heuristics: Optional[HeuristicPass] = None,
+    deadline: Optional[Deadline] = None
+):
+    """Run the pipeline for one document, yielding results as soon as they are final.
+
+    Yields a {"type": "field"} event per field (cache and heuristic ones first,
+    LLM ones after), then one {"type": "metadata"} event.
+    """
+    if deadline is None:
+        deadline = Deadline(timeout_seconds)
+
+    speculative = None
+    state = heuristics
+    if state is None:
+        speculative = _start_speculative_llm(doc_text, schema, label, doc_hash, use_cache, deadline)
+
+    try:
+        if state is None:
+            with observe_stage("heuristics", label):
+                state = await asyncio.to_thread(run_heuristics, pdf_lines, schema, label, doc_hash, use_cache)
+
+        for field, source in state.sources.items():
+            yield {"type": "field", "field": field, "value": state.results[field], "source": source}
+
+        speculative_fields = []
+        if speculative is not None:
+            speculative_fields, speculative_task = speculative
+            if not any(field in state.uncertain_fields for field in speculative_fields):
+                speculative_task.cancel()
+                speculative_fields = []
+
+        remaining = [field for field in state.uncertain_fields if field not in speculative_fields]
+        timeout = llm_timeout(deadline) if remaining else None
+        if remaining and timeout is None:
+            logger.info(f"Skipping LLM for {len(remaining)} fields: "
+                        f"{deadline.remaining():.2f}s left of the request budget")
+
+        calls = []
+        if speculative_fields:
+            calls.append(speculative_task)
+        if timeout is not None:
+            calls.append(llm_batcher.resolve(
+                label=label,
+                doc_text=doc_text,
+                schema=schema,
+                uncertain_fields=remaining,
+                candidates_by_field=state.candidates_by_field,
+                timeout_seconds=timeout,
+                use_cache=use_cache,
+                anchors_by_field=load_kb(label).get("anchors")
+            ))
 
-    extraction_metadata["processing_time"] = time.time() - start_time
+        llm_used = bool(calls)
+        llm_results = {}
+        if calls:
+            try:
+                with observe_stage("llm", label):
+                    answers = await asyncio.gather(*calls)
+                    for call_results in answers:
+                        llm_results.update({
+                            field: data for field, data in call_results.items() if field in state.uncertain_fields
+                        })
+
+                    follow_up = [
+                        field for field in speculative_fields
+                        if field in state.uncertain_fields and state.candidates_by_field.get(field)
+                        and not (llm_results.get(field) or {}).get("value")
+                    ]
+                    timeout = llm_timeout(deadline) if follow_up else None
+                    if timeout is not None:
+                        follow_up_results = await llm_batcher.resolve(
+                            label=label,
+                            doc_text=doc_text,
+                            schema=schema,
+                            uncertain_fields=follow_up,
+                            candidates_by_field=state.candidates_by_field,
+                            timeout_seconds=timeout,
+                            use_cache=use_cache,
+                            anchors_by_field=load_kb(label).get("anchors")
+                        )
+                        llm_results.update({
+                            field: data for field, data in follow_up_results.items() if data.get("value")
+                        })
+
+                apply_llm_results(state, llm_results, schema, label, doc_hash)
+
+            except Exception as e:
+                logger.error(f"LLM resolution failed: {e}")
+
+        for field in state.uncertain_fields:
+            yield {"type": "field", "field": field, "value": state.results[field],
+                   "source": state.sources.get(field)}
+
+        record_fields(label, state.results, state.sources)
+
+        if state.heuristic_evidence or llm_results:
+            await asyncio.to_thread(learn_from_results, label, state, llm_results)
+
+    finally:
+        if speculative is not None:
+            speculative[1].cancel()
+
+    yield {"type": "metadata", "processing_time": deadline.elapsed(), "llm_used": llm_used}
+
+
+async def run_extraction_pipeline(
+    pdf_lines: List[Dict[str, Any]],
+    doc_text: str,
+    schema: Dict[str, str],
+    label: str,
+    timeout_seconds: float = 9.0,
+    doc_hash: Optional[str] = None,
+    use_cache: bool = True,
+    heuristics: Optional[HeuristicPass] = None,
+    deadline: Optional[Deadline] = None
+):
+    """Orchestrate the full extraction pipeline (see iter_extraction_events).
+
+    When doc_hash is given, final field values are cached per (document, label,
+    field, description) and reused on resubmission. use_cache=False bypasses the
+    field and LLM response caches for lookups (fresh results are still stored).
+    """
+    results = {field: None for field in schema}
+    extraction_metadata = {}
+
+    async for event in iter_extraction_events(
+            pdf_lines, doc_text, schema, label, timeout_seconds, doc_hash, use_cache, heuristics, deadline):
+        if event["type"] == "field":
+            results[event["field"]] = event["value"]
+        else:
+            extraction_metadata = {key: value for key, value in event.items() if key != "type"}
 
     return {
         "fields": results,
         "metadata": extraction_metadata
     }
+
+
+async def iter_batch_events(
+    documents: List[Dict[str, Any]],
+    schema: Dict[str, str],
+    label: str,
+    timeout_seconds: float = 60.0,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+):
+    """Extract the same schema from many documents of one label, yielding each document when done.
+
+    Each document is a dict with "pdf_lines", "doc_text" and optionally
+    "doc_hash". Heuristics run per document; the uncertain fields of the whole
+    batch are then resolved in ceil(n / BATCH_LLM_MAX_DOCS) multi-document LLM
+    calls, at most BATCH_LLM_CONCURRENCY at a time. Each call's timeout is
+    decided when it starts, from what is left of deadline (timeout_seconds
+    from now when not given) and recent batch call latencies.
+
+    Yields {"type": "document", "index", "fields", "metadata"} per document
+    (documents that need no LLM first, the rest as their LLM call completes),
+    then a final {"type": "metadata", "processing_time", "llm_calls"} event.
+    """
+    if deadline is None:
+        deadline = Deadline(timeout_seconds)
+
+    def heuristics_for(doc):
+        with observe_stage("heuristics", label):
+            return run_heuristics(doc["pdf_lines"], schema, label, doc.get("doc_hash"), use_cache)
+
+    def heuristics_for_all():
+        return [heuristics_for(doc) for doc in documents]
+
+    states = await asyncio.to_thread(heuristics_for_all)
+
+    def finish(llm_results_by_doc: Dict[str, Dict[str, Any]], indices: List[int]):
+        events = []
+        for idx in indices:
+            state = states[idx]
+            llm_results = llm_results_by_doc.get(str(idx), {})
+            if llm_results:
+                apply_llm_results(state, llm_results, schema, label, documents[idx].get("doc_hash"))
+            record_fields(label, state.results, state.sources)
+            if state.heuristic_evidence or llm_results:
+                learn_from_results(label, state, llm_results)
+            events.append({
+                "type": "document",
+                "index": idx,
+                "fields": state.results,
+                "metadata": {"llm_used": str(idx) in llm_results_by_doc},
+            })
+        return events
+
+    pending = [
+        {
+            "id": str(idx),
+            "doc_text": doc["doc_text"],
+            "uncertain_fields": states[idx].uncertain_fields,
+            "candidates_by_field": states[idx].candidates_by_field,
+        }
+        for idx, doc in enumerate(documents)
+        if states[idx].uncertain_fields
+    ]
+
+    chunks = [pending[i:i + BATCH_LLM_MAX_DOCS] for i in range(0, len(pending), BATCH_LLM_MAX_DOCS)]
+    if chunks and llm_timeout(deadline, batch_llm_latency, BATCH_LLM_TIMEOUT) is None:
+        chunks = []
+
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    anchors_by_field = load_kb(label).get("anchors")
+    llm_calls = 0
+
+    async def resolve_chunk(chunk):
+        nonlocal llm_calls
+        async with semaphore:
+            timeout = llm_timeout(deadline, batch_llm_latency, BATCH_LLM_TIMEOUT)
+            if timeout is None:
+                return chunk, {}
+            llm_calls += 1
+            with observe_stage("llm", label):
+                return chunk, await resolve_multi_document(schema, chunk, timeout, use_cache, anchors_by_field)
+
+    tasks = [asyncio.create_task(resolve_chunk(chunk)) for chunk in chunks]
+
+    try:
+        waiting = {int(doc["id"]) for chunk in chunks for doc in chunk}
+        ready = [idx for idx in range(len(documents)) if idx not in waiting]
+        for event in await asyncio.to_thread(finish, {}, ready):
+            yield event
+
+        for next_done in asyncio.as_completed(tasks):
+            chunk, chunk_results = await next_done
+            indices = [int(doc["id"]) for doc in chunk]
+            for event in await asyncio.to_thread(finish, chunk_results, indices):
+                yield event
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield {"type": "metadata", "processing_time": deadline.elapsed(), "llm_calls": llm_calls}
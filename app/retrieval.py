@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional
+from collections import Counter
+import math
+import os
+import re
+
+from app.normalize import normalize_str
+
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "500"))
+CHARS_PER_TOKEN = 4
+CONTEXT_HITS_PER_FIELD = 3
+CONTEXT_NEIGHBOURS = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+GAP_MARKER = "[...]"
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str):
+    # normalizing word by word hits normalize_str's memo, unlike whole lines
+    return [normalize_str(word) for word in _TOKEN_PATTERN.findall(text)]
+
+
+class LineIndex:
+    """BM25 index over the lines of one document (each line is a BM25 document).
+
+    Postings are built on demand for the tokens that queries actually use.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self._counts = [Counter(tokenize(line)) for line in lines]
+        self._lengths = [sum(counts.values()) for counts in self._counts]
+        self._avg_length = (sum(self._lengths) / len(lines)) if lines else 0.0
+        self._postings: Dict[str, List[tuple]] = {}
+
+    def postings(self, token: str):
+        """(line_idx, term frequency) of every line containing token."""
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = [(line_idx, counts[token]) for line_idx, counts in enumerate(self._counts)
+                        if token in counts]
+            self._postings[token] = postings
+        return postings
+
+    def search(self, query: str):
+        """Line indices with a positive BM25 score for query, best first."""
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self.postings(token)
+            idf = math.log(1 + (len(self.lines) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for line_idx, tf in postings:
+                norm = 1 - BM25_B + BM25_B * self._lengths[line_idx] / (self._avg_length or 1.0)
+                scores[line_idx] = scores.get(line_idx, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        return sorted(scores, key=lambda line_idx: (-scores[line_idx], line_idx))
+
+
+def field_query(field: str, description: str = "", anchors: Optional[List[str]] = None,
+                candidates: Optional[List[str]] = None):
+    """Query text for one field: its name, description, KB anchors and candidate values."""
+    parts = [field.replace("_", " "), description]
+    parts.extend(anchors or [])
+    parts.extend(candidates or [])
+    return " ".join(part for part in parts if part)
+
+
+def select_context(doc_text: str, queries: List[str], max_tokens: int = LLM_CONTEXT_TOKENS):
+    """Lines of doc_text most relevant to the queries, with their neighbours, under a token budget.
+
+    Documents within the budget are returned unchanged.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    if len(doc_text) <= budget:
+        return doc_text
+
+    lines = doc_text.split("\n")
+    index = LineIndex(lines)
+    rankings = [index.search(query)[:CONTEXT_HITS_PER_FIELD] for query in queries]
+
+    selected = set()
+    used = 0
+
+    def take(line_idx: int):
+        nonlocal used
+        if line_idx in selected or not 0 <= line_idx < len(lines):
+            return True
+        cost = len(lines[line_idx]) + 1
+        if used + cost > budget:
+            return False
+        selected.add(line_idx)
+        used += cost
+        return True
+
+    depth = 0
+    while any(depth < len(ranking) for ranking in rankings):
+        for ranking in rankings:
+            if depth >= len(ranking):
+                continue
+            hit = ranking[depth]
+            if not take(hit):
+                continue
+            for offset in range(1, CONTEXT_NEIGHBOURS + 1):
+                take(hit + offset)
+                take(hit - offset)
+        depth += 1
+
+    if not selected:
+        return doc_text[:budget] + "\n" + GAP_MARKER
+
+    output = []
+    previous = -1
+    for line_idx in sorted(selected):
+        if line_idx != previous + 1:
+            output.append(GAP_MARKER)
+        output.append(lines[line_idx])
+        previous = line_idx
+    if previous != len(lines) - 1:
+        output.append(GAP_MARKER)
+
+    return "\n".join(output)
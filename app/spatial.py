@@ -0,0 +1,156 @@
+from typing import Dict, Any, List, Optional, Tuple
+import math
+
+from app.normalize import normalize_str, normalize_with_offsets
+
+GRID_CELL_SIZE = 64.0
+RIGHT_OF_MAX_GAP = 25.0
+BELOW_MAX_GAP = 2.5
+
+Box = Tuple[float, float, float, float]
+
+
+class SpatialIndex:
+    """Uniform grid over the span boxes of one document, bucketed per page.
+
+    Lines without span data (e.g. parse results cached before spans were
+    emitted) are indexed with their line bbox as a single span. Coordinates are
+    PDF points, as in the parser's bboxes. labels are normalized label texts
+    (the KB anchors) that is_label() recognizes.
+    """
+
+    def __init__(self, lines: List[Dict[str, Any]], labels=(), cell_size: float = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.labels = set(labels)
+        self.boxes: List[Box] = []
+        self.entries: List[Tuple[int, int, int]] = []
+        self.texts: List[str] = []
+        self._cells: Dict[Tuple[int, int, int], List[int]] = {}
+        self._by_span: Dict[Tuple[int, int], int] = {}
+
+        for line_idx, line in enumerate(lines):
+            line_bbox = line.get("bbox") or {}
+            page = line_bbox.get("page", 1)
+
+            spans = line.get("spans")
+            if not spans:
+                if not line_bbox:
+                    continue
+                spans = [{"text": line.get("text", ""), "bbox": [
+                    line_bbox["x0"], line_bbox["y0"], line_bbox["x1"], line_bbox["y1"]]}]
+
+            for span_idx, span in enumerate(spans):
+                self._insert(line_idx, span_idx, page, tuple(span["bbox"]), span["text"])
+
+    def _cell_range(self, low: float, high: float):
+        return range(math.floor(low / self.cell_size), math.floor(high / self.cell_size) + 1)
+
+    def _insert(self, line_idx: int, span_idx: int, page: int, box: Box, text: str):
+        entry_id = len(self.boxes)
+        self.boxes.append(box)
+        self.entries.append((line_idx, span_idx, page))
+        self.texts.append(text)
+        self._by_span[(line_idx, span_idx)] = entry_id
+
+        x0, y0, x1, y1 = box
+        for cx in self._cell_range(x0, x1):
+            for cy in self._cell_range(y0, y1):
+                self._cells.setdefault((page, cx, cy), []).append(entry_id)
+
+    def _query(self, page: int, x0: float, y0: float, x1: float, y1: float):
+        """Ids of the boxes in the grid cells that intersect a rectangle."""
+        found = set()
+        for cx in self._cell_range(x0, x1):
+            for cy in self._cell_range(y0, y1):
+                found.update(self._cells.get((page, cx, cy), ()))
+        return found
+
+    def entry_id(self, line_idx: int, span_idx: int):
+        return self._by_span.get((line_idx, span_idx))
+
+    def is_label(self, entry_id: int):
+        """True when a box holds a label ("Something:" or a known anchor), not a value."""
+        text = self.texts[entry_id].strip()
+        return text.endswith((':', ':')) or normalize_str(text).strip(" :-") in self.labels
+
+    def right_of(self, entry_id: int, box: Box, max_gap: Optional[float] = None):
+        """Nearest box on the same row to the right of box (a sub-box of entry_id), or None."""
+        _, _, page = self.entries[entry_id]
+        x0, y0, x1, y1 = box
+        height = y1 - y0
+        if max_gap is None:
+            max_gap = RIGHT_OF_MAX_GAP * height
+
+        best, best_gap = None, None
+        for other in self._query(page, x1, y0, x1 + max_gap, y1):
+            if other == entry_id:
+                continue
+
+            ox0, oy0, ox1, oy1 = self.boxes[other]
+            overlap = min(y1, oy1) - max(y0, oy0)
+            gap = ox0 - x1
+            if overlap < 0.5 * min(height, oy1 - oy0) or gap < -1.0 or gap > max_gap:
+                continue
+
+            if best_gap is None or gap < best_gap:
+                best, best_gap = other, gap
+
+        return best
+
+    def below(self, entry_id: int, box: Box, max_gap: Optional[float] = None):
+        """Nearest box below box (a sub-box of entry_id) that overlaps it horizontally, or None."""
+        _, _, page = self.entries[entry_id]
+        x0, y0, x1, y1 = box
+        height = y1 - y0
+        if max_gap is None:
+            max_gap = BELOW_MAX_GAP * height
+
+        middle = (y0 + y1) / 2
+        best, best_key = None, None
+        for other in self._query(page, x0, middle, x1, y1 + max_gap):
+            if other == entry_id:
+                continue
+
+            ox0, oy0, ox1, oy1 = self.boxes[other]
+            overlap = min(x1, ox1) - max(x0, ox0)
+            gap = oy0 - y1
+            if overlap <= 0 or oy0 <= middle or gap > max_gap:
+                continue
+
+            key = (gap, -overlap)
+            if best_key is None or key < best_key:
+                best, best_key = other, key
+
+        return best
+
+
+def anchor_box(index: SpatialIndex, line: Dict[str, Any], line_idx: int, norm_anchor: str):
+    """Locate an anchor inside one of a line's spans.
+
+    Returns (entry_id, box, rest) where box is the anchor's share of the span
+    bbox (by character position) and rest is the span text after the anchor,
+    or None when no single span contains the anchor.
+    """
+    if not norm_anchor:
+        return None
+
+    for span_idx, span in enumerate(line.get("spans") or [line]):
+        text = span.get("text", "")
+        norm_text, norm_offsets = normalize_with_offsets(text)
+        start = norm_text.find(norm_anchor)
+        if start == -1:
+            continue
+
+        entry_id = index.entry_id(line_idx, span_idx)
+        if entry_id is None:
+            return None
+
+        char_start = norm_offsets[start]
+        char_end = norm_offsets[start + len(norm_anchor) - 1] + 1
+        x0, y0, x1, y1 = index.boxes[entry_id]
+        width = (x1 - x0) / max(len(text), 1)
+
+        box = (x0 + width * char_start, y0, x0 + width * char_end, y1)
+        return entry_id, box, text[char_end:]
+
+    return None
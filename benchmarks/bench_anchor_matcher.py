@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Benchmark naive line x anchor scanning against the Aho-Corasick AnchorMatcher.
+
+Usage: python benchmarks/bench_anchor_matcher.py [--repeat 20]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.pdf_parser import parse_pdf
+from app.heuristics import extract_candidates
+from app.matcher import AnchorMatcher
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+FIELDS = ["nome", "inscricao", "seccional", "subsecao", "categoria",
+          "endereco_profissional", "telefone_profissional", "situacao"]
+ANCHOR_COUNTS = [5, 25, 100, 400, 1600]
+
+
+def load_lines():
+    lines = []
+    for pdf_path in sorted(EXAMPLES_DIR.glob("*.pdf")):
+        with open(pdf_path, "rb") as f:
+            lines.extend(parse_pdf(f)["lines"])
+    return lines
+
+
+def make_anchors(n: int, rng: random.Random):
+    anchors_by_field = {}
+    for field in FIELDS:
+        anchors = [field.replace("_", " ")]
+        while len(anchors) < n:
+            length = rng.randint(4, 14)
+            anchors.append("".join(rng.choice(string.ascii_lowercase + " ") for _ in range(length)).strip() or "x")
+        anchors_by_field[field] = anchors
+    return anchors_by_field
+
+
+def time_it(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    lines = load_lines()
+    rng = random.Random(42)
+
+    print(f"{len(lines)} lines, {len(FIELDS)} fields")
+    print(f"{'anchors/field':>14} {'naive ms':>10} {'matcher ms':>11} {'build ms':>9} {'speed-up':>9}")
+
+    for n in ANCHOR_COUNTS:
+        anchors_by_field = make_anchors(n, rng)
+
+        def naive():
+            for field in FIELDS:
+                extract_candidates(lines, field, "", {"anchors": anchors_by_field[field]})
+
+        build_start = time.perf_counter()
+        matcher = AnchorMatcher(anchors_by_field)
+        build_time = time.perf_counter() - build_start
+
+        def automaton():
+            hits = matcher.find_hits(lines)
+            for field in FIELDS:
+                extract_candidates(
+                    lines, field, "", {"anchors": anchors_by_field[field]},
+                    anchor_hits=hits.get(field, [])
+                )
+
+        naive_time = time_it(naive, max(1, args.repeat // max(1, n // 25)))
+        matcher_time = time_it(automaton, args.repeat)
+
+        print(f"{n:>14} {naive_time * 1000:>10.2f} {matcher_time * 1000:>11.2f} "
+              f"{build_time * 1000:>9.2f} {naive_time / matcher_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
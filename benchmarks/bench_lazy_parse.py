@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Eager parse_pdf + heuristics vs run_heuristics_lazy on a long synthetic document.
+
+The document has --pages pages of filler text; the fields (with KB enums, so
+the heuristics accept them) sit on page 1 or on the last page. The last-page
+case is run twice: cold, and after the KB learned which page the fields are on.
+
+Usage: python benchmarks/bench_lazy_parse.py [--pages 200] [--rounds 3]
+"""
+import argparse
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import fitz
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import kb
+from app.pdf_parser import parse_pdf
+from app.pipeline import learn_from_results, run_heuristics, run_heuristics_lazy
+
+SCHEMA = {"categoria": "Categoria do profissional", "situacao": "Situação do profissional"}
+ENUMS = {"categoria": ["ADVOGADO", "ESTAGIARIO"], "situacao": ["SITUAÇÃO REGULAR"]}
+FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor {}."
+
+
+def build_pdf(pages: int, field_page: int):
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page()
+        y = 72
+        if number == field_page:
+            page.insert_text((72, y), "Categoria: ADVOGADO")
+            page.insert_text((72, y + 20), "Situação: SITUAÇÃO REGULAR")
+            y += 60
+        for i in range(40):
+            page.insert_text((72, y + i * 16), FILLER.format(number * 100 + i), fontsize=9)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def measure(fn, rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    kb.KB_DIR = Path(tempfile.mkdtemp()) / "kb"
+
+    print(f"{'scenario':>24} {'eager ms':>9} {'lazy ms':>8} {'eager peak KiB':>15} {'lazy peak KiB':>14} {'stopped early':>14}")
+    scenarios = [("fields on page 1", "first_page", 1), ("fields on last page", "last_page", args.pages),
+                 ("last page, KB hinted", "last_page", args.pages)]
+
+    for name, label, field_page in scenarios:
+        pdf_bytes = build_pdf(args.pages, field_page)
+        base = kb.init_from_schema(label, SCHEMA)
+        base["enums"] = ENUMS
+        if not kb.load_kb(label).get("anchors"):
+            kb.save_kb(label, base)
+
+        def eager():
+            lines = parse_pdf(io.BytesIO(pdf_bytes))["lines"]
+            return run_heuristics(lines, SCHEMA, label, use_cache=False)
+
+        def lazy():
+            return run_heuristics_lazy(pdf_bytes, SCHEMA, label, use_cache=False)
+
+        eager_time, eager_peak, eager_state = measure(eager, args.rounds)
+        lazy_time, lazy_peak, (lazy_state, parse_result) = measure(lazy, args.rounds)
+
+        assert lazy_state.results == eager_state.results, (lazy_state.results, eager_state.results)
+        stopped_early = "yes" if parse_result is None else "no"
+        print(f"{name:>24} {eager_time * 1e3:>9.1f} {lazy_time * 1e3:>8.1f} "
+              f"{eager_peak / 1024:>15.0f} {lazy_peak / 1024:>14.0f} {stopped_early:>14}")
+
+        learn_from_results(label, eager_state, {})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""HTTP load test of /extract at several server worker counts.
+
+For each --workers value, starts `run_server.py --workers N` pointed at a
+fake Responses API (benchmarks/fake_openai.py with --llm-latency and
+--llm-error-rate) and keeps --concurrency clients posting dataset.json
+entries to /extract back to back. Entries are drawn by --mix label weights
+(e.g. carteira_oab=3,tela_sistema=1; uniform by default). Each request gets
+a unique PDF (a nonce comment after %%EOF) and use_cache=false, so parse and
+LLM caches and single-flight dedup do not flatter the numbers with only six
+example files; --repeat-documents and --use-cache turn those back on. After
+--warmup seconds, --duration seconds are measured. The report has requests/s,
+latency p50/p95/p99, the 408 and other error rates, LLM calls per request
+and the share of responses that used the LLM.
+
+Usage: python benchmarks/bench_load.py [--workers 1 2 4] [--concurrency 16] [--duration 20] [--warmup 5]
+       [--mix carteira_oab=1,tela_sistema=1] [--llm-latency 1.0] [--llm-error-rate 0.0]
+       [--repeat-documents] [--use-cache]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, q: float):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)] if ordered else float("nan")
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    stop_at = time.monotonic() + timeout
+    while time.monotonic() < stop_at:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_process(args, env=None):
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def load_entries(mix: str):
+    dataset = json.loads((ROOT / "dataset.json").read_text(encoding="utf-8"))
+    label_weights = {}
+    for item in filter(None, mix.split(",")):
+        label, weight = item.split("=")
+        label_weights[label.strip()] = float(weight)
+
+    per_label = {}
+    for entry in dataset:
+        per_label[entry["label"]] = per_label.get(entry["label"], 0) + 1
+
+    entries, weights = [], []
+    for entry in dataset:
+        weight = label_weights.get(entry["label"], 0.0 if label_weights else 1.0)
+        if weight > 0:
+            entries.append({
+                "label": entry["label"],
+                "schema": json.dumps(entry["extraction_schema"], ensure_ascii=False),
+                "filename": entry["pdf_path"],
+                "pdf_bytes": (ROOT / "examples" / entry["pdf_path"]).read_bytes(),
+            })
+            weights.append(weight / per_label[entry["label"]] if label_weights else 1.0)
+
+    if not entries:
+        raise SystemExit(f"--mix {mix!r} selects no dataset entries")
+    return entries, weights
+
+
+async def client_loop(client, entries, weights, rng, options, stop_at: float, samples):
+    while time.perf_counter() < stop_at:
+        entry = rng.choices(entries, weights)[0]
+        pdf_bytes = entry["pdf_bytes"]
+        if not options.repeat_documents:
+            pdf_bytes += f"\n%{uuid.uuid4().hex}\n".encode()
+
+        start = time.perf_counter()
+        llm_used = False
+        try:
+            response = await client.post(
+                "/extract",
+                data={"label": entry["label"], "extraction_schema": entry["schema"],
+                      "use_cache": str(options.use_cache).lower()},
+                files={"pdf": (entry["filename"], pdf_bytes, "application/pdf")})
+            status = response.status_code
+            if status == 200:
+                llm_used = bool(response.json().get("metadata", {}).get("llm_used"))
+        except httpx.HTTPError:
+            status = "client_error"
+
+        samples.append((start, time.perf_counter() - start, status, llm_used))
+
+
+async def drive(base_url: str, entries, weights, options, seconds: float, seed: int):
+    """Run closed-loop clients for seconds; return (samples, wall time)."""
+    samples = []
+    concurrency = options.concurrency
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        start = time.perf_counter()
+        stop_at = start + seconds
+        await asyncio.gather(*(
+            client_loop(client, entries, weights, random.Random(seed + i), options, stop_at, samples)
+            for i in range(concurrency)
+        ))
+        return samples, time.perf_counter() - start
+
+
+def llm_calls(stats_url: str):
+    return httpx.get(stats_url, timeout=5.0).json()["calls"]
+
+
+def run_level(workers: int, args, entries, weights, fake_url: str):
+    port = free_port()
+    env = dict(os.environ, OPENAI_BASE_URL=f"{fake_url}/v1", OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "load-test"))
+    server = start_process(["run_server.py", "--port", str(port), "--workers", str(workers)], env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url + "/")
+        if args.warmup > 0:
+            asyncio.run(drive(base_url, entries, weights, args, args.warmup, args.seed))
+
+        calls_before = llm_calls(f"{fake_url}/stats")
+        samples, wall = asyncio.run(drive(base_url, entries, weights, args, args.duration, args.seed + 1000))
+        calls = llm_calls(f"{fake_url}/stats") - calls_before
+    finally:
+        stop_process(server)
+
+    latencies = [latency for _, latency, status, _ in samples if status == 200]
+    total = len(samples)
+    return {
+        "workers": workers,
+        "requests": total,
+        "rps": len(latencies) / wall,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "timeouts": sum(status == 408 for _, _, status, _ in samples) / max(1, total),
+        "errors": sum(status not in (200, 408) for _, _, status, _ in samples) / max(1, total),
+        "llm_calls_per_request": calls / max(1, total),
+        "llm_used": sum(used for *_, used in samples) / max(1, len(latencies)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--mix", default="", help="label=weight,... (default: every dataset entry equally)")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--repeat-documents", action="store_true", help="Send identical PDF bytes (cache hits)")
+    parser.add_argument("--use-cache", action="store_true", help="Send use_cache=true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entries, weights = load_entries(args.mix)
+
+    fake_port = free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = start_process(["benchmarks/fake_openai.py", "--port", str(fake_port), "--latency", str(args.llm_latency),
+                          "--error-rate", str(args.llm_error_rate), "--seed", str(args.seed)])
+    try:
+        wait_until_up(f"{fake_url}/stats")
+        print(f"concurrency {args.concurrency}, {args.duration:.0f}s per level, LLM latency {args.llm_latency}s, "
+              f"LLM error rate {args.llm_error_rate:.0%}")
+        print(f"{'workers':>7} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'408':>6} {'errors':>6} {'llm calls/req':>13} {'llm used':>8}")
+        for workers in args.workers:
+            level = run_level(workers, args, entries, weights, fake_url)
+            print(f"{level['workers']:>7} {level['requests']:>8} {level['rps']:>7.1f} {level['p50'] * 1e3:>8.0f} "
+                  f"{level['p95'] * 1e3:>8.0f} {level['p99'] * 1e3:>8.0f} {level['timeouts']:>6.1%} "
+                  f"{level['errors']:>6.1%} {level['llm_calls_per_request']:>13.2f} {level['llm_used']:>8.1%}")
+    finally:
+        stop_process(fake)
+
+
+if __name__ == "__main__":
+    main()
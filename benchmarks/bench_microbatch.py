@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Cross-request LLM micro-batching: API calls and latency under concurrent requests.
+
+Fires --requests concurrent single-document LLM requests (same label and
+schema, as concurrent /extract calls would) through an LLMBatcher against the
+local fake Responses API, with coalescing disabled and with the given window,
+and reports the number of API calls and the p50/max request latency.
+
+Usage: python benchmarks/bench_microbatch.py [--requests 64] [--window-ms 10] [--max-docs 8] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fake_openai import FakeOpenAIServer
+
+SCHEMA = {"nome": "Nome do profissional", "inscricao": "Número de inscrição"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fire(batcher, count: int):
+    from app import llm
+
+    async def one(i: int):
+        start = time.perf_counter()
+        await batcher.resolve(
+            label="bench", doc_text=f"Nome\nPESSOA {i}\nInscrição\n{100000 + i}", schema=SCHEMA,
+            uncertain_fields=list(SCHEMA), candidates_by_field={"nome": [f"PESSOA {i}"]}, use_cache=False)
+        return time.perf_counter() - start
+
+    try:
+        return await asyncio.gather(*(one(i) for i in range(count)))
+    finally:
+        await llm.close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    parser.add_argument("--max-docs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(port=free_port(), latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+        from app.cache import llm_cache
+        from app.llm_batcher import LLMBatcher
+        llm_cache.path = ""
+
+        print(f"{'mode':>12} {'api calls':>10} {'p50 ms':>8} {'max ms':>8}")
+        for name, window_ms in (("per-request", 0.0), ("coalesced", args.window_ms)):
+            before = server.calls
+            latencies = asyncio.run(fire(LLMBatcher(window_ms, args.max_docs), args.requests))
+            print(f"{name:>12} {server.calls - before:>10} {statistics.median(latencies) * 1e3:>8.0f} "
+                  f"{max(latencies) * 1e3:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Microbenchmark normalize_str against the original (unmemoized, always-unidecode) implementation.
+
+The workload replays the strings the heuristic path normalizes for the example
+PDFs: anchors, enum values and field names many times over, plus line texts and words.
+
+Usage: python benchmarks/bench_normalize.py [--rounds 200]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from unidecode import unidecode
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.kb import init_from_schema
+from app.normalize import normalize_str
+from app.pdf_parser import parse_pdf
+
+ROOT = Path(__file__).parent.parent
+ENUMS = ["ADVOGADO", "ADVOGADA", "SUPLEMENTAR", "ESTAGIARIO", "ESTAGIÁRIA", "SITUAÇÃO REGULAR", "Vencidas"]
+
+
+def reference_normalize_str(value):
+    """normalize_str as originally implemented."""
+    if value is None:
+        return ""
+
+    normalized = unidecode(value)
+    normalized = normalized.lower()
+    normalized = " ".join(normalized.split())
+
+    return normalized
+
+
+def build_workloads():
+    with open(ROOT / "dataset.json", "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+
+    short_strings = []
+    line_strings = []
+
+    for entry in dataset:
+        with open(ROOT / "examples" / entry["pdf_path"], "rb") as f:
+            lines = parse_pdf(f)["lines"]
+
+        kb = init_from_schema(entry["label"], entry["extraction_schema"])
+        anchors = [a for field_anchors in kb["anchors"].values() for a in field_anchors]
+
+        for line in lines:
+            line_strings.append(line["text"])
+            short_strings.extend(line["text"].split())
+            # each anchor and enum is normalized once per line in the naive heuristic path
+            short_strings.extend(anchors)
+            short_strings.extend(ENUMS)
+
+        short_strings.extend(entry["extraction_schema"].keys())
+
+    return {"short (anchors/enums/words)": short_strings, "line text": line_strings}
+
+
+def time_calls(fn, strings, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for value in strings:
+            fn(value)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(strings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    workloads = build_workloads()
+
+    print(f"{'workload':>28} {'calls':>7} {'original ns':>12} {'current ns':>11} {'speed-up':>9}")
+    for name, strings in workloads.items():
+        for value in strings:
+            assert normalize_str(value) == reference_normalize_str(value), value
+
+        reference = time_calls(reference_normalize_str, strings, args.rounds)
+        current = time_calls(normalize_str, strings, args.rounds)
+        print(f"{name:>28} {len(strings):>7} {reference * 1e9:>12.0f} {current * 1e9:>11.0f} "
+              f"{reference / current:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""parse_pdf with PARSE_TEXT_MODE=dict (PyMuPDF default flags) vs text (no images).
+
+Checks that both modes produce identical lines on every example PDF, then
+reports the best time of --rounds runs and the tracemalloc peak of one run per
+mode.
+
+Usage: python benchmarks/bench_parse_modes.py [--rounds 5]
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.pdf_parser import TEXT_FLAGS, parse_pdf
+
+ROOT = Path(__file__).parent.parent
+
+
+def profile(pdf_bytes: bytes, text_mode: str, rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        parse_pdf(io.BytesIO(pdf_bytes), text_mode)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = parse_pdf(io.BytesIO(pdf_bytes), text_mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    modes = list(TEXT_FLAGS)
+    print(f"{'pdf':>20} " + " ".join(
+        f"{mode + ' ms':>9} {mode + ' peak KiB':>14}" for mode in modes))
+
+    for path in sorted((ROOT / "examples").glob("*.pdf")):
+        pdf_bytes = path.read_bytes()
+        profiles = {mode: profile(pdf_bytes, mode, args.rounds) for mode in modes}
+
+        reference = profiles[modes[0]][2]
+        for mode in modes[1:]:
+            assert profiles[mode][2] == reference, f"{path.name}: {mode} lines differ from {modes[0]}"
+
+        print(f"{path.name:>20} " + " ".join(
+            f"{best * 1e3:>9.1f} {peak / 1024:>14.0f}"
+            for best, peak, _ in profiles.values()))
+
+
+if __name__ == "__main__":
+    main()
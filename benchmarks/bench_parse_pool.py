@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Parse throughput of the thread backend vs the pre-warmed process pool.
+
+Every PDF in examples/ is parsed --repeat times with N concurrent parses, once
+through asyncio.to_thread (the "thread" backend) and once through a ParsePool of
+N workers. Throughput only scales with workers up to the number of cores.
+
+Usage: python benchmarks/bench_parse_pool.py [--workers 1 2 4] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.parse_pool import ParsePool, pack_parse_result
+from app.pdf_parser import parse_pdf_bytes
+
+ROOT = Path(__file__).parent.parent
+
+
+async def run_concurrently(parse, documents, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(pdf_bytes):
+        async with semaphore:
+            return await parse(pdf_bytes)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(pdf_bytes) for pdf_bytes in documents))
+    return time.perf_counter() - start
+
+
+async def bench_threads(documents, workers: int):
+    return await run_concurrently(
+        lambda pdf_bytes: asyncio.to_thread(parse_pdf_bytes, pdf_bytes), documents, workers)
+
+
+async def bench_pool(documents, workers: int):
+    pool = ParsePool(workers)
+    warmup_start = time.perf_counter()
+    pool.start()
+    warmup = time.perf_counter() - warmup_start
+    try:
+        return warmup, await run_concurrently(pool.parse, documents, workers)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers_list = args.workers or sorted({1, 2, 4, cores})
+
+    samples = [path.read_bytes() for path in sorted((ROOT / "examples").glob("*.pdf"))]
+    documents = samples * args.repeat
+
+    dict_bytes = sum(len(pickle.dumps(parse_pdf_bytes(b), protocol=pickle.HIGHEST_PROTOCOL)) for b in samples)
+    packed_bytes = sum(len(pack_parse_result(parse_pdf_bytes(b))) for b in samples)
+    print(f"{len(documents)} documents, {cores} cores; result payload per sample set: "
+          f"pickled dict {dict_bytes} B, packed {packed_bytes} B")
+
+    print(f"{'workers':>7} {'thread docs/s':>14} {'pool docs/s':>12} {'pool warm-up s':>15}")
+    for workers in workers_list:
+        thread_elapsed = asyncio.run(bench_threads(documents, workers))
+        warmup, pool_elapsed = asyncio.run(bench_pool(documents, workers))
+        print(f"{workers:>7} {len(documents) / thread_elapsed:>14.1f} "
+              f"{len(documents) / pool_elapsed:>12.1f} {warmup:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""LLM context: head truncation (doc_text[:2000]) vs BM25 line retrieval.
+
+Builds synthetic documents of --lines lines of boilerplate with a few
+label/value pairs at random positions, then reports for each strategy the
+share of values that made it into the prompt context, the average context
+size and the time spent selecting it.
+
+Usage: python benchmarks/bench_retrieval.py [--docs 200] [--lines 400]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.retrieval import LLM_CONTEXT_TOKENS, CHARS_PER_TOKEN, field_query, select_context
+
+FIELDS = {
+    "data_vencimento": ("Data de vencimento", "15/03/2025"),
+    "valor_parcela": ("Valor da parcela", "R$ 1.234,56"),
+    "numero_contrato": ("Número do contrato", "CT-2024-99812"),
+    "cidade": ("Cidade", "CURITIBA"),
+}
+BOILERPLATE = [
+    "O contratante declara ciência das condições gerais deste instrumento.",
+    "As partes elegem o foro da comarca para dirimir quaisquer dúvidas.",
+    "Este documento foi gerado eletronicamente e dispensa assinatura.",
+    "Página de continuação do extrato consolidado.",
+]
+
+
+def build_document(rng: random.Random, line_count: int):
+    lines = [rng.choice(BOILERPLATE) for _ in range(line_count)]
+    for label, value in FIELDS.values():
+        position = rng.randrange(line_count)
+        lines[position:position] = [label, value]
+    return "\n".join(lines)
+
+
+def head(doc_text: str):
+    return doc_text[:LLM_CONTEXT_TOKENS * CHARS_PER_TOKEN]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=400)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    documents = [build_document(rng, args.lines) for _ in range(args.docs)]
+    queries = [field_query(field, label) for field, (label, _) in FIELDS.items()]
+
+    retrieval = lambda doc_text: select_context(doc_text, queries)  # noqa: E731
+
+    print(f"{'strategy':>10} {'value recall':>13} {'avg chars':>10} {'ms/doc':>7}")
+    for name, strategy in (("head", head), ("bm25", retrieval)):
+        start = time.perf_counter()
+        contexts = [strategy(doc_text) for doc_text in documents]
+        elapsed = time.perf_counter() - start
+
+        found = sum(value in context for context in contexts for _, value in FIELDS.values())
+        recall = found / (len(documents) * len(FIELDS))
+        avg_chars = sum(len(context) for context in contexts) / len(contexts)
+        print(f"{name:>10} {recall:>13.1%} {avg_chars:>10.0f} {elapsed / len(documents) * 1e3:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
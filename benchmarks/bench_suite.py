@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Reproducible benchmark of parsing, heuristic stages and the end-to-end pipeline.
+
+Runs every dataset.json entry (PDFs from examples/) through:
+
+- parse:      parse_pdf
+- candidates: extract_candidates, per field
+- scoring:    score_candidates, per field
+- selection:  select_best, per field
+- pipeline:   run_extraction_pipeline from parsed lines, with a deterministic
+              stub (first candidate, else "stub-<field>") in place of
+              resolve_batched_gpt5_mini
+
+Each stage is timed over --rounds rounds and reported as p50/p95/p99 per call.
+One extra round runs under tracemalloc for the peak memory of a single call
+of each stage and the memory and blocks still allocated after the round. The
+KB starts from init_from_schema for every pipeline run, and caches,
+templates and speculation are off, so runs are comparable.
+
+--save writes the results to --baseline. Otherwise results are compared
+with the stored baseline, and the exit status is 1 when a p50 or p95 is
+more than --tolerance times the baseline.
+
+Usage: python benchmarks/bench_suite.py [--rounds 30] [--baseline benchmarks/baseline.json] [--save]
+"""
+import argparse
+import asyncio
+import copy
+import gc
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ["LLM_MICROBATCH_WINDOW_MS"] = "0"
+os.environ["SPECULATIVE_LLM"] = "0"
+
+from app import kb, llm_batcher
+from app.heuristics import extract_candidates, score_candidates, select_best
+from app.matcher import get_matcher
+from app.pdf_parser import parse_pdf
+from app.pipeline import run_extraction_pipeline
+from app.spatial import SpatialIndex
+
+STAGES = ("parse", "candidates", "scoring", "selection", "pipeline")
+
+
+async def stub_resolve(doc_text, schema, uncertain_fields, candidates_by_field=None, timeout_seconds=8.0,
+                       use_cache=True, anchors_by_field=None):
+    """Deterministic stand-in for resolve_batched_gpt5_mini."""
+    candidates_by_field = candidates_by_field or {}
+    return {
+        field: {"value": (candidates_by_field.get(field) or [f"stub-{field}"])[0], "metadata": None}
+        for field in uncertain_fields
+    }
+
+
+def percentile(samples, q: float):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def load_documents():
+    dataset = json.loads((ROOT / "dataset.json").read_text(encoding="utf-8"))
+    return [
+        {"name": entry["pdf_path"], "label": entry["label"], "schema": entry["extraction_schema"],
+         "pdf_bytes": (ROOT / "examples" / entry["pdf_path"]).read_bytes()}
+        for entry in dataset
+    ]
+
+
+class Suite:
+    def __init__(self, documents):
+        self.documents = documents
+        self.samples = {stage: [] for stage in STAGES}
+        self.loop = asyncio.new_event_loop()
+
+        for doc in documents:
+            doc["lines"] = parse_pdf(io.BytesIO(doc["pdf_bytes"]))["lines"]
+            doc["kb"] = kb.init_from_schema(doc["label"], doc["schema"])
+
+        self.peaks = {stage: 0 for stage in STAGES}
+
+    def _timed(self, stage: str, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.samples[stage].append(time.perf_counter() - start)
+        return result
+
+    def _traced(self, stage: str, fn):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        self.peaks[stage] = max(self.peaks[stage], tracemalloc.get_traced_memory()[1] - before)
+        return result
+
+    def run_round(self, timed=None):
+        timed = timed or (lambda stage, fn: fn())
+
+        for doc in self.documents:
+            timed("parse", lambda: parse_pdf(io.BytesIO(doc["pdf_bytes"])))
+
+            lines, label_kb = doc["lines"], doc["kb"]
+            matcher = get_matcher(doc["label"], kb.kb_store.version(doc["label"]), label_kb["anchors"])
+            anchor_hits = matcher.find_hits(lines)
+            spatial = SpatialIndex(lines, labels=matcher.patterns)
+            line_positions = [line.get("y_rel", 0.5) for line in lines]
+
+            for field, field_desc in doc["schema"].items():
+                kb_field = {"anchors": label_kb["anchors"].get(field, []),
+                            "enums": label_kb["enums"].get(field, []),
+                            "region_hint": label_kb["region_hint"].get(field, "")}
+                candidates = timed("candidates", lambda: extract_candidates(
+                    lines, field, field_desc, kb_field, anchor_hits=anchor_hits.get(field, []), spatial=spatial))
+                scored = timed("scoring", lambda: score_candidates(candidates, kb_field, line_positions))
+                timed("selection", lambda: select_best(scored))
+
+            kb.kb_store.put(doc["label"], copy.deepcopy(label_kb))
+            timed("pipeline", lambda: self.loop.run_until_complete(run_extraction_pipeline(
+                lines, "", doc["schema"], doc["label"], use_cache=False)))
+
+    def memory(self):
+        """Memory and blocks still allocated after one traced round."""
+        gc.collect()
+        tracemalloc.start()
+        self.run_round(self._traced)
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = snapshot.statistics("filename")
+        return {"retained_kib": sum(stat.size for stat in stats) / 1024,
+                "retained_blocks": sum(stat.count for stat in stats)}
+
+    def results(self):
+        return {
+            stage: {
+                "calls": len(samples),
+                "p50_ms": percentile(samples, 50) * 1e3,
+                "p95_ms": percentile(samples, 95) * 1e3,
+                "p99_ms": percentile(samples, 99) * 1e3,
+                "peak_kib": self.peaks[stage] / 1024,
+            }
+            for stage, samples in self.samples.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--baseline", type=Path, default=Path(__file__).parent / "baseline.json")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    kb.KB_DIR = Path(tempfile.mkdtemp())
+    llm_batcher.resolve_batched_gpt5_mini = stub_resolve
+
+    suite = Suite(load_documents())
+    suite.run_round()
+    gc.disable()
+    for _ in range(args.rounds):
+        suite.run_round(suite._timed)
+    gc.enable()
+
+    memory = suite.memory()
+    results = {"rounds": args.rounds, "documents": len(suite.documents),
+               "stages": suite.results(), "memory": memory}
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() and not args.save else None
+
+    print(f"{'stage':>11} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KiB':>9} "
+          f"{'p50 vs base':>12} {'p95 vs base':>12}")
+    regressions = []
+    for stage, stats in results["stages"].items():
+        ratios = ""
+        if baseline and stage in baseline["stages"]:
+            base = baseline["stages"][stage]
+            p50_ratio, p95_ratio = stats["p50_ms"] / base["p50_ms"], stats["p95_ms"] / base["p95_ms"]
+            ratios = f"{p50_ratio:>11.2f}x {p95_ratio:>11.2f}x"
+            if max(p50_ratio, p95_ratio) > args.tolerance:
+                regressions.append(stage)
+        print(f"{stage:>11} {stats['calls']:>6} {stats['p50_ms']:>8.3f} {stats['p95_ms']:>8.3f} "
+              f"{stats['p99_ms']:>8.3f} {stats['peak_kib']:>9.0f} {ratios}")
+
+    print(f"\nretained after one round: {memory['retained_kib']:.0f} KiB in {memory['retained_blocks']} blocks"
+          + (f" (baseline {baseline['memory']['retained_kib']:.0f} KiB in {baseline['memory']['retained_blocks']} blocks)"
+             if baseline else ""))
+
+    if args.save:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    elif regressions:
+        print(f"Regressions over {args.tolerance}x baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Layout template fast path vs anchor heuristics on a known layout.
+
+Learns the template of examples/oab_1.pdf from confirmed values (as update_kb
+does after TEMPLATE_MIN_SEEN extractions), then times run_heuristics on the
+parsed document with the template and with templates removed from the KB.
+Uses a throwaway KB directory.
+
+Usage: python benchmarks/bench_template.py [--rounds 1000]
+"""
+import argparse
+import copy
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import kb
+from app.layout import TEMPLATE_MIN_SEEN, layout_evidence
+from app.pdf_parser import parse_pdf_bytes
+from app.pipeline import run_heuristics
+
+ROOT = Path(__file__).parent.parent
+LABEL = "carteira_oab"
+SCHEMA = {"nome": "Nome do profissional", "inscricao": "Número de inscrição", "seccional": "Seccional",
+          "subsecao": "Subseção", "categoria": "Categoria", "situacao": "Situação do profissional"}
+CONFIRMED = {"nome": "JOANA D'ARC", "inscricao": "101943", "seccional": "PR",
+             "subsecao": "CONSELHO SECCIONAL - PARANÁ", "categoria": "SUPLEMENTAR",
+             "situacao": "SITUAÇÃO REGULAR"}
+
+
+def timed(lines, rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        state = run_heuristics(lines, SCHEMA, LABEL, use_cache=False)
+        best = min(best, time.perf_counter() - start)
+    return best, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    kb.KB_DIR = Path(tempfile.mkdtemp())
+    lines = parse_pdf_bytes((ROOT / "examples" / "oab_1.pdf").read_bytes())["lines"]
+
+    labels = run_heuristics(lines, SCHEMA, LABEL, use_cache=False).labels
+    for _ in range(TEMPLATE_MIN_SEEN):
+        kb.update_kb(LABEL, CONFIRMED, layout=layout_evidence(lines, labels, CONFIRMED))
+
+    with_template = kb.load_kb(LABEL)
+    without_template = copy.deepcopy(with_template)
+    without_template["templates"] = {}
+
+    print(f"{'path':>10} {'best ms':>9} {'resolved':>9} {'uncertain':>10}")
+    for name, label_kb in (("heuristic", without_template), ("template", with_template)):
+        kb.kb_store.put(LABEL, label_kb)
+        best, state = timed(lines, args.rounds)
+        resolved = sum(1 for value in state.results.values() if value)
+        print(f"{name:>10} {best * 1e3:>9.3f} {resolved:>9} {len(state.uncertain_fields):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI Responses API.
+
+Answers POST /v1/responses with a deterministic JSON extraction after a
+configurable latency, so the async LLM path can be exercised without network
+access. With --error-rate, that fraction of calls fails with a 500 after the
+same latency. Point the API at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage: python benchmarks/fake_openai.py [--port 8765] [--latency 0.5] [--error-rate 0.0] [--seed 0]
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FIELD_PATTERN = re.compile(r'"([^"]+)"(?:: )?')
+CANDIDATE_PATTERN = re.compile(r'\[([^\]]*)\]$')
+DOCUMENT_PATTERN = re.compile(r'^=== Document (\S+) ===\nFields: (.*)$', re.MULTILINE)
+
+
+def _answer_fields(fields_line: str):
+    """First candidate per field when the prompt lists one, else "stub-<field>"."""
+    matches = list(FIELD_PATTERN.finditer(fields_line))
+
+    fields = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(fields_line)
+        segment = fields_line[match.end():end].rstrip(", ")
+        candidate = CANDIDATE_PATTERN.search(segment)
+        fields[match.group(1)] = candidate.group(1) if candidate else f"stub-{match.group(1)}"
+
+    return fields
+
+
+def answer_for_prompt(prompt: str):
+    """Deterministic answer for single-document and multi-document prompts."""
+    documents = DOCUMENT_PATTERN.findall(prompt)
+    if documents:
+        return {"documents": {
+            doc_id: {"fields": _answer_fields(fields_line), "metadata": {}}
+            for doc_id, fields_line in documents
+        }}
+
+    fields_line = prompt.split("\n", 1)[0]
+    if fields_line.startswith("Fields: "):
+        fields_line = fields_line[len("Fields: "):]
+
+    return {"fields": _answer_fields(fields_line), "metadata": {}}
+
+
+def create_app(latency: float = 0.5, error_rate: float = 0.0, seed: int = 0):
+    app = FastAPI(title="Fake Responses API")
+    app.state.latency = latency
+    app.state.error_rate = error_rate
+    app.state.calls = 0
+    app.state.errors = 0
+    rng = random.Random(seed)
+
+    @app.post("/v1/responses")
+    async def create_response(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+
+        await asyncio.sleep(app.state.latency)
+
+        if rng.random() < app.state.error_rate:
+            app.state.errors += 1
+            return JSONResponse(status_code=500, content={"error": {
+                "message": "Injected failure", "type": "server_error", "param": None, "code": None}})
+
+        text = json.dumps(answer_for_prompt(body.get("input", "")))
+        return {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "gpt-5-mini"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls, "errors": app.state.errors,
+                "latency": app.state.latency, "error_rate": app.state.error_rate}
+
+    return app
+
+
+class FakeOpenAIServer:
+    """Run the fake API in a background thread (for tests and benchmarks)."""
+
+    def __init__(self, port: int = 8765, latency: float = 0.5, error_rate: float = 0.0):
+        self.app = create_app(latency, error_rate)
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(
+            self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def calls(self):
+        return self.app.state.calls
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI Responses API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before answering")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency, args.error_rate, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
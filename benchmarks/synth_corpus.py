@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Synthetic PDF corpus with ground truth, for scaling tests of the parser and heuristics.
+
+Writes --docs PDFs shaped like one of the example labels:
+
+- carteira_oab: landscape card, each label with its value on the line below
+- tela_sistema: system screen, "Label: value" on one line
+
+Fields are laid out in --columns columns on the first or last page
+(--field-page) of a --pages page document; the other pages hold filler text.
+--fields picks that many fields from the layout's pool (extra ones are
+generic "Campo Extra N" codes). With probability --anchor-noise a label is
+printed perturbed (case, accents, a typo, an abbreviation). The KB seed has
+--kb-anchors anchors per field: the ones init_from_schema derives, the clean
+label, and random decoys.
+
+Output in --out:
+
+- dataset.json:       entries in the format of the repository's dataset.json
+- ground_truth.json:  {pdf_path: {field: value}}
+- kb/label_<label>.json: KB seed (point app.kb.KB_DIR here)
+- *.pdf
+
+--evaluate then parses the corpus and runs the heuristics with a copy of the
+KB seed. The first --warmup documents are learned from their ground truth, the
+way the LLM answers are learned in production. The rest are measured for
+throughput and accuracy. Sweep --pages or --kb-anchors for curves.
+
+Usage: python benchmarks/synth_corpus.py [--layout carteira_oab] [--docs 50] [--pages 1] [--fields 8]
+       [--columns 2] [--anchor-noise 0.0] [--kb-anchors 10] [--field-page first] [--seed 0]
+       [--out /tmp/synth_corpus] [--evaluate] [--warmup 5]
+"""
+import argparse
+import json
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import kb
+from app.normalize import normalize_str
+
+FIRST_NAMES = ["JOANA", "CARLOS", "MARIA", "PEDRO", "ANA", "LUIZ", "FERNANDA", "RAFAEL", "BEATRIZ", "JOSÉ"]
+LAST_NAMES = ["SILVA", "SOUZA", "OLIVEIRA", "SANTOS", "PEREIRA", "COSTA", "RODRIGUES", "ALMEIDA", "D'ARC"]
+STATES = {"PR": "PARANÁ", "SP": "SÃO PAULO", "RJ": "RIO DE JANEIRO", "MG": "MINAS GERAIS", "BA": "BAHIA"}
+CITIES = ["CURITIBA", "SÃO PAULO", "RIO DE JANEIRO", "BELO HORIZONTE", "SALVADOR", "MARINGÁ"]
+STREETS = ["AVENIDA PAULISTA", "RUA XV DE NOVEMBRO", "RUA DAS FLORES", "AVENIDA BRASIL"]
+FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor {}."
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _date(rng):
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2015, 2026)}"
+
+
+def _money(rng):
+    return f"{rng.randint(0, 99999):,}".replace(",", ".") + f",{rng.randint(0, 99):02d}"
+
+
+def _address(rng):
+    return f"{rng.choice(STREETS)}, Nº {rng.randint(1, 3000)}, {rng.choice(CITIES)}"
+
+
+def _phone(rng):
+    return f"({rng.randint(11, 99)}) {rng.randint(3000, 9999)}-{rng.randint(0, 9999):04d}"
+
+
+# field -> (printed label, schema description, value generator)
+LAYOUTS = {
+    "carteira_oab": {
+        "size": (1056, 552),
+        "title": "ORDEM DOS ADVOGADOS DO BRASIL",
+        "inline": False,
+        "fields": {
+            "nome": ("Nome", "Nome do profissional", _name),
+            "inscricao": ("Inscrição", "Número de inscrição do profissional",
+                          lambda rng: str(rng.randint(100000, 999999))),
+            "seccional": ("Seccional", "Seccional do profissional", lambda rng: rng.choice(list(STATES))),
+            "subsecao": ("Subseção", "Subseção à qual o profissional faz parte",
+                         lambda rng: f"CONSELHO SECCIONAL - {rng.choice(list(STATES.values()))}"),
+            "categoria": ("Categoria", "Categoria, pode ser ADVOGADO, ADVOGADA, SUPLEMENTAR, ESTAGIARIO, ESTAGIARIA",
+                          lambda rng: rng.choice(["ADVOGADO", "ADVOGADA", "SUPLEMENTAR", "ESTAGIARIO", "ESTAGIARIA"])),
+            "endereco_profissional": ("Endereço Profissional", "Endereço do profissional", _address),
+            "telefone_profissional": ("Telefone Profissional", "Telefone do profissional", _phone),
+            "situacao": ("Situação", "Situação do profissional, normalmente no canto inferior direito.",
+                         lambda rng: rng.choice(["SITUAÇÃO REGULAR", "SITUAÇÃO IRREGULAR", "LICENCIADO"])),
+        },
+    },
+    "tela_sistema": {
+        "size": (744, 591),
+        "title": "Consulta de Cobrança",
+        "inline": True,
+        "fields": {
+            "data_base": ("Data Base", "Data base da operação selecionada", _date),
+            "data_vencimento": ("Data Vencimento", "Data de vencimento da operação selecionada", _date),
+            "quantidade_parcelas": ("Quantidade de Parcelas", "Quantidade de parcelas da operação",
+                                    lambda rng: str(rng.randint(1, 120))),
+            "produto": ("Produto", "Produto da operação",
+                        lambda rng: rng.choice(["EMPRESTIMO", "FINANCIAMENTO", "CARTAO"])),
+            "sistema": ("Sistema", "Sistema da operação", lambda rng: rng.choice(["CONSIGNADO", "CDC", "IMOBILIARIO"])),
+            "tipo_de_operacao": ("Tipo de Operação", "Tipo de operação",
+                                 lambda rng: rng.choice(["RENEGOCIACAO", "CONTRATACAO", "PORTABILIDADE"])),
+            "valor_parcela": ("Valor Parcela", "Valor da parcela", _money),
+            "cidade": ("Cidade", "Cidade", lambda rng: rng.choice(CITIES)),
+            "data_referencia": ("Data Referência", "Data de referência da consulta", _date),
+            "total_de_parcelas": ("Total de Parcelas", "Valor total das parcelas", _money),
+        },
+    },
+}
+
+
+def field_specs(layout: str, count: int):
+    """The first count fields of the layout's pool, padded with generic code fields."""
+    specs = list(LAYOUTS[layout]["fields"].items())[:count]
+    for i in range(len(specs) + 1, count + 1):
+        specs.append((f"campo_extra_{i}", (f"Campo Extra {i}", f"Código do campo extra {i}",
+                                           lambda rng: f"CX-{rng.randint(10000, 99999)}")))
+    return specs
+
+
+def perturb_label(text: str, rng):
+    """One random corruption of a printed label."""
+    kind = rng.choice(["upper", "lower", "accents", "typo", "abbrev"])
+    if kind == "upper":
+        return text.upper()
+    if kind == "lower":
+        return text.lower()
+    if kind == "accents":
+        return normalize_str(text).title()
+    if kind == "typo" and len(text) > 3:
+        i = rng.randrange(1, len(text) - 1)
+        return text[:i] + rng.choice(string.ascii_lowercase) + text[i + 1:]
+    words = text.split()
+    return " ".join(words[:-1] + [words[-1][:3] + "."]) if len(words) > 1 else text[:4] + "."
+
+
+def build_document(layout: str, specs, pages: int, columns: int, field_page: int, anchor_noise: float, rng):
+    """Render one document; return (pdf_bytes, {field: value})."""
+    config = LAYOUTS[layout]
+    width, height = config["size"]
+    margin = 48
+    column_width = (width - 2 * margin) / max(1, columns)
+    row_height = 24 if config["inline"] else 40
+    rows = -(-len(specs) // columns)
+
+    truth = {}
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page(width=width, height=height)
+        if number != field_page:
+            for i in range(int((height - 2 * margin) // 14)):
+                page.insert_text((margin, margin + i * 14), FILLER.format(number * 100 + i), fontsize=9)
+            continue
+
+        page.insert_text((margin, margin), config["title"], fontsize=14)
+        for idx, (field, (label_text, _, generate)) in enumerate(specs):
+            value = generate(rng)
+            truth[field] = value
+            if rng.random() < anchor_noise:
+                label_text = perturb_label(label_text, rng)
+
+            x = margin + (idx // rows) * column_width
+            y = margin + 32 + (idx % rows) * row_height
+            if config["inline"]:
+                page.insert_text((x, y), f"{label_text}: {value}", fontsize=10)
+            else:
+                page.insert_text((x, y), label_text, fontsize=9)
+                page.insert_text((x, y + 14), value, fontsize=11)
+
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes, truth
+
+
+def kb_seed(layout: str, specs, anchors_per_field: int, rng):
+    """KB for the label with exactly anchors_per_field anchors per field (at least the derived ones)."""
+    schema = {field: description for field, (_, description, _) in specs}
+    seed = kb.init_from_schema(layout, schema)
+    for field, (label_text, _, _) in specs:
+        anchors = seed["anchors"][field]
+        if normalize_str(label_text) not in anchors:
+            anchors.insert(0, normalize_str(label_text))
+        while len(anchors) < anchors_per_field:
+            decoy = " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+                             for _ in range(rng.randint(1, 3)))
+            if decoy not in anchors:
+                anchors.append(decoy)
+    return schema, seed
+
+
+def generate_corpus(out: Path, layout: str, docs: int, pages: int, fields: int, columns: int,
+                    anchor_noise: float, kb_anchors: int, field_page: str = "first", seed: int = 0):
+    """Write the corpus to out; return the dataset entries."""
+    rng = random.Random(seed)
+    specs = field_specs(layout, fields)
+    schema, seed_kb = kb_seed(layout, specs, kb_anchors, rng)
+
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "kb").mkdir(exist_ok=True)
+    (out / "kb" / f"label_{layout}.json").write_text(json.dumps(seed_kb, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    dataset, ground_truth = [], {}
+    for i in range(docs):
+        page = pages if field_page == "last" else 1
+        pdf_bytes, truth = build_document(layout, specs, pages, columns, page, anchor_noise, rng)
+        pdf_path = f"{layout}_{i:04d}.pdf"
+        (out / pdf_path).write_bytes(pdf_bytes)
+        dataset.append({"label": layout, "extraction_schema": schema, "pdf_path": pdf_path})
+        ground_truth[pdf_path] = truth
+
+    (out / "dataset.json").write_text(json.dumps(dataset, indent=2, ensure_ascii=False), encoding="utf-8")
+    (out / "ground_truth.json").write_text(json.dumps(ground_truth, indent=2, ensure_ascii=False), encoding="utf-8")
+    return dataset
+
+
+def evaluate(out: Path, warmup: int = 5):
+    """Parse and run the heuristics over a generated corpus; print throughput and accuracy."""
+    kb.KB_DIR = Path(tempfile.mkdtemp())
+    for seed_file in (out / "kb").glob("label_*.json"):
+        shutil.copy(seed_file, kb.KB_DIR)
+
+    from app.pdf_parser import parse_pdf
+    from app.pipeline import learn_from_results, run_heuristics
+
+    dataset = json.loads((out / "dataset.json").read_text(encoding="utf-8"))
+    ground_truth = json.loads((out / "ground_truth.json").read_text(encoding="utf-8"))
+
+    for entry in dataset[:warmup]:
+        with open(out / entry["pdf_path"], "rb") as f:
+            lines = parse_pdf(f)["lines"]
+        state = run_heuristics(lines, entry["extraction_schema"], entry["label"], use_cache=False)
+        truth = ground_truth[entry["pdf_path"]]
+        answers = {field: {"value": truth[field], "metadata": None} for field in state.uncertain_fields}
+        state.results.update({field: truth[field] for field in state.uncertain_fields})
+        learn_from_results(entry["label"], state, answers)
+
+    measured = dataset[warmup:]
+    parse_time = heuristics_time = 0.0
+    total = accepted = correct = 0
+    for entry in measured:
+        with open(out / entry["pdf_path"], "rb") as f:
+            start = time.perf_counter()
+            lines = parse_pdf(f)["lines"]
+            parse_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        state = run_heuristics(lines, entry["extraction_schema"], entry["label"], use_cache=False)
+        heuristics_time += time.perf_counter() - start
+
+        for field, expected in ground_truth[entry["pdf_path"]].items():
+            total += 1
+            value = state.results.get(field)
+            if value is not None:
+                accepted += 1
+                correct += normalize_str(value) == normalize_str(expected)
+
+    docs = len(measured)
+    if not docs:
+        print(f"Nothing to measure: --warmup {warmup} covers the whole corpus")
+        return
+
+    print(f"{docs} docs measured after {min(warmup, len(dataset))} warm-up docs, {total} fields")
+    print(f"parse:      {docs / parse_time:>8.1f} docs/s ({parse_time / docs * 1e3:.2f} ms/doc)")
+    print(f"heuristics: {docs / heuristics_time:>8.1f} docs/s ({heuristics_time / docs * 1e3:.2f} ms/doc)")
+    print(f"accepted without LLM: {accepted / total:.1%}, "
+          f"correct: {correct / total:.1%} (precision {correct / max(1, accepted):.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="carteira_oab")
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--columns", type=int, default=2)
+    parser.add_argument("--anchor-noise", type=float, default=0.0)
+    parser.add_argument("--kb-anchors", type=int, default=10)
+    parser.add_argument("--field-page", choices=["first", "last"], default="first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path("/tmp/synth_corpus"))
+    parser.add_argument("--evaluate", action="store_true", help="Run parse + heuristics over the corpus")
+    parser.add_argument("--warmup", type=int, default=5, help="Documents learned from ground truth before measuring")
+    args = parser.parse_args()
+
+    dataset = generate_corpus(args.out, args.layout, args.docs, args.pages, args.fields, args.columns,
+                              args.anchor_noise, args.kb_anchors, args.field_page, args.seed)
+    print(f"Wrote {len(dataset)} documents to {args.out}")
+
+    if args.evaluate:
+        evaluate(args.out, args.warmup)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Shared pytest fixtures."""
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent / "benchmarks"))
+
+from fake_openai import FakeOpenAIServer
+from app import kb
+from app.cache import llm_cache
+from app.kb import KBStore
+
+LATENCY = 0.5
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path):
+    """Local fake Responses API (benchmarks/fake_openai.py) answering after LATENCY seconds."""
+    with FakeOpenAIServer(port=_free_port(), latency=LATENCY) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setattr(llm_cache, "path", "")
+        monkeypatch.setattr(kb, "KB_DIR", tmp_path / "kb")
+        yield server
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    """A private KBStore over tmp_path, installed as app.kb.kb_store."""
+    monkeypatch.setattr(kb, "KB_DIR", tmp_path)
+    store = KBStore(flush_interval=60.0, refresh_interval=0.0)
+    monkeypatch.setattr(kb, "kb_store", store)
+    yield store
+    store.close()
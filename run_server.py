@@ -1,22 +1,47 @@
 #!/usr/bin/env python3
 import uvicorn
 import argparse
+import os
+import tempfile
+from pathlib import Path
+
+
+def prepare_multiprocess_metrics():
+    """Point every worker at one empty PROMETHEUS_MULTIPROC_DIR so /metrics covers all of them."""
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        Path(metrics_dir).mkdir(parents=True, exist_ok=True)
+        # values left by a previous run would be added to this one's
+        for stale in Path(metrics_dir).glob("*.db"):
+            stale.unlink()
+    else:
+        metrics_dir = tempfile.mkdtemp(prefix="prometheus-multiproc-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    return metrics_dir
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="PDF Extraction API Server")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8000)
     parser.add_argument("--reload", action="store_true")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (ignored with --reload)")
 
     args = parser.parse_args()
+    workers = 1 if args.reload else args.workers
 
     print(f"Starting server on http://{args.host}:{args.port}")
     print(f"Docs: http://{args.host}:{args.port}/docs")
-    print(f"Auto-reload: {'enabled' if args.reload else 'disabled'}\n")
+    print(f"Auto-reload: {'enabled' if args.reload else 'disabled'}")
+    print(f"Workers: {workers}")
+    if workers > 1:
+        print(f"Metrics dir: {prepare_multiprocess_metrics()}")
+    print()
 
     uvicorn.run(
         "app.api:app",
         host=args.host,
         port=args.port,
-        reload=args.reload
+        reload=args.reload,
+        workers=None if args.reload else args.workers
     )
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""/extract/batch: upload limits, zip expansion and extraction against the fake Responses API."""
+import asyncio
+import io
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import api, llm
+from app.parse_pool import ParsePool
+
+SCHEMA = '{"nome": "Nome do profissional"}'
+EXAMPLES = Path(__file__).parent / "examples"
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _post_batch(files, **form):
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/extract/batch", files=files, data={
+                    "label": "test_batch", "extraction_schema": SCHEMA, **form})
+        finally:
+            await llm.close_client()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ParsePool(1)
+    monkeypatch.setattr(api, "parse_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def _uploads():
+    archive = _zip({
+        "docs/oab_1.pdf": (EXAMPLES / "oab_1.pdf").read_bytes(),
+        "docs/oab_2.pdf": (EXAMPLES / "oab_2.pdf").read_bytes(),
+        "docs/readme.txt": b"not a pdf",
+    })
+    return [
+        ("pdfs", ("docs.zip", archive, "application/zip")),
+        ("pdfs", ("oab_3.pdf", (EXAMPLES / "oab_3.pdf").read_bytes(), "application/pdf")),
+        ("pdfs", ("empty.pdf", b"", "application/pdf")),
+    ]
+
+
+def test_batch_extracts_loose_and_zipped_pdfs(fake_api, pool):
+    response = _post_batch(_uploads(), use_cache="false")
+
+    assert response.status_code == 200
+    body = response.json()
+    results = {entry["filename"]: entry for entry in body["results"]}
+    assert list(results) == ["docs/oab_1.pdf", "docs/oab_2.pdf", "oab_3.pdf", "empty.pdf"]
+    assert results["empty.pdf"] == {"filename": "empty.pdf", "status": "error", "error": "PDF file is empty"}
+    for name in ("docs/oab_1.pdf", "docs/oab_2.pdf", "oab_3.pdf"):
+        assert results[name]["status"] == "success" and list(results[name]["fields"]) == ["nome"]
+    assert body["metadata"]["documents"] == 4
+    assert pool.stats()["tasks"] == 3
+
+
+def test_batch_streams_one_line_per_document(fake_api, pool):
+    response = _post_batch(_uploads(), use_cache="false", stream="true")
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["type"] for event in events] == ["document"] * 4 + ["metadata"]
+    assert events[0]["filename"] == "empty.pdf"
+    assert sorted(event["status"] for event in events[1:4]) == ["success"] * 3
+
+
+def test_zip_bomb_is_rejected_before_inflating(monkeypatch):
+    monkeypatch.setattr(api, "BATCH_MAX_FILE_BYTES", 1024 * 1024)
+    bomb = _zip({"bomb.pdf": b"\0" * (8 * 1024 * 1024)})
+    assert len(bomb) < 64 * 1024
+
+    response = _post_batch([("pdfs", ("bomb.zip", bomb, "application/zip"))])
+
+    assert response.status_code == 400
+    assert "bomb.pdf exceeds" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("limit, expected", [("BATCH_MAX_DOCUMENTS", "documents"), ("BATCH_MAX_TOTAL_BYTES", "bytes")])
+def test_batch_limits_count_zip_members(monkeypatch, limit, expected):
+    monkeypatch.setattr(api, limit, 2 if limit == "BATCH_MAX_DOCUMENTS" else 2500)
+    archive = _zip({f"doc_{i}.pdf": b"%PDF" + b"x" * 1000 for i in range(3)})
+
+    response = _post_batch([("pdfs", ("docs.zip", archive, "application/zip"))])
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Batch exceeds") and expected in response.json()["detail"]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Request deadline and latency-aware LLM timeouts."""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import llm
+from app.deadline import LLM_LATENCY_MIN_SAMPLES, LLM_RESERVE_SECONDS, Deadline, LatencyTracker, llm_timeout
+
+
+def test_llm_timeout_follows_budget_and_latency():
+    tracker = LatencyTracker()
+
+    assert llm_timeout(Deadline(30.0), tracker, max_timeout=8.0) == 8.0
+    assert llm_timeout(Deadline(1.0), tracker) is None
+
+    for _ in range(LLM_LATENCY_MIN_SAMPLES):
+        tracker.record(0.4)
+    assert tracker.percentile(95) == 0.4
+
+    timeout = llm_timeout(Deadline(1.0), tracker)
+    assert 0.4 <= timeout <= 1.0 - LLM_RESERVE_SECONDS
+
+    for _ in range(LLM_LATENCY_MIN_SAMPLES):
+        tracker.record(3.0)
+    assert llm_timeout(Deadline(2.0), tracker) is None
+    assert llm_timeout(Deadline(30.0), tracker, max_timeout=8.0) == 8.0
+
+
+def test_llm_call_is_not_retried_past_its_timeout(fake_api):
+    fake_api.app.state.latency = 3.0
+    timeout = 1.0
+    schema = {"nome": "Nome"}
+
+    async def run():
+        start = time.perf_counter()
+        try:
+            result = await llm.resolve_batched_gpt5_mini("documento", schema, ["nome"], timeout_seconds=timeout,
+                                                         use_cache=False)
+            elapsed = time.perf_counter() - start
+            await asyncio.sleep(1.5)
+            return result, elapsed
+        finally:
+            await llm.close_client()
+
+    result, elapsed = asyncio.run(run())
+
+    assert result["nome"]["value"] is None
+    assert timeout <= elapsed < timeout + 0.3
+    assert fake_api.calls == 1
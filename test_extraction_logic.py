@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Test extraction logic directly without running the API server."""
 import sys
+import asyncio
 import json
 import logging
 from pathlib import Path
@@ -23,7 +24,7 @@ def main():
         "telefone": "Número de telefone"
     }
 
-    pdf_path = "oab_1.pdf"
+    pdf_path = Path(__file__).parent / "examples" / "oab_1.pdf"
     print(f"Parsing PDF: {pdf_path}")
 
     with open(pdf_path, 'rb') as pdf_file:
@@ -37,13 +38,13 @@ def main():
     print("Running extraction pipeline...")
     print("="*60 + "\n")
 
-    extracted = run_extraction_pipeline(
+    extracted = asyncio.run(run_extraction_pipeline(
         pdf_lines=result['lines'],
         doc_text=result['full_text'],
         schema=schema,
         label="oab",
         timeout_seconds=9.0
-    )
+    ))
 
     print("\nExtracted Fields:")
     print("="*60)
@@ -51,12 +52,16 @@ def main():
         print(f"  {field:15} = {value}")
     print("="*60)
 
+    missing = [field for field, value in extracted['fields'].items() if not value]
+
     print(f"\nMetadata:")
-    print(f"  Total fields: {extracted['metadata']['total_fields']}")
-    print(f"  Extracted: {extracted['metadata']['extracted_fields']}")
-    print(f"  Uncertain: {len(extracted['metadata']['uncertain_fields'])}")
-    if extracted['metadata']['uncertain_fields']:
-        print(f"  Uncertain fields: {', '.join(extracted['metadata']['uncertain_fields'])}")
+    print(f"  Total fields: {len(extracted['fields'])}")
+    print(f"  Extracted: {len(extracted['fields']) - len(missing)}")
+    print(f"  Missing: {len(missing)}")
+    if missing:
+        print(f"  Missing fields: {', '.join(missing)}")
+    print(f"  LLM used: {extracted['metadata']['llm_used']}")
+    print(f"  Processing time: {extracted['metadata']['processing_time']:.3f}s")
 
 if __name__ == "__main__":
     main()
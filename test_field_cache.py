@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""FieldCache: label generations invalidate cached fields when the KB heuristics change."""
+import copy
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import kb
+from app.cache import FieldCache, field_cache
+from app.kb import KBStore
+
+SCHEMA = {"nome": "Nome do profissional"}
+
+
+def test_invalidating_a_label_misses_only_its_fields():
+    cache = FieldCache()
+    cache.put("doc", "a", "nome", "Nome", "FULANO", "heuristic")
+    cache.put("doc", "b", "nome", "Nome", "BELTRANO", "heuristic")
+
+    cache.invalidate_label("a")
+
+    assert cache.get("doc", "a", "nome", "Nome") is None
+    assert cache.get("doc", "b", "nome", "Nome") == {"value": "BELTRANO", "source": "heuristic"}
+    assert cache.generation("a") == 1 and cache.generation("b") == 0
+
+
+def test_values_computed_from_a_stale_generation_are_dropped():
+    cache = FieldCache()
+    generation = cache.generation("a")
+    cache.invalidate_label("a")
+
+    cache.put("doc", "a", "nome", "Nome", "FULANO", "heuristic", generation)
+
+    assert cache.get("doc", "a", "nome", "Nome") is None
+
+
+def test_new_anchor_invalidates_but_layout_only_update_does_not(store):
+    kb.save_kb("test_field_cache", kb.init_from_schema("test_field_cache", SCHEMA))
+    generation = field_cache.generation("test_field_cache")
+
+    kb.update_kb("test_field_cache", {"nome": "FULANO"}, field_outcomes={"nome": True})
+    assert field_cache.generation("test_field_cache") == generation
+
+    kb.update_kb("test_field_cache", {"nome": "FULANO"},
+                 heuristic_evidence={"nome": {"anchor_used": "Nome completo"}})
+    assert field_cache.generation("test_field_cache") == generation + 1
+
+
+def test_kb_reloaded_from_disk_invalidates(store, tmp_path):
+    label_kb = kb.init_from_schema("test_field_cache_disk", SCHEMA)
+    kb.save_kb("test_field_cache_disk", label_kb)
+    store.flush()
+    kb.load_kb("test_field_cache_disk")
+    generation = field_cache.generation("test_field_cache_disk")
+
+    other_process = KBStore(flush_interval=0.0)
+    changed = copy.deepcopy(label_kb)
+    changed["anchors"]["nome"].append("nome completo")
+    other_process.put("test_field_cache_disk", changed)
+    other_process.close()
+    kb_path = next(tmp_path.glob("*test_field_cache_disk.json"))
+    os.utime(kb_path, (kb_path.stat().st_atime, kb_path.stat().st_mtime + 1))
+
+    assert kb.load_kb("test_field_cache_disk")["anchors"]["nome"][-1] == "nome completo"
+    assert field_cache.generation("test_field_cache_disk") == generation + 1
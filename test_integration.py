@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from app.pipeline import run_extraction_pipeline
 from app.pdf_parser import parse_pdf
+import asyncio
 import json
 import sys
 from pathlib import Path
@@ -9,8 +10,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-def test_extraction(pdf_path: str, label: str, schema: dict):
-    """Test extraction on a single PDF."""
+def run_extraction(pdf_path: str, label: str, schema: dict):
+    """Run and print the extraction of a single PDF."""
     print(f"\n{'='*60}")
     print(f"Testing: {pdf_path}")
     print(f"Label: {label}")
@@ -26,13 +27,13 @@ def test_extraction(pdf_path: str, label: str, schema: dict):
 
     # Run extraction
     print("2. Running extraction pipeline...")
-    result = run_extraction_pipeline(
+    result = asyncio.run(run_extraction_pipeline(
         pdf_lines=parse_result["lines"],
         doc_text=parse_result["full_text"],
         schema=schema,
         label=label,
         timeout_seconds=9.0
-    )
+    ))
 
     # Display results
     print("\n3. Results:")
@@ -47,7 +48,8 @@ def test_extraction(pdf_path: str, label: str, schema: dict):
 
 def main():
     """Run tests on dataset."""
-    dataset_path = Path("dataset.json")
+    root = Path(__file__).parent
+    dataset_path = root / "dataset.json"
 
     if not dataset_path.exists():
         print(f"Error: {dataset_path} not found")
@@ -59,7 +61,7 @@ def main():
     # Test first entry
     if dataset:
         for entry in dataset:
-            pdf_path = f'examples/{entry["pdf_path"]}'
+            pdf_path = root / "examples" / entry["pdf_path"]
             label = entry["label"]
             schema = entry["extraction_schema"]
 
@@ -67,7 +69,7 @@ def main():
                 print(f"Error: PDF not found: {pdf_path}")
                 sys.exit(1)
 
-            result = test_extraction(pdf_path, label, schema)
+            result = run_extraction(pdf_path, label, schema)
 
             print(f"\n{'='*60}")
             print("Test completed!")
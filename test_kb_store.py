@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""KB store: concurrent updates, write-behind flush and cross-process merge."""
+import json
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import kb
+from app.kb import KBStore, merge_kb
+
+
+def _evidence(anchor: str):
+    return {"nome": {"anchor_used": anchor, "position": (0.1, 0.1), "line_text": ""}}
+
+
+def test_concurrent_updates_are_not_lost(store, tmp_path):
+    threads = [
+        threading.Thread(target=kb.update_kb, args=("oab", {"nome": "X"}, _evidence(f"anchor {i}")))
+        for i in range(50)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(kb.load_kb("oab")["anchors"]["nome"]) == 50
+    assert kb.load_kb("oab")["region_counts"]["nome"]["top_left"] == 50
+
+    store.close()
+    with open(tmp_path / "label_oab.json", encoding="utf-8") as f:
+        on_disk = json.load(f)
+    assert len(on_disk["anchors"]["nome"]) == 50
+    assert store.stats()["flushes"] < 50
+
+
+def test_flush_merges_updates_from_other_processes(store, tmp_path):
+    other = KBStore(flush_interval=0, refresh_interval=0.0)
+
+    kb.update_kb("oab", {"nome": "X"}, _evidence("nome completo"))
+    store.flush()
+    other.get("oab")
+
+    # both "processes" learn something different from the same base
+    kb.update_kb("oab", {"nome": "X"}, _evidence("titular"))
+    with other.lock("oab"):
+        theirs = json.loads(json.dumps(other.get("oab")))
+        theirs["anchors"]["nome"].append("advogado")
+        theirs["region_counts"]["nome"]["top_left"] += 2
+        other.put("oab", theirs)
+
+    store.flush()
+
+    merged = kb.load_kb("oab")
+    assert merged["anchors"]["nome"] == ["nome completo", "advogado", "titular"]
+    assert merged["region_counts"]["nome"]["top_left"] == 4
+    assert store.stats()["merges"] == 1
+
+
+def test_version_changes_when_the_kb_is_replaced(store):
+    other = KBStore(flush_interval=0, refresh_interval=0.0)
+
+    kb.update_kb("oab", {"nome": "X"}, _evidence("nome completo"))
+    store.flush()
+    version = store.version("oab")
+    assert store.version("oab") == version
+
+    # a write from another process is picked up on the next read
+    other.put("oab", {**other.get("oab"), "anchors": {"nome": ["titular"]}})
+    assert store.get("oab")["anchors"]["nome"] == ["titular"]
+    assert store.version("oab") != version
+
+def test_merge_kb_counts_and_lists():
+    base = {"anchors": {"a": ["x"]}, "region_counts": {"a": {"top_left": 1}}}
+    ours = {"anchors": {"a": ["x", "y"]}, "region_counts": {"a": {"top_left": 3}}}
+    theirs = {"anchors": {"a": ["x", "z"], "b": ["w"]}, "region_counts": {"a": {"top_left": 2}}}
+
+    merged = merge_kb(base, ours, theirs)
+
+    assert merged["anchors"] == {"a": ["x", "z", "y"], "b": ["w"]}
+    assert merged["region_counts"]["a"]["top_left"] == 4
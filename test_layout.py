@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Layout templates: learned from confirmed extractions, read back on matching documents."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import kb
+from app.layout import TEMPLATE_MIN_SEEN, layout_evidence
+from app.pdf_parser import parse_pdf_bytes
+from app.pipeline import run_heuristics
+
+EXAMPLES = Path(__file__).parent / "examples"
+LABEL = "carteira_oab"
+SCHEMA = {"nome": "Nome do profissional", "inscricao": "Número de inscrição", "seccional": "Seccional",
+          "subsecao": "Subseção", "categoria": "Categoria", "situacao": "Situação do profissional"}
+CONFIRMED = {"nome": "JOANA D'ARC", "inscricao": "101943", "seccional": "PR",
+             "subsecao": "CONSELHO SECCIONAL - PARANÁ", "categoria": "SUPLEMENTAR",
+             "situacao": "SITUAÇÃO REGULAR"}
+
+
+def _lines(name: str):
+    return parse_pdf_bytes((EXAMPLES / name).read_bytes())["lines"]
+
+
+def test_template_fast_path(store):
+    lines = _lines("oab_1.pdf")
+    labels = run_heuristics(lines, SCHEMA, LABEL, use_cache=False).labels
+
+    for _ in range(TEMPLATE_MIN_SEEN):
+        kb.update_kb(LABEL, CONFIRMED, layout=layout_evidence(lines, labels, CONFIRMED))
+
+    state = run_heuristics(lines, SCHEMA, LABEL, use_cache=False)
+    assert state.results == CONFIRMED
+    assert set(state.sources.values()) == {"template"}
+
+    other = run_heuristics(_lines("tela_sistema_1.pdf"), SCHEMA, LABEL, use_cache=False)
+    assert "template" not in other.sources.values()
+
+
+def test_jittered_layouts_share_one_template(store):
+    lines = _lines("oab_1.pdf")
+    labels = run_heuristics(lines, SCHEMA, LABEL, use_cache=False).labels
+    evidence = layout_evidence(lines, labels, CONFIRMED)
+
+    for shift in (0.0, 2.0, -2.0, 1.0):
+        jittered = dict(evidence, landmarks=[[text, x0 + shift, y0 + shift, page]
+                                             for text, x0, y0, page in evidence["landmarks"]])
+        kb.update_kb(LABEL, CONFIRMED, layout=jittered)
+
+    templates = kb.load_kb(LABEL)["templates"]
+    assert len(templates) == 1
+    assert next(iter(templates.values()))["seen"] == 4
+
+
+def test_template_reads_are_not_counted_as_evidence(store):
+    from app.pipeline import learn_from_results
+
+    lines = _lines("oab_1.pdf")
+    labels = run_heuristics(lines, SCHEMA, LABEL, use_cache=False).labels
+    for _ in range(TEMPLATE_MIN_SEEN):
+        kb.update_kb(LABEL, CONFIRMED, layout=layout_evidence(lines, labels, CONFIRMED))
+
+    state = run_heuristics(lines, SCHEMA, LABEL, use_cache=False)
+    learn_from_results(LABEL, state, {})
+
+    template = next(iter(kb.load_kb(LABEL)["templates"].values()))
+    assert template["seen"] == TEMPLATE_MIN_SEEN + 1
+    assert all(sum(positions.values()) == TEMPLATE_MIN_SEEN for positions in template["fields"].values())
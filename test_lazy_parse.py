@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Lazy page-by-page parsing: early stops, no wasted passes and a KB initialized from the whole schema."""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import kb, pipeline
+from app.pipeline import run_heuristics_lazy
+from benchmarks.synth_corpus import generate_corpus
+
+EXAMPLES = Path(__file__).parent / "examples"
+SCHEMA = {"nome": "Nome do profissional", "inscricao": "Número de inscrição", "situacao": "Situação"}
+
+
+def _synth_document(out: Path, field_page: str):
+    """A 4-page carteira_oab document from synth_corpus.py, its schema, truth and KB seed."""
+    entry, = generate_corpus(out, "carteira_oab", docs=1, pages=4, fields=4, columns=2, anchor_noise=0.0,
+                             kb_anchors=3, field_page=field_page)
+    truth = json.loads((out / "ground_truth.json").read_text(encoding="utf-8"))[entry["pdf_path"]]
+    seed = json.loads((out / "kb" / "label_carteira_oab.json").read_text(encoding="utf-8"))
+    return (out / entry["pdf_path"]).read_bytes(), entry["extraction_schema"], truth, seed
+
+
+def _record_parsed_pages(monkeypatch):
+    parsed = []
+    iter_pdf_pages = pipeline.iter_pdf_pages
+
+    def recording(*args, **kwargs):
+        for page in iter_pdf_pages(*args, **kwargs):
+            parsed.append(page[0])
+            yield page
+
+    monkeypatch.setattr(pipeline, "iter_pdf_pages", recording)
+    return parsed
+
+
+def test_fields_on_the_first_page_stop_parsing_there(store, monkeypatch, tmp_path):
+    pdf_bytes, schema, truth, seed = _synth_document(tmp_path / "corpus", "first")
+    kb.save_kb("carteira_oab", seed)
+    parsed = _record_parsed_pages(monkeypatch)
+
+    state, parse_result = run_heuristics_lazy(pdf_bytes, schema, "carteira_oab", use_cache=False)
+
+    assert parse_result is None
+    assert parsed == [1]
+    assert state.results == truth
+
+
+def test_fields_on_the_last_page_are_looked_up_there_first(store, monkeypatch, tmp_path):
+    pdf_bytes, schema, truth, seed = _synth_document(tmp_path / "corpus", "last")
+    seed["page_counts"] = {field: {"4": 3} for field in schema}
+    kb.save_kb("carteira_oab", seed)
+    parsed = _record_parsed_pages(monkeypatch)
+
+    state, parse_result = run_heuristics_lazy(pdf_bytes, schema, "carteira_oab", use_cache=False)
+
+    assert parse_result is None
+    assert parsed == [4]
+    assert state.results == truth
+
+
+def test_one_page_document_gets_no_page_pass(store, monkeypatch):
+    calls = []
+    run_heuristics = pipeline.run_heuristics
+    monkeypatch.setattr(pipeline, "run_heuristics", lambda *args, **kwargs: calls.append(args) or run_heuristics(
+        *args, **kwargs))
+
+    pdf_bytes = (EXAMPLES / "oab_1.pdf").read_bytes()
+    state, parse_result = run_heuristics_lazy(pdf_bytes, SCHEMA, "test_lazy", use_cache=False, full_pass=False)
+    assert state is None and parse_result["page_count"] == 1
+    assert calls == []
+
+    state, _ = run_heuristics_lazy(pdf_bytes, SCHEMA, "test_lazy", use_cache=False)
+    assert len(calls) == 1
+    assert set(state.results) == set(SCHEMA)
+
+
+def test_kb_is_initialized_from_the_full_schema(store):
+    pdf_bytes = (EXAMPLES / "oab_1.pdf").read_bytes()
+    run_heuristics_lazy(pdf_bytes, SCHEMA, "test_lazy_init", use_cache=False, full_pass=False)
+
+    assert set(kb.load_kb("test_lazy_init")["anchors"]) == set(SCHEMA)
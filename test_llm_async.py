@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Async LLM path against the local fake Responses API (benchmarks/fake_openai.py)."""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import LATENCY
+from app import llm
+from app.pdf_parser import parse_pdf
+from app.pipeline import run_extraction_pipeline
+
+
+def test_concurrent_llm_calls_overlap(fake_api):
+    schema = {"nome": "Nome", "inscricao": "Inscrição"}
+
+    async def run():
+        calls = [
+            llm.resolve_batched_gpt5_mini(
+                doc_text=f"documento {i}",
+                schema=schema,
+                uncertain_fields=list(schema),
+                candidates_by_field={"nome": [f"NOME {i}"]},
+                use_cache=False
+            )
+            for i in range(20)
+        ]
+        try:
+            return await asyncio.gather(*calls)
+        finally:
+            await llm.close_client()
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert fake_api.calls == 20
+    assert elapsed < 4 * LATENCY
+    for i, result in enumerate(results):
+        assert result["nome"]["value"] == f"NOME {i}"
+        assert result["inscricao"]["value"] == "stub-inscricao"
+
+
+def test_pipeline_is_awaitable(fake_api):
+    with open(Path(__file__).parent / "examples" / "oab_1.pdf", "rb") as f:
+        parse_result = parse_pdf(f)
+
+    schema = {"nome": "Nome do profissional", "situacao": "Situação do profissional"}
+
+    async def run():
+        try:
+            return await run_extraction_pipeline(
+                pdf_lines=parse_result["lines"],
+                doc_text=parse_result["full_text"],
+                schema=schema,
+                label="test_async",
+                use_cache=False
+            )
+        finally:
+            await llm.close_client()
+
+    result = asyncio.run(run())
+
+    assert result["metadata"]["llm_used"] is True
+    assert set(result["fields"]) == set(schema)
+    assert all(value for value in result["fields"].values())
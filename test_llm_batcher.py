@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""LLMBatcher: concurrent single-document requests coalesced into multi-document calls."""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import llm
+from app.deadline import batch_llm_latency, llm_latency
+from app.llm_batcher import LLMBatcher
+
+
+def test_concurrent_requests_are_coalesced(fake_api):
+    schema = {"nome": "Nome", "inscricao": "Inscrição"}
+    batcher = LLMBatcher(window_ms=50, max_docs=4)
+
+    async def run():
+        calls = [
+            batcher.resolve(
+                label="test_batcher",
+                doc_text=f"documento {i}",
+                schema=schema,
+                uncertain_fields=list(schema),
+                candidates_by_field={"nome": [f"NOME {i}"]},
+                use_cache=False
+            )
+            for i in range(6)
+        ]
+        try:
+            return await asyncio.gather(*calls)
+        finally:
+            await llm.close_client()
+
+    extract_calls, batch_calls = llm_latency.stats()["calls"], batch_llm_latency.stats()["calls"]
+    results = asyncio.run(run())
+
+    assert fake_api.calls == 2
+    assert batcher.stats()["coalesced_calls"] == 2
+    assert llm_latency.stats()["calls"] == extract_calls + 2
+    assert batch_llm_latency.stats()["calls"] == batch_calls
+    for i, result in enumerate(results):
+        assert result["nome"]["value"] == f"NOME {i}"
+        assert result["inscricao"]["value"] == "stub-inscricao"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""AnchorMatcher (Aho-Corasick) must agree with a naive per-anchor substring scan."""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.matcher import AnchorMatcher, get_matcher
+from app.normalize import normalize_str
+from app.pdf_parser import parse_pdf
+
+
+def naive_hits(lines, anchors_by_field):
+    hits = {}
+    for idx, line in enumerate(lines):
+        if not line.get("text", ""):
+            continue
+        norm_text = normalize_str(line["text"])
+        for field, anchors in anchors_by_field.items():
+            for anchor in anchors:
+                if normalize_str(anchor) in norm_text:
+                    hits.setdefault(field, []).append((idx, anchor))
+    return hits
+
+
+def naive_search(norm_text, patterns):
+    matches = []
+    for pid, pattern in enumerate(patterns):
+        start = norm_text.find(pattern)
+        while start != -1:
+            matches.append((start, pid))
+            start = norm_text.find(pattern, start + 1)
+    return sorted(matches)
+
+
+def test_overlapping_anchors_match_naive_scan():
+    rng = random.Random(5)
+    anchors_by_field = {
+        field: ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 4))).strip() or "a" for _ in range(6)]
+        for field in ("f1", "f2", "f3")
+    }
+    lines = [{"text": "".join(rng.choice("abcABC :") for _ in range(rng.randint(0, 30)))} for _ in range(300)]
+
+    matcher = AnchorMatcher(anchors_by_field)
+
+    assert matcher.find_hits(lines) == naive_hits(lines, anchors_by_field)
+    for line in lines:
+        norm_text = normalize_str(line["text"])
+        assert sorted(matcher.search(norm_text)) == naive_search(norm_text, matcher.patterns)
+
+
+def test_example_documents_match_naive_scan():
+    anchors_by_field = {
+        "inscricao": ["Inscrição", "inscricao", "Nº"],
+        "seccional": ["Seccional", "seção", "sec"],
+        "situacao": ["Situação", "situacao regular", "regular"],
+        "endereco": ["Endereço Profissional", "endereco", "CEP"],
+        "data": ["Data", "data de referencia", "de"],
+        "parcelas": ["Parcelas", "total de parcelas", "parcela"],
+    }
+
+    for pdf_path in sorted((Path(__file__).parent / "examples").glob("*.pdf")):
+        with open(pdf_path, "rb") as f:
+            lines = parse_pdf(f)["lines"]
+        assert AnchorMatcher(anchors_by_field).find_hits(lines) == naive_hits(lines, anchors_by_field), pdf_path.name
+
+
+def test_matcher_is_rebuilt_only_when_the_kb_version_changes(store):
+    store.put("test_matcher_cache", {"anchors": {"nome": ["nome"]}})
+    kb, version = store.get_versioned("test_matcher_cache")
+    first = get_matcher("test_matcher_cache", version, kb["anchors"])
+
+    assert get_matcher("test_matcher_cache", store.version("test_matcher_cache"), kb["anchors"]) is first
+
+    store.put("test_matcher_cache", {"anchors": {"nome": ["nome", "nome completo"]}})
+    kb, version = store.get_versioned("test_matcher_cache")
+    second = get_matcher("test_matcher_cache", version, kb["anchors"])
+
+    assert second is not first
+    assert "nome completo" in second.patterns
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Prometheus metrics exposed on /metrics."""
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import httpx
+from prometheus_client import REGISTRY
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import api, llm
+from app.api import app
+
+ROOT = Path(__file__).parent
+
+
+def test_metrics_report_stages_and_field_sources(fake_api):
+    pdf_bytes = (Path(__file__).parent / "examples" / "oab_1.pdf").read_bytes()
+    form = {"label": "test_metrics", "extraction_schema": '{"nome": "Nome do profissional"}', "use_cache": "false"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post("/extract", data=form, files={"pdf": ("oab_1.pdf", pdf_bytes, "application/pdf")})
+                return await client.get("/metrics")
+        finally:
+            await llm.close_client()
+
+    body = asyncio.run(run()).text
+
+    for stage in ("upload_read", "parse_pdf", "heuristics", "llm", "update_kb"):
+        assert f'extraction_stage_seconds_count{{label="test_metrics",stage="{stage}"}} 1.0' in body
+    assert 'extraction_fields_total{field="nome",label="test_metrics",source="llm"} 1.0' in body
+    assert 'extraction_requests_in_flight{endpoint="/extract"} 0.0' in body
+
+
+def test_streaming_requests_stay_in_flight_until_the_stream_ends(fake_api, monkeypatch):
+    pdf_bytes = (ROOT / "examples" / "oab_1.pdf").read_bytes()
+    form = {"label": "test_metrics_stream", "extraction_schema": '{"nome": "Nome do profissional"}',
+            "use_cache": "false", "stream": "true"}
+    in_flight = []
+    iter_extraction_events = api.iter_extraction_events
+
+    async def recording(**kwargs):
+        async for event in iter_extraction_events(**kwargs):
+            in_flight.append(REGISTRY.get_sample_value("extraction_requests_in_flight", {"endpoint": "/extract"}))
+            yield event
+
+    monkeypatch.setattr(api, "iter_extraction_events", recording)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post("/extract", data=form, files={"pdf": ("oab_1.pdf", pdf_bytes, "application/pdf")})
+        finally:
+            await llm.close_client()
+
+    asyncio.run(run())
+
+    assert in_flight and set(in_flight) == {1.0}
+    assert REGISTRY.get_sample_value("extraction_requests_in_flight", {"endpoint": "/extract"}) == 0.0
+
+
+def test_multiprocess_metrics_add_up_the_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = ("from app.metrics import REQUESTS_IN_FLIGHT, record_fields;"
+              "record_fields('test_mp', {'nome': 'X'}, {'nome': 'llm'});"
+              "REQUESTS_IN_FLIGHT.labels(endpoint='/extract').inc()")
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=ROOT, env=env, check=True)
+
+    scrape = "from app.metrics import render; print(render()[0].decode())"
+    body = subprocess.run([sys.executable, "-c", scrape], cwd=ROOT, env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+    assert 'extraction_fields_total{field="nome",label="test_mp",source="llm"} 2.0' in body
+    # the in-flight requests of exited workers are gone
+    assert 'extraction_requests_in_flight{endpoint="/extract"}' not in body
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""ParseCache: LRU order, byte-budget eviction and the disk tier."""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.cache import ParseCache
+
+
+def _result(text: str):
+    return {"lines": [{"text": text}], "full_text": text, "page_count": 1}
+
+
+def _size(result):
+    return len(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ParseCache(max_bytes=3 * _size(_result("a")))
+    for key in "abc":
+        cache.put(key, _result(key))
+
+    assert cache.get("a") is not None
+    cache.put("d", _result("d"))
+
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_is_enforced():
+    cache = ParseCache(max_bytes=_size(_result("x" * 100)) + _size(_result("y")))
+    cache.put("big", _result("x" * 100))
+    cache.put("small", _result("y"))
+    cache.put("other", _result("z"))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert cache.get("big") is None and cache.get("other") is not None
+
+
+def test_oversized_results_are_not_kept_in_memory():
+    cache = ParseCache(max_bytes=10)
+    cache.put("huge", _result("x" * 100))
+
+    assert cache.stats()["entries"] == 0
+    assert cache.get("huge") is None
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ParseCache(cache_dir=str(tmp_path)).put("doc", _result("Inscrição"))
+
+    cache = ParseCache(cache_dir=str(tmp_path))
+    assert cache.get("doc") == _result("Inscrição")
+    assert cache.get("doc") == _result("Inscrição")
+    assert (cache.stats()["disk_hits"], cache.stats()["hits"]) == (1, 1)
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    (tmp_path / "doc.json").write_text("{not json")
+
+    cache = ParseCache(cache_dir=str(tmp_path))
+    assert cache.get("doc") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Parse pool: compact result packing and parsing in worker processes."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.parse_pool import ParsePool, pack_parse_result, unpack_parse_result
+from app.pdf_parser import parse_pdf_bytes
+
+EXAMPLES = sorted((Path(__file__).parent / "examples").glob("*.pdf"))
+
+
+@pytest.mark.parametrize("pdf_path", EXAMPLES, ids=lambda path: path.name)
+def test_pack_round_trip_matches_parse_pdf(pdf_path):
+    result = parse_pdf_bytes(pdf_path.read_bytes())
+
+    assert unpack_parse_result(pack_parse_result(result)) == result
+
+
+def test_long_lines_keep_their_offsets():
+    text = "x" * 70000
+    result = {
+        "lines": [
+            {"text": text, "norm_text": text, "norm_offsets": list(range(70001)), "y_rel": 0.5, "x_rel": 0.5,
+             "bbox": {}, "spans": []},
+            {"text": "", "norm_text": "", "norm_offsets": [], "y_rel": 0.0, "x_rel": 0.0,
+             "bbox": {"x0": 1.0, "y0": 2.0, "x1": 3.0, "y1": 4.0, "width": 2.0, "height": 2.0, "page": 1},
+             "spans": [{"text": "", "bbox": [1.0, 2.0, 3.0, 4.0]}]},
+        ],
+        "full_text": text + "\n",
+        "page_count": 1,
+    }
+
+    assert unpack_parse_result(pack_parse_result(result)) == result
+
+
+def test_pool_parses_in_worker_processes():
+    pool = ParsePool(1)
+
+    async def run():
+        return await asyncio.gather(*(pool.parse(path.read_bytes()) for path in EXAMPLES))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert results == [parse_pdf_bytes(path.read_bytes()) for path in EXAMPLES]
+    assert pool.stats()["tasks"] == len(EXAMPLES) and pool.stats()["failures"] == 0
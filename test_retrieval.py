@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""LLM context selection: BM25 over document lines under a token budget."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.retrieval import CHARS_PER_TOKEN, GAP_MARKER, field_query, select_context
+
+
+def test_select_context():
+    filler = [f"Cláusula {i}: o contratante declara ciência das condições gerais." for i in range(300)]
+    lines = filler[:250] + ["Data de vencimento", "15/03/2025"] + filler[250:]
+    doc_text = "\n".join(lines)
+
+    assert select_context("Nome\nJOANA", ["nome"]) == "Nome\nJOANA"
+
+    query = field_query("data_vencimento", "Data de vencimento do contrato", ["vencimento"])
+    context = select_context(doc_text, [query], max_tokens=100)
+
+    assert len(context) <= 100 * CHARS_PER_TOKEN + 2 * len(GAP_MARKER) + 2
+    assert "Data de vencimento\n15/03/2025" in context
+    assert context.startswith(GAP_MARKER) and context.endswith(GAP_MARKER)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""score_candidates: region positions from line_positions, enum matches and totals."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.heuristics import Candidate, score_candidates
+
+
+def test_position_scores_come_from_line_positions():
+    line_positions = [0.1, 0.5, 0.9]
+    candidates = [Candidate(value="Fulano", line_idx=i, method="below", anchor_score=1.0) for i in range(4)]
+
+    header = score_candidates([Candidate(**vars(c)) for c in candidates], {"region_hint": "header"}, line_positions)
+    footer = score_candidates([Candidate(**vars(c)) for c in candidates], {"region_hint": "footer"}, line_positions)
+
+    assert [c.position_score for c in header] == [1.0, 0.5, 0.5, 0.5]
+    assert [c.position_score for c in footer] == [0.5, 0.5, 1.0, 0.5]
+
+
+def test_enum_scores_and_totals():
+    candidates = [Candidate(value="advogado", line_idx=0, method="below", anchor_score=1.0),
+                  Candidate(value="Fulano", line_idx=0, method="below", anchor_score=1.0)]
+
+    scored = score_candidates(candidates, {"enums": ["ADVOGADO"]}, [])
+
+    assert [c.enum_score for c in scored] == [1.0, 0.0]
+    assert [c.total_score for c in scored] == [0.5 + 0.15 + 0.2, 0.5 + 0.15]
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Identical in-flight /extract requests share one extraction."""
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import llm
+from app.api import app
+from app.cache import single_flight
+
+
+def test_identical_inflight_requests_share_one_extraction(fake_api):
+    pdf_bytes = (Path(__file__).parent / "examples" / "oab_1.pdf").read_bytes()
+    form = {"label": "test_single_flight", "extraction_schema": '{"nome": "Nome do profissional"}'}
+    before = dict(single_flight.stats())
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.post("/extract", data=form, files={"pdf": ("oab_1.pdf", pdf_bytes, "application/pdf")})
+                    for _ in range(5)
+                ))
+        finally:
+            await llm.close_client()
+
+    responses = asyncio.run(run())
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.text for response in responses}) == 1
+    assert fake_api.calls == 1
+    assert single_flight.stats()["deduplicated"] - before["deduplicated"] == 4
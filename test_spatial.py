@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Spatial index lookups and the right_of / below candidate methods."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import kb
+from app.heuristics import extract_candidates
+from app.pipeline import run_heuristics
+from app.spatial import SpatialIndex
+
+
+def _line(*spans, page=1):
+    text = " ".join(text for text, _ in spans)
+    x0 = min(box[0] for _, box in spans)
+    y0 = min(box[1] for _, box in spans)
+    x1 = max(box[2] for _, box in spans)
+    y1 = max(box[3] for _, box in spans)
+    return {
+        "text": text,
+        "y_rel": y0 / 800,
+        "x_rel": (x0 + x1) / 2 / 600,
+        "bbox": {"x0": x0, "y0": y0, "x1": x1, "y1": y1, "width": x1 - x0, "height": y1 - y0, "page": page},
+        "spans": [{"text": text, "bbox": list(box)} for text, box in spans],
+    }
+
+
+LINES = [
+    _line(("Data Base", (10, 100, 60, 114)), ("Produto", (200, 100, 240, 114))),
+    _line(("04/02/2021", (10, 113, 65, 127)), ("REFINANCIAMENTO", (200, 113, 290, 127))),
+    _line(("Negativado SERASA?", (10, 300, 110, 314)), ("Não", (400, 300, 420, 314))),
+]
+
+
+def test_queries():
+    index = SpatialIndex(LINES)
+
+    header = index.entry_id(0, 0)
+    assert index.texts[index.right_of(header, index.boxes[header])] == "Produto"
+    assert index.texts[index.below(header, index.boxes[header])] == "04/02/2021"
+
+    question = index.entry_id(2, 0)
+    assert index.texts[index.right_of(question, index.boxes[question])] == "Não"
+    assert index.below(question, index.boxes[question]) is None
+
+
+def test_spatial_candidates():
+    index = SpatialIndex(LINES, labels=["data base", "produto"])
+
+    def candidates(field, anchor):
+        found = extract_candidates(LINES, field, "", {"anchors": [anchor]}, spatial=index)
+        return [(c.method, c.value) for c in found if c.method in ("right_of", "below")]
+
+    assert candidates("data_base", "data base") == [("below", "04/02/2021")]
+    assert candidates("produto", "produto") == [("below", "REFINANCIAMENTO")]
+    assert candidates("negativado", "negativado serasa") == [("right_of", "Não")]
+
+
+def test_unambiguous_spatial_values_are_accepted(store):
+    schema = {"negativado_serasa": "Negativado no SERASA?", "data_base": "Data base", "produto": "Produto"}
+    kb.save_kb("test_spatial", kb.init_from_schema("test_spatial", schema))
+
+    state = run_heuristics(LINES, schema, "test_spatial", use_cache=False)
+
+    assert state.results == {"negativado_serasa": "Não", "data_base": "04/02/2021", "produto": "REFINANCIAMENTO"}
+    assert state.heuristic_evidence["negativado_serasa"]["method"] == "right_of"
+
+
+def test_conflicting_aligned_values_are_left_uncertain(store):
+    lines = LINES + [_line(("Produto", (10, 500, 50, 514)), ("CARTAO", (60, 500, 100, 514)))]
+    schema = {"produto": "Produto"}
+    kb.save_kb("test_spatial", kb.init_from_schema("test_spatial", schema))
+
+    state = run_heuristics(lines, schema, "test_spatial", use_cache=False)
+
+    assert state.uncertain_fields == ["produto"]
+    assert set(state.candidates_by_field["produto"]) >= {"REFINANCIAMENTO", "CARTAO"}
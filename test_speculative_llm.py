@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Speculative LLM calls for fields the label's heuristics rarely accept."""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import LATENCY
+from app import kb, llm, pipeline
+from app.pdf_parser import parse_pdf
+from app.pipeline import run_extraction_pipeline
+
+
+def test_weak_fields_go_to_llm_during_heuristics(fake_api, monkeypatch):
+    with open(Path(__file__).parent / "examples" / "oab_1.pdf", "rb") as f:
+        parse_result = parse_pdf(f)
+
+    schema = {"nome": "Nome do profissional", "situacao": "Situação do profissional"}
+    label_kb = kb.init_from_schema("test_speculative", schema)
+    label_kb["field_stats"] = {field: {"attempts": 10, "accepted": 0} for field in schema}
+    kb.save_kb("test_speculative", label_kb)
+
+    run_heuristics = pipeline.run_heuristics
+
+    def slow_heuristics(*args, **kwargs):
+        time.sleep(LATENCY)
+        return run_heuristics(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "run_heuristics", slow_heuristics)
+
+    async def run():
+        # The first call of a process pays one-off import and connection costs
+        await llm.resolve_batched_gpt5_mini("warm-up", schema, ["nome"], use_cache=False)
+        calls = fake_api.calls
+        start = time.perf_counter()
+        try:
+            result = await run_extraction_pipeline(
+                pdf_lines=parse_result["lines"],
+                doc_text=parse_result["full_text"],
+                schema=schema,
+                label="test_speculative",
+                use_cache=False
+            )
+            return result, time.perf_counter() - start, fake_api.calls - calls
+        finally:
+            await llm.close_client()
+
+    result, elapsed, calls = asyncio.run(run())
+
+    assert calls == 1
+    assert elapsed < 1.6 * LATENCY
+    assert all(value for value in result["fields"].values())
+
+
+def test_speculative_nulls_are_retried_with_candidates(fake_api, monkeypatch):
+    import fake_openai
+
+    answer_fields = fake_openai._answer_fields
+    monkeypatch.setattr(fake_openai, "_answer_fields", lambda fields_line: {
+        field: None if value.startswith("stub-") else value for field, value in answer_fields(fields_line).items()
+    })
+
+    schema = {"nome": "Nome do profissional"}
+    label_kb = kb.init_from_schema("test_speculative_follow_up", schema)
+    label_kb["field_stats"] = {"nome": {"attempts": 10, "accepted": 0}}
+    kb.save_kb("test_speculative_follow_up", label_kb)
+
+    monkeypatch.setattr(pipeline, "run_heuristics", lambda *args: pipeline.HeuristicPass(
+        results={"nome": None}, uncertain_fields=["nome"], candidates_by_field={"nome": ["FULANO DE TAL"]}))
+
+    async def run():
+        try:
+            return await run_extraction_pipeline(
+                pdf_lines=[{"text": "FULANO DE TAL"}],
+                doc_text="FULANO DE TAL",
+                schema=schema,
+                label="test_speculative_follow_up",
+                use_cache=False
+            )
+        finally:
+            await llm.close_client()
+
+    result = asyncio.run(run())
+
+    assert fake_api.calls == 2
+    assert result["fields"]["nome"] == "FULANO DE TAL"
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Streaming pipeline events: fields as soon as they are final, then metadata."""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app import llm
+from app.pdf_parser import parse_pdf
+from app.pipeline import iter_extraction_events
+
+
+def test_pipeline_events_stream_fields_before_metadata(fake_api):
+    with open(Path(__file__).parent / "examples" / "oab_1.pdf", "rb") as f:
+        parse_result = parse_pdf(f)
+
+    schema = {"nome": "Nome do profissional", "situacao": "Situação do profissional"}
+
+    async def run():
+        try:
+            return [
+                event async for event in iter_extraction_events(
+                    pdf_lines=parse_result["lines"],
+                    doc_text=parse_result["full_text"],
+                    schema=schema,
+                    label="test_stream",
+                    use_cache=False
+                )
+            ]
+        finally:
+            await llm.close_client()
+
+    events = asyncio.run(run())
+
+    assert [event["type"] for event in events] == ["field"] * len(schema) + ["metadata"]
+    assert {event["field"] for event in events[:-1]} == set(schema)
+    assert all(event["source"] in ("heuristic", "llm") for event in events[:-1])